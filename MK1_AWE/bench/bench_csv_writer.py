@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Benchmark the vectorized CSV writer against the pandas strftime/to_csv path.
+
+Builds a synthetic AIX-style export (timestamp + 16 float channels at 10 Hz)
+and times both writers. Before timing, the float encoder is checked byte for
+byte against to_csv(float_format='%.6f') on rounding edge cases (half steps,
+negative zero, NaN, large values). Usage: python bench_csv_writer.py [--rows N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'data'))
+from csv_writer import write_csv
+
+
+def make_dataset(rows, channels=16):
+    """Synthetic 10 Hz analog export with UTC timestamps"""
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp('2025-11-17 20:00:00', tz='UTC')
+    df = pd.DataFrame({'timestamp': start + pd.to_timedelta(np.arange(rows) * 100, unit='ms')})
+    for i in range(1, channels + 1):
+        df[f'AI{i:02d}'] = 4.0 + 16.0 * rng.random(rows)
+    return df
+
+
+def edge_case_dataset():
+    """Values where a scaled-integer encoder can round differently from printf (plus a bool column)"""
+    rng = np.random.default_rng(1)
+    halves = (np.arange(-2000, 2000) + 0.5) / 1e6                 # x.xxxxxx5 in decimal
+    binary_ties = np.arange(1, 2000) / 2**21                      # exact binary half steps
+    values = np.concatenate([
+        halves, halves + 1.0, halves * 1e3 + 123.0, binary_ties, -binary_ties,
+        [0.0, -0.0, 1e-7, -1e-7, 4.9999995e-7, 0.9999995, 0.99999949, 999999.9999995,
+         123456789.1234565, 9.99e11, -9.99e11, np.nan],
+        rng.normal(0, 50, 10_000),
+    ])
+    return pd.DataFrame({'timestamp': pd.Timestamp('2025-11-17 20:00:00', tz='UTC')
+                                      + pd.to_timedelta(np.arange(len(values)), unit='ms'),
+                         'value': values,
+                         'flag': values > 0})
+
+
+def check_identical(df, tmp):
+    """True if write_csv and the pandas path produce the same bytes"""
+    fast_path, slow_path = os.path.join(tmp, 'check_fast.csv'), os.path.join(tmp, 'check_pandas.csv')
+    write_csv(df, fast_path)
+    write_pandas(df, slow_path)
+    with open(fast_path, 'rb') as a, open(slow_path, 'rb') as b:
+        return a.read() == b.read()
+
+
+def write_pandas(df, path):
+    """Original export path: per-element strftime + printf float formatting"""
+    out = df.copy()
+    out['timestamp'] = out['timestamp'].dt.tz_convert('America/Los_Angeles')
+    out['timestamp'] = out['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3]
+    out.to_csv(path, index=False, float_format='%.6f')
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000, help='Synthetic rows (default 10M)')
+    parser.add_argument('--skip-baseline', action='store_true', help='Only time the fast writer')
+    args = parser.parse_args()
+
+    print(f"Building {args.rows:,} x 16 synthetic dataset...")
+    df = make_dataset(args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"  Edge cases identical : {check_identical(edge_case_dataset(), tmp)}")
+
+        fast_path = os.path.join(tmp, 'fast.csv')
+        t_fast = timed(write_csv, df, fast_path)
+        t_epoch = timed(write_csv, df, os.path.join(tmp, 'epoch.csv'), time_format='epoch_ms')
+        size_mb = os.path.getsize(fast_path) / 1e6
+
+        print(f"  write_csv (local)    : {t_fast:8.2f} s  ({args.rows / t_fast / 1e6:.2f} M rows/s, {size_mb:.0f} MB)")
+        print(f"  write_csv (epoch_ms) : {t_epoch:8.2f} s")
+
+        if not args.skip_baseline:
+            slow_path = os.path.join(tmp, 'pandas.csv')
+            t_slow = timed(write_pandas, df, slow_path)
+            print(f"  pandas to_csv        : {t_slow:8.2f} s")
+            print(f"  Speedup              : {t_slow / t_fast:8.1f}x")
+
+            with open(fast_path, 'rb') as a, open(slow_path, 'rb') as b:
+                print(f"  Output identical     : {a.read() == b.read()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of the bridges, ingestion and post-processing pipeline.
+
+Runs the hardware bridges against the simulators (hdw/sim) in a scratch copy
+of hdw/ and config/, with push ingestion pointed at a local line-protocol
+sink standing in for Telegraf/InfluxDB, and measures:
+  - /metrics throughput and latency per bridge under N concurrent clients
+  - sample-to-sink latency per measurement (hardware timestamp -> arrival)
+  - CPU per bridge process, idle (acquire + push) and under /metrics load
+  - export (CSV write), load, plot and KPI times on a synthetic multi-day test
+
+Results are written as JSON to bench/results/ (--compare prints the change
+against an earlier result file).
+Usage: python bench_pipeline.py [--bridges ni_analog,psu] [--clients 1,4,16]
+"""
+
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+MK1_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = MK1_DIR / 'data'
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+# Bridge name -> (script in hdw/, HTTP port or None for bridges.<name>.port)
+BRIDGES = {
+    'ni_analog': ('ni_analog_http.py', None),
+    'pico_tc08': ('pico_tc08_http.py', None),
+    'psu': ('psu_http.py', None),
+    'bga01': ('BGA244_http_1.py', None),
+    'bga02': ('BGA244_http_2.py', None),
+    'bga03': ('BGA244_http_3.py', None),
+    'cvm24p': ('cvm24p_http.py', None),
+    'labjack': ('labjack_http.py', None),
+}
+DEFAULT_BRIDGES = 'ni_analog,pico_tc08,psu,bga01,cvm24p'
+
+
+def summarize(values_ms):
+    """Latency statistics [ms] for a list of samples"""
+    if not len(values_ms):
+        return {'count': 0}
+    v = np.asarray(values_ms, dtype=float)
+    p50, p95, p99 = np.percentile(v, [50, 95, 99])
+    return {'count': int(len(v)), 'p50_ms': round(p50, 3), 'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3), 'max_ms': round(float(v.max()), 3)}
+
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process [s], or None if not measurable"""
+    try:
+        import psutil
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class CpuMeter:
+    """CPU utilisation [% of one core] of a set of processes over a window"""
+
+    def __init__(self, procs):
+        self.procs = procs
+        self.start = {}
+        self.t0 = None
+
+    def begin(self):
+        self.t0 = time.perf_counter()
+        self.start = {name: cpu_seconds(p.pid) for name, p in self.procs.items()}
+
+    def end(self):
+        elapsed = time.perf_counter() - self.t0
+        result = {}
+        for name, p in self.procs.items():
+            now, before = cpu_seconds(p.pid), self.start.get(name)
+            result[name] = None if now is None or before is None else round(100 * (now - before) / elapsed, 1)
+        return result
+
+
+class LineSink(ThreadingHTTPServer):
+    """Line-protocol write endpoint standing in for Telegraf/InfluxDB
+
+    Records, per measurement, the delay between each line's timestamp and
+    its arrival (POST body parsed on receipt).
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SinkHandler)
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/telegraf"
+
+    def reset(self):
+        with self.lock:
+            self.latencies = {}
+            self.requests = 0
+
+    def record(self, body, received_ns):
+        by_measurement = {}
+        for line in body.split(b'\n'):
+            if not line:
+                continue
+            head, _, timestamp = line.rpartition(b' ')
+            measurement = head.split(b' ', 1)[0].split(b',', 1)[0].decode()
+            try:
+                by_measurement.setdefault(measurement, []).append((received_ns - int(timestamp)) / 1e6)
+            except ValueError:
+                continue
+        with self.lock:
+            self.requests += 1
+            for measurement, values in by_measurement.items():
+                self.latencies.setdefault(measurement, []).extend(values)
+
+    def stats(self):
+        with self.lock:
+            return {'posts': self.requests,
+                    'measurements': {m: summarize(v) for m, v in sorted(self.latencies.items())}}
+
+
+class _SinkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like http_listener_v2
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.record(body, time.time_ns())
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def prepare_tree(scratch, args, sink_url):
+    """Scratch copy of hdw/ and config/ with simulators and the sink selected"""
+    root = scratch / 'MK1_AWE'
+    shutil.copytree(MK1_DIR / 'hdw', root / 'hdw', ignore=shutil.ignore_patterns('__pycache__'))
+    shutil.copytree(MK1_DIR / 'config', root / 'config')
+    config_path = root / 'config' / 'devices.yaml'
+    with open(config_path) as f:
+        config = yaml.safe_load(f)
+    simulation = config.setdefault('simulation', {})
+    simulation['devices'] = ['all']
+    simulation['cvm_units'] = args.cvm_units
+    ingest = config['telegraf'].setdefault('ingest', {})
+    # target 'telegraf' posts to `url` (the sink); 'influxdb' would write to the real bucket
+    ingest.update({'mode': 'push', 'target': 'telegraf', 'url': sink_url,
+                   'journal_dir': 'MK1_AWE/journal'})
+    if args.ni_rate:
+        config['bridges']['ni_analog']['sample_rate'] = args.ni_rate
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    return root, config
+
+
+def bridge_port(name, config):
+    port = BRIDGES[name][1]
+    return port or config['bridges'][name]['port']
+
+
+def get(port, path='/metrics', timeout=2.0):
+    """(status, body) of a GET on a local bridge"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def wait_ready(port, timeout):
+    """True once /metrics returns 200"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if get(port)[0] == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def load_test(port, clients, duration):
+    """/metrics requests/s and latency with `clients` concurrent keep-alive clients"""
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    stop_at = time.perf_counter() + duration
+
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', '/metrics')
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[i] += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                errors[i] += 1
+                conn.close()
+                continue
+            latencies[i].append((time.perf_counter() - start) * 1000)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    all_latencies = [v for values in latencies for v in values]
+    return {'clients': clients, 'requests_per_s': round(len(all_latencies) / elapsed, 1),
+            'errors': sum(errors), **summarize(all_latencies)}
+
+
+def bench_bridges(args, scratch):
+    """Bridge phases: start, idle (CPU + sink latency), /metrics load per client count"""
+    sink = LineSink()
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    root, config = prepare_tree(scratch, args, sink.url)
+    names = [n.strip() for n in args.bridges.split(',') if n.strip()]
+    unknown = [n for n in names if n not in BRIDGES]
+    if unknown:
+        raise SystemExit(f"Unknown bridge(s): {', '.join(unknown)} (choose from {', '.join(BRIDGES)})")
+    ports = {name: bridge_port(name, config) for name in names}
+    if len(set(ports.values())) != len(ports):
+        raise SystemExit(f"Bridges share an HTTP port: {ports}")
+
+    procs = {}
+    logs_dir = scratch / 'logs'
+    logs_dir.mkdir()
+    results = {'sink_url': sink.url, 'ports': ports, 'startup_s': {}, 'cpu_percent': {},
+               'sink_latency': {}, 'metrics_load': {}}
+    try:
+        for name in names:
+            log = open(logs_dir / f'{name}.log', 'w')
+            procs[name] = subprocess.Popen([sys.executable, '-u', BRIDGES[name][0]], cwd=root / 'hdw',
+                                           stdout=log, stderr=subprocess.STDOUT)
+        start = time.perf_counter()
+        for name in names:
+            if not wait_ready(ports[name], args.startup_timeout):
+                raise SystemExit(f"[!] {name} not ready after {args.startup_timeout}s, "
+                                 f"see {logs_dir / (name + '.log')}")
+            results['startup_s'][name] = round(time.perf_counter() - start, 2)
+        print(f"  [OK] {len(names)} bridges up: {', '.join(names)}")
+
+        # Idle: acquisition + push only
+        time.sleep(2.0)  # Let startup backlog drain before measuring
+        sink.reset()
+        meter = CpuMeter(procs)
+        meter.begin()
+        time.sleep(args.idle)
+        results['cpu_percent']['idle'] = meter.end()
+        results['sink_latency'] = sink.stats()
+        if not results['sink_latency']['posts']:
+            raise SystemExit(f"[!] No lines reached the sink in {args.idle:g}s of idle, "
+                             f"check push ingestion in {logs_dir}")
+        for measurement, stats in results['sink_latency']['measurements'].items():
+            print(f"  {measurement:<14} sample->sink  p50 {stats['p50_ms']:8.1f} ms   "
+                  f"p99 {stats['p99_ms']:8.1f} ms   ({stats['count']} lines)")
+
+        # /metrics load, one bridge at a time
+        for name in names:
+            results['metrics_load'][name] = []
+            for clients in args.clients:
+                meter = CpuMeter({name: procs[name]})
+                meter.begin()
+                stats = load_test(ports[name], clients, args.duration)
+                stats['bridge_cpu_percent'] = meter.end()[name]
+                results['metrics_load'][name].append(stats)
+                print(f"  {name:<10} {clients:3d} clients  {stats['requests_per_s']:8.1f} req/s   "
+                      f"p50 {stats.get('p50_ms', 0):7.2f} ms   p99 {stats.get('p99_ms', 0):7.2f} ms   "
+                      f"cpu {stats['bridge_cpu_percent']}%   errors {stats['errors']}")
+        results['cpu_percent']['idle_total'] = round(sum(v or 0 for v in results['cpu_percent']['idle'].values()), 1)
+    finally:
+        for p in procs.values():
+            p.terminate()
+        for p in procs.values():
+            try:
+                p.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        sink.shutdown()
+    return results
+
+
+def make_test_dir(scratch, days, rate, cv_channels, labels):
+    """Synthetic multi-day test directory; returns (test_dir, frames by group)"""
+    rng = np.random.default_rng(0)
+    n = int(days * 86400 * rate)
+    start = pd.Timestamp('2025-11-17 20:00:00', tz='UTC')
+    times = start + pd.to_timedelta(np.arange(n) * (1e9 / rate), unit='ns')
+    test_dir = scratch / f"{start.strftime('%Y-%m-%d')}_Bench"
+    (test_dir / 'csv').mkdir(parents=True)
+
+    # Current steps through a polarization sweep each hour, off for 10 min
+    step = (np.arange(n) / rate // 300) % 12
+    current = np.where(step < 10, step * 10.0, 0.0) + rng.normal(0, 0.3, n)
+    voltage = 5 * (1.6 + 0.004 * current) + rng.normal(0, 0.01, n)
+
+    def label(channel):
+        config = labels.get('analog_inputs', {}).get(channel)
+        return config.get('label', channel) if isinstance(config, dict) else channel
+
+    aix = {'timestamp': times}
+    converted = {'timestamp': times}
+    for i in range(1, 17):
+        channel = f'AI{i:02d}'
+        aix[channel] = 4.0 + 16.0 * rng.random(n)
+        converted[label(channel)] = rng.random(n)
+    converted[label('AI03')] = current
+    converted[label('AI07')] = current * 0.35 + rng.normal(0, 0.1, n)
+    converted[label('AI09')] = voltage
+
+    tc_times = times[::max(1, int(rate))]
+    tc = {'timestamp': tc_times}
+    for i in range(1, 9):
+        label = labels.get('thermocouples', {}).get(f'TC{i:02d}', f'TC{i:02d}')
+        tc[label] = 60 + rng.normal(0, 1, len(tc_times))
+
+    psu = {'timestamp': times, 'voltage': voltage, 'current': current, 'power': voltage * current,
+           'set_voltage_rb': 300.0, 'set_current_rb': np.round(current),
+           'output_enable': (current > 1).astype(float)}
+
+    cv = {'timestamp': times}
+    for i in range(1, cv_channels + 1):
+        cv[f'CV{i:03d}'] = 1.8 + 0.001 * current + rng.normal(0, 0.01, n)
+
+    frames = {'AIX': aix, 'AIX_converted': converted, 'TC': tc, 'PSU': psu, 'CV': cv}
+    purge = (np.arange(n) / rate // 600) % 6 == 0
+    for bga_id in ('BGA01', 'BGA02', 'BGA03'):
+        frames[bga_id] = {'timestamp': times, 'pressure': 101.3, 'purity': 99 + rng.normal(0, 0.3, n),
+                          'temperature': 40 + rng.normal(0, 0.2, n), 'uncertainty': 0.1,
+                          'primary_gas': '1333-74-0',
+                          'secondary_gas': np.where(purge, '7727-37-9', '7782-44-7')}
+    return test_dir, {group: pd.DataFrame(columns) for group, columns in frames.items()}
+
+
+def bench_dataset(args, scratch):
+    """Export (CSV write), load, plot and KPI times on a synthetic multi-day test"""
+    sys.path.insert(0, str(DATA_DIR))
+    from csv_writer import write_csv
+    from dataset import TestDataset
+    import plot_data
+    import kpi
+
+    labels = plot_data.SENSOR_LABELS
+    test_dir, frames = make_test_dir(scratch, args.days, args.dataset_rate, args.cvm_units * 24, labels)
+    dataset = TestDataset(test_dir, labels=labels)
+    results = {'days': args.days, 'rate_hz': args.dataset_rate,
+               'rows': len(frames['AIX']), 'export_s': {}, 'load_s': {}, 'csv_mb': {}}
+    print(f"  Synthetic test: {args.days} days at {args.dataset_rate} Hz ({results['rows']:,} rows)")
+
+    for group, df in frames.items():
+        name = dataset.bga_group(group) if group.startswith('BGA') else group
+        path = dataset.path(name)
+        start = time.perf_counter()
+        write_csv(df, path)
+        results['export_s'][name] = round(time.perf_counter() - start, 3)
+        results['csv_mb'][name] = round(os.path.getsize(path) / 1e6, 1)
+    del frames
+
+    for group in list(results['export_s']):
+        start = time.perf_counter()
+        dataset.get(group)
+        results['load_s'][group] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        timings = plot_data.generate_plots(test_dir)
+    results['plot_wall_s'] = round(time.perf_counter() - start, 2)
+    results['plot_s'] = {name: round(t, 2) for name, t in (timings or {}).items()}
+
+    start = time.perf_counter()
+    kpi.compute_kpis(dataset, labels)
+    results['kpi_s'] = round(time.perf_counter() - start, 3)
+
+    print(f"  export (write_csv)   : {sum(results['export_s'].values()):8.2f} s  "
+          f"({sum(results['csv_mb'].values()):.0f} MB)")
+    print(f"  load (parse)         : {sum(results['load_s'].values()):8.2f} s")
+    print(f"  plots                : {results['plot_wall_s']:8.2f} s wall")
+    print(f"  KPIs                 : {results['kpi_s']:8.2f} s")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=MK1_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _flatten(value, prefix=''):
+    """{'a.b.c': number} for every numeric leaf of a result (lists by index)"""
+    items = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+    flat = {}
+    for key, child in items:
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(child, (dict, list)):
+            flat.update(_flatten(child, path))
+        elif isinstance(child, (int, float)) and not isinstance(child, bool):
+            flat[path] = child
+    return flat
+
+
+def compare(baseline_path, results, threshold=10.0):
+    """Print numeric results that changed by more than threshold percent"""
+    with open(baseline_path) as f:
+        baseline = _flatten(json.load(f)['results'])
+    current = _flatten(results)
+    print(f"\nChanges vs {Path(baseline_path).name} (> {threshold:.0f}%):")
+    changed = 0
+    for key in sorted(set(baseline) & set(current)):
+        before, after = baseline[key], current[key]
+        if before and abs(after - before) / abs(before) * 100 > threshold:
+            print(f"  {key:<60} {before:>12g} -> {after:<12g} ({(after - before) / abs(before) * 100:+.0f}%)")
+            changed += 1
+    if not changed:
+        print("  (none)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bridges', default=DEFAULT_BRIDGES, help=f'Comma-separated (default {DEFAULT_BRIDGES})')
+    parser.add_argument('--clients', default='1,4,16', help='Concurrent /metrics clients per step (default 1,4,16)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per /metrics load step')
+    parser.add_argument('--idle', type=float, default=10.0, help='Seconds of idle CPU/latency measurement')
+    parser.add_argument('--startup-timeout', type=float, default=30.0, help='Seconds to wait for each bridge')
+    parser.add_argument('--ni-rate', type=float, help='Override bridges.ni_analog.sample_rate [Hz]')
+    parser.add_argument('--cvm-units', type=int, default=5, help='Simulated CVM24P units (24 cells each)')
+    parser.add_argument('--days', type=float, default=3.0, help='Synthetic dataset length [days]')
+    parser.add_argument('--dataset-rate', type=float, default=1.0, help='Synthetic dataset rate [Hz]')
+    parser.add_argument('--skip-bridges', action='store_true', help='Only run the dataset benchmark')
+    parser.add_argument('--skip-dataset', action='store_true', help='Only run the bridge benchmarks')
+    parser.add_argument('--output', help='Result JSON path (default bench/results/pipeline_<time>.json)')
+    parser.add_argument('--compare', help='Earlier result JSON to compare against')
+    args = parser.parse_args()
+    args.clients = [int(c) for c in args.clients.split(',')]
+
+    print("=" * 60)
+    print("Gen3 AWE Pipeline Benchmark")
+    print("=" * 60)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='awe_bench_') as tmp:
+        scratch = Path(tmp)
+        if not args.skip_bridges:
+            print("\nBridges (simulated hardware):")
+            results['bridges'] = bench_bridges(args, scratch)
+        if not args.skip_dataset:
+            print("\nExport/plot (synthetic dataset):")
+            results['dataset'] = bench_dataset(args, scratch)
+
+    stamp = datetime.now()
+    output = Path(args.output) if args.output else RESULTS_DIR / f"pipeline_{stamp:%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        'benchmark': 'pipeline',
+        'time': stamp.isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(),
+                 'cpu_count': os.cpu_count()},
+        'args': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\n[OK] Results: {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
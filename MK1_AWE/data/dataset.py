@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Lazy, cached access to the exported CSVs of one test directory"""
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gui'))
+from config_loader import load_sensor_labels, get_cell_channels
+
+LOCAL_TZ = 'America/Los_Angeles'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+BGA_IDS = ['BGA01', 'BGA02', 'BGA03']
+
+
+def bga_label(bga_id, labels=None):
+    """Display label for a BGA (sensor_labels.yaml), falling back to its id"""
+    if labels is None:
+        labels = load_sensor_labels()
+    bga_config = labels.get('bgas', {}).get(bga_id, {})
+    return bga_config.get('label', bga_id) if isinstance(bga_config, dict) else bga_id
+
+
+def cell_columns(df):
+    """Active cell columns of a CV frame (devices.yaml CVM24P cell_channels)
+
+    The stack channel and unused channels are never cells; configured cells
+    missing from the export or without data are skipped.
+    """
+    _, cell_channels = get_cell_channels()
+    return [col for col in cell_channels if col in df.columns and df[col].notna().any()]
+
+
+def parse_timestamps(series):
+    """Parse an exported timestamp column to naive local datetimes
+
+    Handles both CSV_TIME_FORMAT options: 'local' strings are parsed with an
+    explicit format (vectorized), 'epoch_ms' integers are converted from UTC.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        utc = pd.to_datetime(series, unit='ms', utc=True)
+        return utc.dt.tz_convert(LOCAL_TZ).dt.tz_localize(None)
+    return pd.to_datetime(series, format=TIMESTAMP_FORMAT)
+
+
+class TestDataset:
+    """CSV groups of one test, each parsed at most once
+
+    Groups are addressed by their filename suffix ('AIX', 'AIX_converted',
+    'TC', 'RL', 'PSU', 'CV', 'labjack', ...). BGA files are addressed by
+    BGA id and resolved through their sensor label. Frames are shared
+    between callers, so treat them as read-only.
+    """
+
+    def __init__(self, test_dir, labels=None, frames=None):
+        self.test_dir = Path(test_dir)
+        self.csv_dir = self.test_dir / 'csv'
+        self.date_str = self.test_dir.name.split('_')[0]
+        self.labels = labels if labels is not None else load_sensor_labels()
+        self._frames = dict(frames or {})  # group -> DataFrame/None, may be parsed elsewhere
+        self.load_counts = {}  # group -> number of file parses (should stay 1)
+
+    def path(self, group):
+        """CSV path for an export group"""
+        return self.csv_dir / f"{self.date_str}_{group}.csv"
+
+    def bga_group(self, bga_id):
+        """Export group name for a BGA (label-based filename suffix)"""
+        return f"BGA_{bga_label(bga_id, self.labels).replace(' ', '_')}"
+
+    def has(self, group):
+        return group in self._frames or self.path(group).exists()
+
+    def frames(self, groups):
+        """{group: DataFrame or None} for the given groups, parsing any not loaded yet"""
+        return {group: self.get(group) for group in groups}
+
+    def get(self, group):
+        """DataFrame for a group (parsed on first access), or None if missing"""
+        if group not in self._frames:
+            self._frames[group] = self._load(group)
+        return self._frames[group]
+
+    def bga(self, bga_id):
+        """DataFrame for one BGA, or None if not exported"""
+        return self.get(self.bga_group(bga_id))
+
+    def time_range(self, group):
+        """(start, end) of a group's timestamps, or None"""
+        df = self.get(group)
+        if df is None or df.empty:
+            return None
+        return df['timestamp'].min(), df['timestamp'].max()
+
+    def _load(self, group):
+        path = self.path(group)
+        if not path.exists():
+            return None
+        self.load_counts[group] = self.load_counts.get(group, 0) + 1
+        df = pd.read_csv(path)
+        if 'timestamp' in df.columns:
+            df['timestamp'] = parse_timestamps(df['timestamp'])
+        return df
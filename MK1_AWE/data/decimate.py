@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Visual-preserving decimation for line plots.
+
+A line drawn into a W-pixel-wide axis can only show W columns. For each
+pixel column this keeps the minimum and maximum sample (in time order),
+so the rasterized line (spikes, envelopes, step edges) is unchanged while
+the number of vertices drops to about 2 * W. NaN gaps are preserved.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def pixel_columns(figure_size, dpi):
+    """Horizontal pixel count of a figure (upper bound for the axis width)."""
+    return int(figure_size[0] * dpi)
+
+
+def minmax_envelope(x, y, n_bins):
+    """Reduce (x, y) to the per-bin min/max samples plus both endpoints.
+
+    Args:
+        x: Monotonic x values (datetime-like or numeric)
+        y: Y values, same length as x
+        n_bins: Number of equal-width x bins (typically the pixel width)
+
+    Returns:
+        tuple: (x, y) as NumPy arrays; unchanged if already small enough
+            or if x is not sorted
+    """
+    xs = np.asarray(x)
+    ys = np.asarray(y, dtype=np.float64)
+    n = len(xs)
+    if n <= 2 * n_bins or n_bins < 1:
+        return xs, ys
+
+    pos = xs.view('int64') if np.issubdtype(xs.dtype, np.datetime64) else xs.astype(np.float64)
+    if pos[-1] < pos[0] or np.any(np.diff(pos) < 0):
+        return xs, ys
+
+    # Bin start indices on equal x intervals; empty bins collapse away
+    bounds = np.linspace(pos[0], pos[-1], n_bins + 1)[1:-1]
+    starts = np.unique(np.concatenate(([0], np.searchsorted(pos, bounds))))
+    starts = starts[starts < n]
+    counts = np.diff(np.append(starts, n))
+    bin_of = np.repeat(np.arange(len(starts)), counts)
+
+    missing = np.isnan(ys)
+    keep = [np.array([0, n - 1])]
+    for reduce, fill in ((np.minimum, np.inf), (np.maximum, -np.inf)):
+        filled = np.where(missing, fill, ys)
+        extreme = reduce.reduceat(filled, starts)
+        hits = np.flatnonzero(filled == extreme[bin_of])
+        _, first = np.unique(bin_of[hits], return_index=True)
+        keep.append(hits[first])
+    # First NaN of each run so matplotlib still breaks the line there
+    keep.append(np.flatnonzero(missing & ~np.concatenate(([False], missing[:-1]))))
+
+    idx = np.unique(np.concatenate(keep))
+    return xs[idx], ys[idx]
+
+
+def binned_mean(x, values, n_bins):
+    """Column means of a 2-D array over equal-width x bins (image columns).
+
+    Args:
+        x: Monotonic x values (datetime-like or numeric), length n
+        values: (n, m) array; NaNs are ignored
+        n_bins: Number of equal-width x bins (typically the pixel width)
+
+    Returns:
+        np.ndarray: (n_bins, m) float64 means, NaN where a bin has no data
+    """
+    xs = np.asarray(x)
+    vals = np.asarray(values, dtype=np.float64)
+    out = np.full((n_bins, vals.shape[1]), np.nan)
+    if len(xs) == 0 or n_bins < 1:
+        return out
+
+    pos = xs.view('int64') if np.issubdtype(xs.dtype, np.datetime64) else xs.astype(np.float64)
+    if np.any(np.diff(pos) < 0):
+        order = np.argsort(pos, kind='stable')
+        pos, vals = pos[order], vals[order]
+    span = float(pos[-1] - pos[0])
+    bins = (np.minimum((pos - pos[0]) / span * n_bins, n_bins - 1).astype(np.int64)
+            if span > 0 else np.zeros(len(pos), dtype=np.int64))
+
+    # Sorted x: each non-empty bin is one contiguous row range
+    starts = np.flatnonzero(np.diff(bins, prepend=-1))
+    finite = np.isfinite(vals)
+    if finite.all():
+        sums = np.add.reduceat(vals, starts, axis=0)
+        counts = np.diff(np.append(starts, len(pos)))[:, None]
+    else:
+        sums = np.add.reduceat(np.where(finite, vals, 0.0), starts, axis=0)
+        counts = np.add.reduceat(finite.astype(np.int64), starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[bins[starts]] = sums / counts
+    return out
+
+
+def decimate_series(x, y, n_bins):
+    """minmax_envelope() for pandas inputs, returning plain arrays."""
+    if isinstance(x, pd.Series):
+        x = x.to_numpy()
+    if isinstance(y, pd.Series):
+        y = y.to_numpy(dtype=np.float64, na_value=np.nan)
+    return minmax_envelope(x, y, n_bins)
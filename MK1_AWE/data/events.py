@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Vectorized event (period) detection on sampled test data.
+
+A period is a run of consecutive samples where a condition holds. Runs are
+found with a single diff over the boolean mask, so the cost does not grow
+with the number of toggles. Periods are returned as parallel start/end
+arrays: (starts, ends), with both ends inclusive sample times.
+"""
+
+import numpy as np
+import pandas as pd
+
+N2_CAS = '7727-37-9'  # BGA secondary gas during nitrogen purges
+
+
+def find_runs(mask):
+    """Start and end (exclusive) indices of every True run in a boolean mask.
+
+    Returns:
+        tuple: (starts, ends) int arrays; mask[starts[i]:ends[i]] is all True
+    """
+    mask = np.asarray(mask, dtype=bool)
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def hysteresis_mask(values, on, off):
+    """Threshold with hysteresis: True once above `on`, until below `off`.
+
+    Values between the thresholds (and NaN) hold the previous state; the
+    initial state is False. With on == off this is simply values > on
+    (values at the threshold are off).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    state = np.full(len(values), -1, dtype=np.int8)
+    state[values <= off if on == off else values < off] = 0
+    state[values > on] = 1
+    # Forward-fill decided samples over the undecided ones
+    decided = np.where(state >= 0, np.arange(len(values)), -1)
+    last = np.maximum.accumulate(decided) if len(values) else decided
+    return np.where(last >= 0, state[np.maximum(last, 0)], 0).astype(bool)
+
+
+def detect_periods(times, mask, min_duration=0.0):
+    """Periods where mask is True, dropping those shorter than min_duration.
+
+    Args:
+        times: Sample timestamps (sorted), same length as mask
+        mask: Boolean condition per sample
+        min_duration: Minimum period length in seconds
+
+    Returns:
+        tuple: (starts, ends) datetime64 arrays of the first/last sample
+            time of each period
+    """
+    times = pd.Series(times).to_numpy()
+    starts, ends = find_runs(mask)
+    start_times, end_times = times[starts], times[ends - 1]
+    if min_duration > 0 and len(starts):
+        keep = (end_times - start_times) >= np.timedelta64(int(min_duration * 1e9), 'ns')
+        start_times, end_times = start_times[keep], end_times[keep]
+    return start_times, end_times
+
+
+def period_index(times, periods):
+    """Index of the period containing each sample time, -1 if none"""
+    starts, ends = periods
+    t = pd.Series(times).to_numpy('datetime64[ns]')
+    idx = np.searchsorted(starts, t, side='right') - 1
+    inside = idx >= 0
+    inside[inside] = t[inside] <= ends[idx[inside]]
+    return np.where(inside, idx, -1)
+
+
+def empty_periods():
+    """An empty (starts, ends) pair."""
+    empty = np.array([], dtype='datetime64[ns]')
+    return empty, empty.copy()
+
+
+def purge_periods(df_bga, min_duration=0.0):
+    """N2 purge periods: BGA secondary gas is nitrogen"""
+    if df_bga is None or 'secondary_gas' not in df_bga.columns:
+        return empty_periods()
+    is_purge = (df_bga['secondary_gas'] == N2_CAS).to_numpy()
+    return detect_periods(df_bga['timestamp'], is_purge, min_duration)
+
+
+def active_periods(df_psu, on=1.0, off=1.0, min_duration=0.0):
+    """Active (powered) periods from PSU current with hysteresis, in A"""
+    if df_psu is None or 'current' not in df_psu.columns:
+        return empty_periods()
+    is_active = hysteresis_mask(df_psu['current'], on, off)
+    return detect_periods(df_psu['timestamp'], is_active, min_duration)
@@ -2,7 +2,7 @@
 """Export Gen3 AWE InfluxDB data to CSV. Configuration in test_config.py"""
 
 from influxdb_client import InfluxDBClient
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import sys
 import os
@@ -26,9 +26,11 @@ except ImportError:
 from test_config import (
     TEST_NAME, START_TIME, STOP_TIME, START_TIME_UTC, STOP_TIME_UTC,
     DOWNSAMPLE_AIX, DOWNSAMPLE_TC, DOWNSAMPLE_PSU, DOWNSAMPLE_BGA, DOWNSAMPLE_RL,
-    DOWNSAMPLE_FUNCTION
+    DOWNSAMPLE_CV, DOWNSAMPLE_FUNCTION, CSV_TIME_FORMAT
 )
 import pandas as pd
+from csv_writer import write_csv
+import rollups
 
 # InfluxDB Connection (reads from parent config/devices.yaml)
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gui'))
@@ -37,6 +39,20 @@ from config_loader import get_influx_params, load_sensor_labels
 
 # Removed convert_mA_to_eng - not needed for raw data export
 
+CV_CHANNELS = 120                       # CVM24P: 5 units x 24 cells (cell_voltages CV001-CV120)
+WIDE_SLICE_NS = 3600 * 1_000_000_000    # Wide-row exports are queried one hour at a time
+
+
+def select_source(influx_params, downsample_window):
+    """Bucket (raw or rollup tier) for a downsampled query over the test range"""
+    try:
+        return rollups.select_source(downsample_window, DOWNSAMPLE_FUNCTION,
+                                     start=START_TIME, stop=STOP_TIME,
+                                     influx_params=influx_params)
+    except (KeyError, ValueError) as e:
+        print(f"  [!] Rollup config ignored ({e}), using raw bucket")
+        return rollups.raw_source(influx_params)
+
 
 def export_sensor_group(client, influx_params, output_dir, date_str, 
                         measurement, channels, downsample_window, filename_suffix, 
@@ -51,14 +67,18 @@ def export_sensor_group(client, influx_params, output_dir, date_str,
         use_labels: If True, rename columns using sensor_labels.yaml
     """
     
+    # Coarsest rollup bucket that can serve this window (raw bucket otherwise)
+    source = select_source(influx_params, downsample_window)
+    rollup_filter = rollups.source_filter(source)
+    
     if use_channel_tag and field_name:
         # For measurements like ni_analog, tc08 that use channel tags
         channel_filter = ' or '.join([f'r.channel == "{ch}"' for ch in channels])
         query = f'''
-from(bucket: "{influx_params['bucket']}")
+from(bucket: "{source['bucket']}")
   |> range(start: {START_TIME_UTC}, stop: {STOP_TIME_UTC})
   |> filter(fn: (r) => r._measurement == "{measurement}")
-  |> filter(fn: (r) => r._field == "{field_name}")
+{rollup_filter}  |> filter(fn: (r) => r._field == "{field_name}")
   |> filter(fn: (r) => {channel_filter})
   |> aggregateWindow(every: {downsample_window}, fn: {DOWNSAMPLE_FUNCTION}, createEmpty: false)
   |> pivot(rowKey:["_time"], columnKey: ["channel"], valueColumn: "_value")
@@ -67,15 +87,16 @@ from(bucket: "{influx_params['bucket']}")
         # For measurements like ni_relays, psu that use field names directly
         field_filter = ' or '.join([f'r._field == "{f}"' for f in channels])
         query = f'''
-from(bucket: "{influx_params['bucket']}")
+from(bucket: "{source['bucket']}")
   |> range(start: {START_TIME_UTC}, stop: {STOP_TIME_UTC})
   |> filter(fn: (r) => r._measurement == "{measurement}")
-  |> filter(fn: (r) => {field_filter})
+{rollup_filter}  |> filter(fn: (r) => {field_filter})
   |> aggregateWindow(every: {downsample_window}, fn: {DOWNSAMPLE_FUNCTION}, createEmpty: false)
   |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
 '''
     
     print(f"\nExporting {filename_suffix}...")
+    print(f"  Source: {rollups.describe_source(source)}")
     
     try:
         df = client.query_api().query_data_frame(query)
@@ -88,10 +109,8 @@ from(bucket: "{influx_params['bucket']}")
         keep_cols = ['_time'] + [col for col in df.columns if col in channels]
         df = df[keep_cols]
         
-        # Convert timestamps from UTC to local timezone and format as string
-        df['_time'] = df['_time'].dt.tz_convert('America/Los_Angeles')
-        df['_time'] = df['_time'].dt.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3]
-        df.rename(columns={'_time': 'timestamp'}, inplace=True)
+        # Timestamps stay UTC datetimes here; write_csv formats them in bulk
+        df = df.rename(columns={'_time': 'timestamp'})
         
         # Rename columns using sensor labels if requested
         if use_labels:
@@ -116,10 +135,10 @@ from(bucket: "{influx_params['bucket']}")
             if rename_map:
                 df.rename(columns=rename_map, inplace=True)
         
-        # Save to CSV with proper float formatting
+        # Save to CSV (vectorized writer, same format as float_format='%.6f')
         output_file = f"{date_str}_{filename_suffix}.csv"
         output_path = os.path.join(output_dir, output_file)
-        df.to_csv(output_path, index=False, float_format='%.6f')
+        write_csv(df, output_path, time_format=CSV_TIME_FORMAT)
         
         print(f"  [OK] {len(df)} points, {len(keep_cols)-1} channels")
         print(f"       File: {output_file} ({os.path.getsize(output_path) / 1024:.1f} KB)")
@@ -133,11 +152,99 @@ from(bucket: "{influx_params['bucket']}")
         return None
 
 
+def time_slices(start, stop, window, slice_ns):
+    """(start, stop) UTC Flux timestamps covering [start, stop) in slices
+
+    Inner slice edges are multiples of the downsample window (from the epoch),
+    so no aggregateWindow window is split across two queries.
+    """
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    window_ns = rollups.parse_duration(window)
+    step = max(1, slice_ns // window_ns) * window_ns
+    start_ns = (start - epoch) // timedelta(microseconds=1) * 1000
+    stop_ns = (stop - epoch) // timedelta(microseconds=1) * 1000
+    edges = [start_ns] + list(range((start_ns // step + 1) * step, stop_ns, step)) + [stop_ns]
+
+    def flux_time(ns):
+        return (epoch + timedelta(microseconds=ns // 1000)).isoformat().replace('+00:00', 'Z')
+    return [(flux_time(a), flux_time(b)) for a, b in zip(edges, edges[1:])]
+
+
+def export_wide_group(client, influx_params, output_dir, date_str,
+                      measurement, fields, downsample_window, filename_suffix,
+                      slice_ns=WIDE_SLICE_NS):
+    """Export a wide-row measurement (one row per timestamp, many fields) to a single CSV
+    
+    The range is queried in time slices; each slice is pivoted server-side
+    (schema.fieldsAsCols) and appended to the CSV, so memory stays bounded by
+    one slice instead of the whole test. Columns are always `fields` in order
+    (empty where a channel has no data). Series are regrouped by field before
+    aggregating, so tag changes within the range (host, location, bridge
+    tags) do not split a slice into several tables.
+    
+    Returns:
+        int: Rows written (None if no data or on error)
+    """
+    source = select_source(influx_params, downsample_window)
+    rollup_filter = rollups.source_filter(source)
+    field_filter = ' or '.join([f'r._field == "{f}"' for f in fields])
+    
+    print(f"\nExporting {filename_suffix}...")
+    print(f"  Source: {rollups.describe_source(source)}")
+    
+    output_file = f"{date_str}_{filename_suffix}.csv"
+    output_path = os.path.join(output_dir, output_file)
+    rows = 0
+    
+    try:
+        for start, stop in time_slices(START_TIME, STOP_TIME, downsample_window, slice_ns):
+            query = f'''
+import "influxdata/influxdb/schema"
+
+from(bucket: "{source['bucket']}")
+  |> range(start: {start}, stop: {stop})
+  |> filter(fn: (r) => r._measurement == "{measurement}")
+{rollup_filter}  |> filter(fn: (r) => {field_filter})
+  |> group(columns: ["_measurement", "_field"])
+  |> aggregateWindow(every: {downsample_window}, fn: {DOWNSAMPLE_FUNCTION}, createEmpty: false)
+  |> schema.fieldsAsCols()
+  |> keep(columns: ["_time", {', '.join(f'"{f}"' for f in fields)}])
+'''
+            df = client.query_api().query_data_frame(query)
+            if isinstance(df, list):  # One frame per result table
+                df = pd.concat(df, ignore_index=True) if df else pd.DataFrame()
+            if df.empty:
+                continue
+            
+            # Fixed column set/order so every slice matches the header
+            df = (df.rename(columns={'_time': 'timestamp'}).sort_values('timestamp')
+                  .reindex(columns=['timestamp'] + fields))
+            write_csv(df, output_path, time_format=CSV_TIME_FORMAT, append=rows > 0)
+            rows += len(df)
+        
+        if not rows:
+            print(f"  [!] No data found")
+            return None
+        
+        print(f"  [OK] {rows} points, {len(fields)} channels")
+        print(f"       File: {output_file} ({os.path.getsize(output_path) / 1024:.1f} KB)")
+        return rows
+        
+    except Exception as e:
+        print(f"  [ERROR] {e}")
+        traceback.print_exc()
+        return None
+
+
 # Removed export_converted_sensors - Gen3 exports raw data only
 
 
 def export_bga_data(client, influx_params, output_dir, date_str, downsample_window):
-    """Export BGA data with multiple fields per device"""
+    """Export BGA data with multiple fields per device
+    
+    All analyzers come back from a single query: fields are pivoted server-side
+    with bga_id and gas tags kept on each row, then split by bga_id locally.
+    """
     
     print(f"\nExporting BGA data...")
     
@@ -145,62 +252,94 @@ def export_bga_data(client, influx_params, output_dir, date_str, downsample_wind
     labels = load_sensor_labels()
     bga_labels = labels.get('bgas', {})
     
-    try:
-        # Export each BGA separately to avoid duplicate rows
-        for bga_id in ['BGA01', 'BGA02', 'BGA03']:
-            query = f'''
-from(bucket: "{influx_params['bucket']}")
+    bga_ids = ['BGA01', 'BGA02', 'BGA03']
+    bga_fields = ['pressure', 'purity', 'temperature', 'uncertainty']
+    gas_cols = ['primary_gas', 'secondary_gas']
+    
+    bga_filter = ' or '.join([f'r.bga_id == "{b}"' for b in bga_ids])
+    field_filter = ' or '.join([f'r._field == "{f}"' for f in bga_fields])
+    
+    source = select_source(influx_params, downsample_window)
+    rollup_filter = rollups.source_filter(source)
+    print(f"  Source: {rollups.describe_source(source)}")
+    
+    # Aggregate per series first, then drop host/hardware tags and pivot per
+    # analyzer so gas tags ride along as row keys (no pandas pivot/merge)
+    query = f'''
+from(bucket: "{source['bucket']}")
   |> range(start: {START_TIME_UTC}, stop: {STOP_TIME_UTC})
   |> filter(fn: (r) => r._measurement == "bga_metrics")
-  |> filter(fn: (r) => r.bga_id == "{bga_id}")
-  |> filter(fn: (r) => r._field == "purity" or 
-                       r._field == "uncertainty" or
-                       r._field == "temperature" or
-                       r._field == "pressure")
+{rollup_filter}  |> filter(fn: (r) => {bga_filter})
+  |> filter(fn: (r) => {field_filter})
   |> aggregateWindow(every: {downsample_window}, fn: {DOWNSAMPLE_FUNCTION}, createEmpty: false)
-  |> keep(columns: ["_time", "_field", "_value", "primary_gas", "secondary_gas"])
+  |> keep(columns: ["_time", "_field", "_value", "bga_id", "primary_gas", "secondary_gas"])
+  |> group(columns: ["bga_id"])
+  |> pivot(rowKey:["_time", "primary_gas", "secondary_gas"], columnKey: ["_field"], valueColumn: "_value")
 '''
-            
-            df = client.query_api().query_data_frame(query)
-            
-            if df.empty:
+    
+    try:
+        df = client.query_api().query_data_frame(query)
+        
+        # Tables with different field sets come back as separate frames
+        if isinstance(df, list):
+            df = pd.concat(df, ignore_index=True) if df else pd.DataFrame()
+        
+        if df.empty or 'bga_id' not in df.columns:
+            print(f"  [!] No BGA data found")
+            return
+        
+        df = df.sort_values('_time', kind='stable')
+        groups = dict(tuple(df.groupby('bga_id', sort=False)))
+        
+        for bga_id in bga_ids:
+            df_bga = groups.get(bga_id)
+            if df_bga is None or df_bga.empty:
                 print(f"  [!] {bga_id}: No data found")
                 continue
             
-            # Pivot manually using pandas (more reliable than Flux pivot with tags)
-            df_pivot = df.pivot_table(
-                index='_time',
-                columns='_field',
-                values='_value',
-                aggfunc='first'  # Take first value if duplicates
-            ).reset_index()
+            # A gas change inside one window yields two rows for that
+            # timestamp; merge them (first non-null per field, as the old
+            # pivot_table did) so fields only on the second row are kept
+            df_bga = df_bga.groupby('_time', sort=False, as_index=False).first()
             
-            # Add gas info from the original df (take most common value per timestamp)
-            if 'primary_gas' in df.columns and 'secondary_gas' in df.columns:
-                gas_info = df.groupby('_time')[['primary_gas', 'secondary_gas']].first().reset_index()
-                df_pivot = df_pivot.merge(gas_info, on='_time', how='left')
+            # Fields this analyzer never reported are all-null after the concat
+            keep_cols = (['_time'] + [f for f in bga_fields
+                                      if f in df_bga.columns and df_bga[f].notna().any()]
+                         + [g for g in gas_cols if g in df_bga.columns])
+            df_bga = df_bga[keep_cols].copy()
             
-            # Convert timestamps from UTC to local timezone and format as string
-            df_pivot['_time'] = df_pivot['_time'].dt.tz_convert('America/Los_Angeles')
-            df_pivot['_time'] = df_pivot['_time'].dt.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3]
-            df_pivot.rename(columns={'_time': 'timestamp'}, inplace=True)
+            df_bga.rename(columns={'_time': 'timestamp'}, inplace=True)
             
             # Save to CSV with proper float formatting (use label in filename if available)
             bga_label_config = bga_labels.get(bga_id, {})
             bga_label = bga_label_config.get('label', bga_id) if isinstance(bga_label_config, dict) else bga_id
             output_file = f"{date_str}_BGA_{bga_label.replace(' ', '_')}.csv"
             output_path = os.path.join(output_dir, output_file)
-            df_pivot.to_csv(output_path, index=False, float_format='%.6f')
+            write_csv(df_bga, output_path, time_format=CSV_TIME_FORMAT)
             
-            print(f"  [OK] {bga_id}: {len(df_pivot)} points")
+            print(f"  [OK] {bga_id}: {len(df_bga)} points")
             print(f"       File: {output_file} ({os.path.getsize(output_path) / 1024:.1f} KB)")
             
     except Exception as e:
         print(f"  [ERROR] {e}")
 
 
-def export_data():
-    """Export all Gen3 sensor data with configured parameters"""
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled between groups"""
+
+
+def export_data(progress=None, should_cancel=None):
+    """Export all Gen3 sensor data with configured parameters
+    
+    Args:
+        progress: Optional callback(message) invoked before each export group
+        should_cancel: Optional callable; checked between groups, raises
+            ExportCancelled when it returns True
+    
+    Raises:
+        RuntimeError: If the InfluxDB token is not set
+        ExportCancelled: If should_cancel() returned True
+    """
     
     # Use local time for folder naming
     date_str = START_TIME.strftime('%Y-%m-%d')
@@ -226,7 +365,7 @@ def export_data():
         print("\nError: INFLUXDB_ADMIN_TOKEN environment variable not set")
         print("Set it in PowerShell:")
         print('  $env:INFLUXDB_ADMIN_TOKEN="your_token_here"')
-        sys.exit(1)
+        raise RuntimeError("INFLUXDB_ADMIN_TOKEN environment variable not set")
     
     # Connect to InfluxDB
     client = InfluxDBClient(
@@ -235,40 +374,58 @@ def export_data():
         org=influx_params['org']
     )
     
+    ai_channels = [f"AI{i:02d}" for i in range(1, 17)]
+    tc_channels = [f"TC{i:02d}" for i in range(1, 9)]
+    rl_fields = [f"RL{i:02d}" for i in range(1, 17)]
+    cv_fields = [f"CV{i:03d}" for i in range(1, CV_CHANNELS + 1)]
+    psu_fields = ["voltage", "current", "power", "capacity", "runtime", 
+                  "battery_v", "temperature", "status", "sys_fault", "mod_fault",
+                  "set_voltage_rb", "set_current_rb", "output_enable"]
+    
+    # (name, export call) - run in order, progress/cancel checked between each
+    groups = [
+        # Analog inputs (AI01-AI16) - raw mA values from ni_analog measurement
+        ("AIX", lambda: export_sensor_group(
+            client, influx_params, output_dir, date_str,
+            "ni_analog", ai_channels, DOWNSAMPLE_AIX, "AIX",
+            field_name="raw_ma", use_channel_tag=True)),
+        # Analog inputs (AI01-AI16) - converted engineering units
+        ("AIX_converted", lambda: export_sensor_group(
+            client, influx_params, output_dir, date_str,
+            "ni_analog", ai_channels, DOWNSAMPLE_AIX, "AIX_converted",
+            field_name="value", use_channel_tag=True, use_labels=True)),
+        # Thermocouples (TC01-TC08) from tc08 measurement
+        ("TC", lambda: export_sensor_group(
+            client, influx_params, output_dir, date_str,
+            "tc08", tc_channels, DOWNSAMPLE_TC, "TC",
+            field_name="temp_c", use_channel_tag=True, use_labels=True)),
+        # Relays (RL01-RL16) from ni_relays measurement
+        ("RL", lambda: export_sensor_group(
+            client, influx_params, output_dir, date_str,
+            "ni_relays", rl_fields, DOWNSAMPLE_RL, "RL",
+            use_channel_tag=False)),
+        # PSU data (all fields in single CSV)
+        ("PSU", lambda: export_sensor_group(
+            client, influx_params, output_dir, date_str,
+            "psu", psu_fields, DOWNSAMPLE_PSU, "PSU",
+            use_channel_tag=False)),
+        # Cell voltages (CV001-CV120) from cell_voltages, streamed in time slices
+        ("CV", lambda: export_wide_group(
+            client, influx_params, output_dir, date_str,
+            "cell_voltages", cv_fields, DOWNSAMPLE_CV, "CV")),
+        # BGA data (separate per device)
+        ("BGA", lambda: export_bga_data(
+            client, influx_params, output_dir, date_str, DOWNSAMPLE_BGA)),
+    ]
+    
     try:
-        # Export analog inputs (AI01-AI16) - raw mA values from ni_analog measurement
-        ai_channels = [f"AI{i:02d}" for i in range(1, 17)]
-        export_sensor_group(client, influx_params, output_dir, date_str,
-                          "ni_analog", ai_channels, DOWNSAMPLE_AIX, "AIX",
-                          field_name="raw_ma", use_channel_tag=True)
-        
-        # Export analog inputs (AI01-AI16) - converted engineering units
-        export_sensor_group(client, influx_params, output_dir, date_str,
-                          "ni_analog", ai_channels, DOWNSAMPLE_AIX, "AIX_converted",
-                          field_name="value", use_channel_tag=True, use_labels=True)
-        
-        # Export thermocouples (TC01-TC08) from tc08 measurement
-        tc_channels = [f"TC{i:02d}" for i in range(1, 9)]
-        export_sensor_group(client, influx_params, output_dir, date_str,
-                          "tc08", tc_channels, DOWNSAMPLE_TC, "TC",
-                          field_name="temp_c", use_channel_tag=True, use_labels=True)
-        
-        # Export relays (RL01-RL16) from ni_relays measurement
-        rl_fields = [f"RL{i:02d}" for i in range(1, 17)]
-        export_sensor_group(client, influx_params, output_dir, date_str,
-                          "ni_relays", rl_fields, DOWNSAMPLE_RL, "RL",
-                          use_channel_tag=False)
-        
-        # Export PSU data (all fields in single CSV)
-        psu_fields = ["voltage", "current", "power", "capacity", "runtime", 
-                      "battery_v", "temperature", "status", "sys_fault", "mod_fault",
-                      "set_voltage_rb", "set_current_rb", "output_enable"]
-        export_sensor_group(client, influx_params, output_dir, date_str,
-                          "psu", psu_fields, DOWNSAMPLE_PSU, "PSU",
-                          use_channel_tag=False)
-        
-        # Export BGA data (separate per device)
-        export_bga_data(client, influx_params, output_dir, date_str, DOWNSAMPLE_BGA)
+        for index, (name, run_group) in enumerate(groups, start=1):
+            if should_cancel and should_cancel():
+                print("\n[!] Export cancelled")
+                raise ExportCancelled(f"Cancelled before {name}")
+            if progress:
+                progress(f"Exporting {name} ({index}/{len(groups)})")
+            run_group()
         
         print(f"\n{'=' * 60}")
         print(f"[OK] Export complete: {test_dir}")
@@ -279,15 +436,21 @@ def export_data():
         print(f"  - {date_str}_TC.csv (8 thermocouples, C)")
         print(f"  - {date_str}_RL.csv (16 relay states, 1/0)")
         print(f"  - {date_str}_PSU.csv (PSU data)")
+        print(f"  - {date_str}_CV.csv ({CV_CHANNELS} cell voltages, V)")
         print(f"  - {date_str}_BGA_BGA01/02/03.csv (BGA data)")
         
+    except ExportCancelled:
+        raise
     except Exception as e:
         print(f"\nError: {e}")
         traceback.print_exc()
-        sys.exit(1)
+        raise
     finally:
         client.close()
 
 
 if __name__ == "__main__":
-    export_data()
+    try:
+        export_data()
+    except Exception:
+        sys.exit(1)
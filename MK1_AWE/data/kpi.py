@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Post-test KPIs from exported CSV data. Configuration in test_config.py
+
+Computes, for the whole test and for each active period:
+  - Stack power/energy from the PSU columns
+  - H2 production from the H2 flowrate (AI07, SLM)
+  - Specific energy (kWh/kg H2)
+  - Faraday efficiency against the measured current (AI03)
+  - Purity statistics per BGA
+
+All integrals are vectorized (one pass per column); samples are assigned to
+active periods with events.period_index(), and per-period sums use bincount.
+
+Writes kpi_summary.json (and kpi_periods.parquet, or .csv without a parquet
+engine) next to test_config.json.
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from test_config import (
+    ACTIVE_CURRENT_ON, ACTIVE_CURRENT_OFF, MIN_PERIOD_DURATION, STACK_CELLS
+)
+import events
+from dataset import TestDataset, BGA_IDS, bga_label
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gui'))
+from config_loader import load_sensor_labels
+
+FARADAY = 96485.332          # C/mol
+H2_MOLAR_MASS = 2.01588e-3   # kg/mol
+STANDARD_MOLAR_VOLUME = 22.414  # L/mol at 0 C, 1 atm (SLM reference)
+ELECTRONS_PER_H2 = 2
+MAX_GAP_S = 5.0              # Don't integrate across data gaps longer than this
+
+CURRENT_CHANNEL = 'AI03'     # Measured stack current [A]
+H2_FLOW_CHANNEL = 'AI07'     # H2 flowrate [SLM]
+
+
+def channel_column(df, channel, labels):
+    """Column for an analog channel in AIX_converted (label, or channel id)"""
+    channel_config = labels.get('analog_inputs', {}).get(channel, {})
+    label = channel_config.get('label', channel) if isinstance(channel_config, dict) else channel_config
+    for name in (label, channel):
+        if name in df.columns:
+            return name
+    return None
+
+
+def interval_seconds(times):
+    """Per-sample hold interval [s] (forward difference, gaps clipped to 0)"""
+    t = pd.Series(times).to_numpy('datetime64[ns]').view('int64')
+    dt = np.diff(t, append=t[-1]) / 1e9 if len(t) else np.array([])
+    dt[dt > MAX_GAP_S] = 0.0
+    return dt
+
+
+def period_sums(values, times, periods):
+    """Integral of values over time, total and per period"""
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    weighted = values * interval_seconds(times)
+    idx = events.period_index(times, periods)
+    per_period = np.bincount(idx[idx >= 0], weights=weighted[idx >= 0],
+                             minlength=len(periods[0]))
+    return weighted.sum(), per_period
+
+
+def _json_safe(value):
+    """Copy of a summary with NaN/inf (anywhere in dicts/lists) replaced by None"""
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else None
+    return value
+
+
+def _ratio(num, den):
+    """num / den elementwise, NaN where den is zero"""
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    return np.divide(num, den, out=np.full(np.broadcast(num, den).shape, np.nan), where=den != 0)
+
+
+def compute_kpis(dataset, labels=None):
+    """Compute test KPIs
+
+    Returns:
+        tuple: (summary dict, per-period DataFrame)
+    """
+    labels = labels if labels is not None else dataset.labels
+    df_psu = dataset.get('PSU')
+    df_aix = dataset.get('AIX_converted')
+
+    periods = events.active_periods(df_psu, ACTIVE_CURRENT_ON, ACTIVE_CURRENT_OFF,
+                                    MIN_PERIOD_DURATION)
+    starts, ends = periods
+    table = pd.DataFrame({
+        'start': starts,
+        'end': ends,
+        'duration_s': (ends - starts) / np.timedelta64(1, 's'),
+    })
+    totals = {'active_periods': int(len(starts)),
+              'active_duration_s': float(table['duration_s'].sum())}
+
+    # Power and energy (PSU)
+    power = None
+    if df_psu is not None and len(df_psu):
+        if 'power' in df_psu.columns:
+            power = df_psu['power']
+        elif {'voltage', 'current'} <= set(df_psu.columns):
+            power = df_psu['voltage'] * df_psu['current']
+        else:
+            print("  [!] PSU data has no power or voltage/current columns")
+    if power is not None:
+        energy_j, energy_p = period_sums(power, df_psu['timestamp'], periods)
+        idx = events.period_index(df_psu['timestamp'], periods)
+        in_period = idx >= 0
+        frame = {'p': power.to_numpy()[in_period], 'idx': idx[in_period]}
+        aggs = {'mean_power_w': ('p', 'mean'), 'max_power_w': ('p', 'max')}
+        for key, column, name in (('v', 'voltage', 'mean_voltage_v'), ('i', 'current', 'mean_current_a')):
+            if column in df_psu.columns:
+                frame[key] = df_psu[column].to_numpy()[in_period]
+                aggs[name] = (key, 'mean')
+        stats = pd.DataFrame(frame).groupby('idx').agg(**aggs)
+        table = table.join(stats.reindex(range(len(starts))))
+        table['energy_kwh'] = energy_p / 3.6e6
+        totals['energy_kwh'] = float(energy_j / 3.6e6)
+        totals['mean_power_w'] = float(np.nanmean(power)) if len(power) else None
+        totals['max_power_w'] = float(np.nanmax(power)) if len(power) else None
+
+    # H2 production and Faraday efficiency (AIX_converted)
+    if df_aix is not None and len(df_aix):
+        flow_col = channel_column(df_aix, H2_FLOW_CHANNEL, labels)
+        current_col = channel_column(df_aix, CURRENT_CHANNEL, labels)
+        times = df_aix['timestamp']
+
+        if flow_col:
+            # SLM -> mol/s; negative readings are zero-offset noise
+            mol_rate = df_aix[flow_col].clip(lower=0) / 60.0 / STANDARD_MOLAR_VOLUME
+            h2_mol, h2_mol_p = period_sums(mol_rate, times, periods)
+            table['h2_kg'] = h2_mol_p * H2_MOLAR_MASS
+            totals['h2_kg'] = float(h2_mol * H2_MOLAR_MASS)
+            totals['h2_normal_liters'] = float(h2_mol * STANDARD_MOLAR_VOLUME)
+
+        if current_col:
+            charge_c, charge_p = period_sums(df_aix[current_col].clip(lower=0), times, periods)
+            theoretical = STACK_CELLS * charge_c / (ELECTRONS_PER_H2 * FARADAY)
+            theoretical_p = STACK_CELLS * charge_p / (ELECTRONS_PER_H2 * FARADAY)
+            totals['charge_ah'] = float(charge_c / 3600.0)
+            if flow_col:
+                table['faraday_efficiency'] = _ratio(h2_mol_p, theoretical_p)
+                totals['faraday_efficiency'] = float(_ratio(h2_mol, theoretical))
+
+    if 'energy_kwh' in totals and 'h2_kg' in totals:
+        table['specific_energy_kwh_per_kg'] = _ratio(table['energy_kwh'], table['h2_kg'])
+        totals['specific_energy_kwh_per_kg'] = float(_ratio(totals['energy_kwh'], totals['h2_kg']))
+
+    # Purity statistics per BGA and period
+    purity = {}
+    for bga_id in BGA_IDS:
+        df_bga = dataset.bga(bga_id)
+        if df_bga is None or 'purity' not in df_bga.columns:
+            continue
+        label = bga_label(bga_id, labels)
+        values = df_bga['purity']
+        purity[label] = {
+            'mean': float(values.mean()), 'min': float(values.min()),
+            'max': float(values.max()), 'std': float(values.std()),
+        }
+        idx = events.period_index(df_bga['timestamp'], periods)
+        in_period = idx >= 0
+        stats = (values[in_period].groupby(idx[in_period])
+                 .agg(['mean', 'min', 'max', 'std'])
+                 .reindex(range(len(starts))))
+        key = label.replace(' ', '_').lower()
+        key = key if 'purity' in key else f'{key}_purity'
+        for stat in stats.columns:
+            table[f'{key}_{stat}'] = stats[stat].to_numpy()
+
+    summary = {
+        'test_dir': dataset.test_dir.name,
+        'settings': {
+            'active_current_on_a': ACTIVE_CURRENT_ON,
+            'active_current_off_a': ACTIVE_CURRENT_OFF,
+            'min_period_duration_s': MIN_PERIOD_DURATION,
+            'stack_cells': STACK_CELLS,
+            'current_channel': CURRENT_CHANNEL,
+            'h2_flow_channel': H2_FLOW_CHANNEL,
+        },
+        'totals': totals,
+        'purity': purity,
+        'periods': json.loads(table.to_json(orient='records', date_format='iso')),
+    }
+    return _json_safe(summary), table
+
+
+def write_kpis(test_dir, labels=None, dataset=None):
+    """Compute KPIs for a test directory and write the summary files
+
+    Args:
+        dataset: TestDataset for test_dir (reuses CSVs already parsed by
+            plotting); a new one is opened if omitted
+
+    Returns:
+        dict: The summary written to kpi_summary.json
+    """
+    test_dir = Path(test_dir)
+    if dataset is None:
+        dataset = TestDataset(test_dir, labels=labels if labels is not None else load_sensor_labels())
+    summary, table = compute_kpis(dataset)
+
+    with open(test_dir / 'kpi_summary.json', 'w') as f:
+        json.dump(summary, f, indent=2, allow_nan=False)
+    print(f"  KPI summary: kpi_summary.json")
+
+    try:
+        table.to_parquet(test_dir / 'kpi_periods.parquet', index=False)
+        print(f"  KPI periods: kpi_periods.parquet ({len(table)} periods)")
+    except ImportError:
+        # No pyarrow/fastparquet installed
+        table.to_csv(test_dir / 'kpi_periods.csv', index=False)
+        print(f"  KPI periods: kpi_periods.csv ({len(table)} periods)")
+
+    totals = summary['totals']
+    for key in ('energy_kwh', 'h2_kg', 'specific_energy_kwh_per_kg', 'faraday_efficiency'):
+        if totals.get(key) is not None:
+            print(f"    {key}: {totals[key]:.4g}")
+    return summary
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python kpi.py <test_dir>")
+        sys.exit(1)
+    write_kpis(sys.argv[1])
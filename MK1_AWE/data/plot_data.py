@@ -2,19 +2,32 @@
 """Generate plots from Gen3 CSV data. Configuration in test_config.py"""
 
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # File output only; safe off the GUI thread
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.collections import PolyCollection
 from pathlib import Path
 import os
+import io
+import time
+import contextlib
+import multiprocessing
 import numpy as np
 import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 
 # Import configuration from single source of truth
-from test_config import PLOT_DPI, PLOT_FORMAT, FIGURE_SIZE
+from test_config import PLOT_DPI, PLOT_FORMAT, FIGURE_SIZE, PLOT_WORKERS, PLOT_DECIMATE
+from test_config import ACTIVE_CURRENT_ON, ACTIVE_CURRENT_OFF, MIN_PERIOD_DURATION
+from decimate import decimate_series, pixel_columns, binned_mean
+import events
 
 # Import sensor labels
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gui'))
-from config_loader import load_sensor_labels
+from config_loader import load_sensor_labels, get_cell_channels
+from dataset import TestDataset, BGA_IDS, bga_label, cell_columns
 
 # Load labels once for all plots
 SENSOR_LABELS = load_sensor_labels()
@@ -22,6 +35,43 @@ SENSOR_LABELS = load_sensor_labels()
 # Which test directory to plot (auto-detects latest)
 TEST_DIR = None
 
+# (display name, plot function name, extra kwargs); names keep jobs picklable
+PLOT_JOBS = [
+    ("Analog Inputs", 'plot_analog_inputs', {}),
+    ("Temperatures", 'plot_temperatures', {}),
+    ("Pressures", 'plot_pressures', {}),
+    ("Flowrates", 'plot_flowrates', {}),
+    ("Current", 'plot_current', {}),
+    ("Voltage", 'plot_voltage', {}),
+    ("Power", 'plot_power', {}),
+    ("Gas Purity", 'plot_gas_purity', {'ylim': (0, 100)}),
+    ("Gas Purity (Detail)", 'plot_gas_purity', {'ylim': (90, 100), 'suffix': "_detail"}),
+    ("Voltages", 'plot_cell_voltages', {}),
+    ("Cell Voltage Heatmap", 'plot_cell_heatmap', {}),
+]
+
+# CSV groups each plot function reads ('BGA' = every BGA group). The parent
+# parses them once and ships the frames to pool workers with each job.
+PLOT_GROUPS = {
+    'plot_analog_inputs': ('AIX',),
+    'plot_temperatures': ('TC', 'BGA'),
+    'plot_gas_purity': ('BGA',),
+    'plot_cell_voltages': ('CV',),
+    'plot_cell_heatmap': ('CV',),
+    'plot_pressures': ('AIX_converted',),
+    'plot_flowrates': ('AIX_converted',),
+    'plot_current': ('AIX_converted', 'PSU'),
+    'plot_voltage': ('AIX_converted', 'PSU'),
+    'plot_power': ('PSU',),
+}
+
+# Test directory of the pool worker's jobs, set up by _init_worker
+_worker_test_dir = None
+
+
+class PlotCancelled(Exception):
+    """Raised when plotting is cancelled between plots"""
+
 
 def find_latest_test_dir():
     """Find the most recent test directory"""
@@ -35,68 +85,68 @@ def find_latest_test_dir():
 # Removed convert_mA_to_eng - plotting raw data only for Gen3
 
 
-def get_shading_periods(test_dir):
-    """Get purge and active periods for plot shading"""
-    date_str = test_dir.name.split('_')[0]
-    csv_dir = test_dir / 'csv'
-    
-    # Get BGA01 path using label
-    bga_labels_config = SENSOR_LABELS.get('bgas', {})
-    bga01_config = bga_labels_config.get('BGA01', {})
-    bga01_label = bga01_config.get('label', 'BGA01') if isinstance(bga01_config, dict) else 'BGA01'
-    bga_path = csv_dir / f"{date_str}_BGA_{bga01_label.replace(' ', '_')}.csv"
-    
-    psu_path = csv_dir / f"{date_str}_PSU.csv"
-    
-    purge_periods = []
-    active_periods = []
-    
-    # Get purge periods (secondary_gas = N2)
-    if bga_path.exists():
-        df_bga = pd.read_csv(bga_path, parse_dates=['timestamp'])
-        if 'secondary_gas' in df_bga.columns:
-            df_bga['is_purge'] = df_bga['secondary_gas'] == '7727-37-9'
-            purge_changes = df_bga['is_purge'].ne(df_bga['is_purge'].shift())
-            purge_groups = purge_changes.cumsum()
-            for group_id, group_df in df_bga[df_bga['is_purge']].groupby(purge_groups):
-                if not group_df.empty:
-                    purge_periods.append((group_df['timestamp'].min(), group_df['timestamp'].max()))
-    
-    # Get active periods (PSU current > 1A)
-    if psu_path.exists():
-        df_psu = pd.read_csv(psu_path, parse_dates=['timestamp'])
-        if 'current' in df_psu.columns:
-            df_psu['is_active'] = df_psu['current'] > 1.0
-            active_changes = df_psu['is_active'].ne(df_psu['is_active'].shift())
-            active_groups = active_changes.cumsum()
-            for group_id, group_df in df_psu[df_psu['is_active']].groupby(active_groups):
-                if not group_df.empty:
-                    active_periods.append((group_df['timestamp'].min(), group_df['timestamp'].max()))
+def get_shading_periods(dataset):
+    """Get purge and active periods for plot shading
+    
+    Returns:
+        tuple: (purge_periods, active_periods), each a (starts, ends) pair
+            of datetime64 arrays (see events.py)
+    """
+    # Purge periods (secondary_gas = N2)
+    purge_periods = events.purge_periods(dataset.bga('BGA01'), MIN_PERIOD_DURATION)
+    
+    # Active periods (PSU current above threshold, with hysteresis)
+    active_periods = events.active_periods(dataset.get('PSU'), ACTIVE_CURRENT_ON,
+                                           ACTIVE_CURRENT_OFF, MIN_PERIOD_DURATION)
     
     return purge_periods, active_periods
 
 
+def add_period_spans(ax, periods, **kwargs):
+    """Full-height spans for (starts, ends) periods as one PolyCollection"""
+    starts, ends = periods
+    if len(starts) == 0:
+        return None
+    x0 = mdates.date2num(starts)
+    x1 = mdates.date2num(ends)
+    verts = np.stack([np.column_stack([x0, np.zeros_like(x0)]),
+                      np.column_stack([x0, np.ones_like(x0)]),
+                      np.column_stack([x1, np.ones_like(x1)]),
+                      np.column_stack([x1, np.zeros_like(x1)])], axis=1)
+    # x in data coordinates, y in axes coordinates (like axvspan)
+    spans = PolyCollection(verts, transform=ax.get_xaxis_transform(), **kwargs)
+    ax.add_collection(spans, autolim=False)
+    return spans
+
+
 def add_shading(ax, purge_periods, active_periods):
     """Add purge and active period shading to a plot (no legend labels)"""
     # Purge periods (gray)
-    for start, end in purge_periods:
-        ax.axvspan(start, end, alpha=0.15, color='gray', zorder=0)
+    add_period_spans(ax, purge_periods, alpha=0.15, facecolor='gray', edgecolor='none', zorder=0)
     
     # Active periods (light blue)
-    for start, end in active_periods:
-        ax.axvspan(start, end, alpha=0.1, color='cyan', zorder=0)
+    add_period_spans(ax, active_periods, alpha=0.1, facecolor='cyan', edgecolor='none', zorder=0)
 
 
-def plot_analog_inputs(test_dir, plots_dir, purge_periods, active_periods):
+def plot_series(ax, x, y, **kwargs):
+    """ax.plot() with per-pixel min/max decimation (see PLOT_DECIMATE)
+    
+    The bin count is the figure's pixel width at PLOT_DPI, so the rendered
+    line is visually identical to plotting every sample.
+    """
+    if PLOT_DECIMATE:
+        x, y = decimate_series(x, y, pixel_columns(FIGURE_SIZE, PLOT_DPI))
+    return ax.plot(x, y, **kwargs)
+
+
+def plot_analog_inputs(dataset, plots_dir, purge_periods, active_periods):
     """Plot analog input channels (AI01-AI16) with activity > 1mA"""
-    csv_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_AIX.csv"
+    df = dataset.get('AIX')
     
-    if not csv_path.exists():
+    if df is None:
         print("  [!] AIX.csv not found")
         return
     
-    df = pd.read_csv(csv_path, parse_dates=['timestamp'])
-    
     fig, ax = plt.subplots(figsize=FIGURE_SIZE)
     
     # Add shading first (background)
@@ -107,7 +157,7 @@ def plot_analog_inputs(test_dir, plots_dir, purge_periods, active_periods):
     for i in range(1, 17):
         col = f'AI{i:02d}'
         if col in df.columns and df[col].max() > 1.0:
-            ax.plot(df['timestamp'], df[col], label=col, linewidth=0.8)
+            plot_series(ax, df['timestamp'], df[col], label=col, linewidth=0.8)
             plotted_channels += 1
     
     if plotted_channels == 0:
@@ -137,22 +187,8 @@ def plot_analog_inputs(test_dir, plots_dir, purge_periods, active_periods):
     print(f"  [OK] Analog Inputs -> {output_path.name} ({plotted_channels} channels)")
 
 
-def plot_temperatures(test_dir, plots_dir, purge_periods, active_periods):
+def plot_temperatures(dataset, plots_dir, purge_periods, active_periods):
     """Plot thermocouples (TC01-TC08) and BGA temperatures"""
-    csv_dir = test_dir / 'csv'
-    date_str = test_dir.name.split('_')[0]
-    tc_path = csv_dir / f"{date_str}_TC.csv"
-    
-    # Build BGA paths using labels from sensor_labels.yaml
-    bga_ids = ['BGA01', 'BGA02', 'BGA03']
-    bga_labels_config = SENSOR_LABELS.get('bgas', {})
-    bga_paths = []
-    for bga_id in bga_ids:
-        bga_config = bga_labels_config.get(bga_id, {})
-        bga_label = bga_config.get('label', bga_id) if isinstance(bga_config, dict) else bga_id
-        filename = f"{date_str}_BGA_{bga_label.replace(' ', '_')}.csv"
-        bga_paths.append(csv_dir / filename)
-    
     fig, ax = plt.subplots(figsize=FIGURE_SIZE)
     
     # Add shading first
@@ -162,8 +198,8 @@ def plot_temperatures(test_dir, plots_dir, purge_periods, active_periods):
     time_range = None
     
     # Plot thermocouples (column names are labels from CSV)
-    if tc_path.exists():
-        df_tc = pd.read_csv(tc_path, parse_dates=['timestamp'])
+    df_tc = dataset.get('TC')
+    if df_tc is not None:
         time_range = (df_tc['timestamp'].min(), df_tc['timestamp'].max())
         
         for col in df_tc.columns:
@@ -171,26 +207,21 @@ def plot_temperatures(test_dir, plots_dir, purge_periods, active_periods):
                 # Filter out invalid temps
                 valid_temps = (df_tc[col] > -200) & (df_tc[col] < 1500)
                 if valid_temps.any():
-                    ax.plot(df_tc['timestamp'], df_tc[col], label=col, linewidth=0.8, alpha=0.7)
+                    plot_series(ax, df_tc['timestamp'], df_tc[col], label=col, linewidth=0.8, alpha=0.7)
                     plotted_channels += 1
     
     # Plot BGA temperatures
     colors = ['red', 'orange', 'purple']
-    bga_ids = ['BGA01', 'BGA02', 'BGA03']
-    bga_labels_config = SENSOR_LABELS.get('bgas', {})
     
-    for idx, (bga_id, bga_path) in enumerate(zip(bga_ids, bga_paths)):
-        if bga_path.exists():
-            df_bga = pd.read_csv(bga_path, parse_dates=['timestamp'])
+    for idx, bga_id in enumerate(BGA_IDS):
+        df_bga = dataset.bga(bga_id)
+        if df_bga is not None:
             if time_range is None:
                 time_range = (df_bga['timestamp'].min(), df_bga['timestamp'].max())
             if 'temperature' in df_bga.columns:
-                # Get label
-                bga_config = bga_labels_config.get(bga_id, {})
-                bga_label = bga_config.get('label', bga_id) if isinstance(bga_config, dict) else bga_id
-                
-                ax.plot(df_bga['timestamp'], df_bga['temperature'], 
-                        label=f'{bga_label} Temp', linewidth=1.5, color=colors[idx], linestyle='--')
+                label = bga_label(bga_id, SENSOR_LABELS)
+                plot_series(ax, df_bga['timestamp'], df_bga['temperature'], 
+                        label=f'{label} Temp', linewidth=1.5, color=colors[idx], linestyle='--')
                 plotted_channels += 1
     
     if plotted_channels == 0:
@@ -221,21 +252,8 @@ def plot_temperatures(test_dir, plots_dir, purge_periods, active_periods):
     print(f"  [OK] Temperatures -> {output_path.name} ({plotted_channels} channels)")
 
 
-def plot_gas_purity(test_dir, plots_dir, purge_periods, active_periods, ylim=(0, 100), suffix=""):
+def plot_gas_purity(dataset, plots_dir, purge_periods, active_periods, ylim=(0, 100), suffix=""):
     """Plot BGA purity for all 3 BGAs with period shading"""
-    csv_dir = test_dir / 'csv'
-    date_str = test_dir.name.split('_')[0]
-    
-    # Build BGA paths using labels from sensor_labels.yaml
-    bga_ids = ['BGA01', 'BGA02', 'BGA03']
-    bga_labels_config = SENSOR_LABELS.get('bgas', {})
-    bga_paths = []
-    for bga_id in bga_ids:
-        bga_config = bga_labels_config.get(bga_id, {})
-        bga_label = bga_config.get('label', bga_id) if isinstance(bga_config, dict) else bga_id
-        filename = f"{date_str}_BGA_{bga_label.replace(' ', '_')}.csv"
-        bga_paths.append(csv_dir / filename)
-    
     fig, ax = plt.subplots(figsize=FIGURE_SIZE)
     
     # Add shading first
@@ -246,21 +264,15 @@ def plot_gas_purity(test_dir, plots_dir, purge_periods, active_periods, ylim=(0,
     
     # Plot all BGAs (file names include labels)
     colors = ['blue', 'green', 'purple']
-    bga_ids = ['BGA01', 'BGA02', 'BGA03']
-    bga_labels_config = SENSOR_LABELS.get('bgas', {})
     
-    for idx, (bga_id, bga_path) in enumerate(zip(bga_ids, bga_paths), start=0):
-        if bga_path.exists():
-            df_bga = pd.read_csv(bga_path, parse_dates=['timestamp'])
+    for idx, bga_id in enumerate(BGA_IDS):
+        df_bga = dataset.bga(bga_id)
+        if df_bga is not None:
             if time_range is None:
                 time_range = (df_bga['timestamp'].min(), df_bga['timestamp'].max())
             if 'purity' in df_bga.columns:
-                # Get label
-                bga_config = bga_labels_config.get(bga_id, {})
-                bga_label = bga_config.get('label', bga_id) if isinstance(bga_config, dict) else bga_id
-                
-                ax.plot(df_bga['timestamp'], df_bga['purity'], 
-                        label=bga_label, linewidth=1.5, marker='.', 
+                plot_series(ax, df_bga['timestamp'], df_bga['purity'], 
+                        label=bga_label(bga_id, SENSOR_LABELS), linewidth=1.5, marker='.', 
                         markersize=2, color=colors[idx])
                 plotted += 1
     
@@ -299,18 +311,17 @@ def plot_gas_purity(test_dir, plots_dir, purge_periods, active_periods, ylim=(0,
     print(f"  [OK] Gas Purity{' (Detail)' if suffix else ''} -> {output_path.name} ({plotted} BGAs)")
 
 
-def plot_cell_voltages(test_dir, plots_dir, purge_periods, active_periods):
-    """Plot stack voltage (CV001) and average cell voltage"""
-    csv_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_CV.csv"
+def plot_cell_voltages(dataset, plots_dir, purge_periods, active_periods):
+    """Plot stack voltage (CVM24P stack_channel) and average cell voltage"""
+    df = dataset.get('CV')
     
-    if not csv_path.exists():
-        print("  ⚠ CV.csv not found")
+    if df is None:
+        print("  [!] CV.csv not found")
         return
     
-    df = pd.read_csv(csv_path, parse_dates=['timestamp'])
-    
-    if 'CV001' not in df.columns:
-        print("  ⚠ CV001 not found in data")
+    stack_channel, cell_channels = get_cell_channels()
+    if stack_channel not in df.columns:
+        print(f"  [!] {stack_channel} not found in data")
         return
     
     fig, ax = plt.subplots(figsize=FIGURE_SIZE)
@@ -318,13 +329,13 @@ def plot_cell_voltages(test_dir, plots_dir, purge_periods, active_periods):
     # Add shading first
     add_shading(ax, purge_periods, active_periods)
     
-    # Plot CV001 (stack voltage)
-    ax.plot(df['timestamp'], df['CV001'], label='Stack Voltage (CV001)', 
+    # Plot stack voltage
+    plot_series(ax, df['timestamp'], df[stack_channel], label=f'Stack Voltage ({stack_channel})', 
              linewidth=1.5, color='blue')
     
-    # Plot average cell voltage (CV001 / 5)
-    avg_cell_voltage = df['CV001'] / 5
-    ax.plot(df['timestamp'], avg_cell_voltage, label='Average Cell Voltage', 
+    # Plot average cell voltage (stack voltage / active cells)
+    avg_cell_voltage = df[stack_channel] / len(cell_channels)
+    plot_series(ax, df['timestamp'], avg_cell_voltage, label='Average Cell Voltage', 
              linewidth=1.5, color='green', linestyle='--')
     
     # Reference lines
@@ -350,131 +361,50 @@ def plot_cell_voltages(test_dir, plots_dir, purge_periods, active_periods):
     plt.savefig(output_path, dpi=PLOT_DPI, format=PLOT_FORMAT)
     plt.close()
     
-    print(f"  ✓ Voltages → {output_path.name}")
-
-
-def plot_pressures(test_dir, plots_dir, purge_periods, active_periods):
-    """Plot pressure sensors (AI01, AI02)"""
-    csv_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_AIX.csv"
-    
-    if not csv_path.exists():
-        print("  [!] AIX.csv not found")
-        return
-    
-    df = pd.read_csv(csv_path, parse_dates=['timestamp'])
-    
-    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
-    add_shading(ax, purge_periods, active_periods)
-    
-    # Convert and plot AI01, AI02
-    for channel in ['AI01', 'AI02']:
-        if channel in df.columns and channel in SENSOR_CONVERSIONS:
-            config = SENSOR_CONVERSIONS[channel]
-            converted = df[channel].apply(lambda x: convert_mA_to_eng(x, config))
-            ax.plot(df['timestamp'], converted, label=config['label'], linewidth=1.5)
-    
-    ax.set_xlabel('Time')
-    ax.set_ylabel('Pressure [PSI]')
-    ax.set_title('Pressures')
-    ax.set_ylim(0, 1)
-    ax.set_xlim(df['timestamp'].min(), df['timestamp'].max())
-    ax.grid(True, alpha=0.3)
-    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.25), ncol=3, fontsize=8, frameon=False)
-    
-    # Format x-axis
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    # Save
-    output_path = plots_dir / f"pressures.{PLOT_FORMAT}"
-    plt.savefig(output_path, dpi=PLOT_DPI, format=PLOT_FORMAT)
-    plt.close()
-    
-    print(f"  ✓ Pressures → {output_path.name}")
+    print(f"  [OK] Voltages -> {output_path.name}")
 
 
-def plot_current(test_dir, plots_dir, purge_periods, active_periods):
-    """Plot actual and target current"""
-    csv_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_AIX.csv"
-    labjack_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_labjack.csv"
+def plot_cell_heatmap(dataset, plots_dir, purge_periods, active_periods):
+    """Plot the active cell voltages as a cell index x time heatmap
     
-    if not csv_path.exists():
-        print("  [!] AIX.csv not found")
-        return
-    
-    df = pd.read_csv(csv_path, parse_dates=['timestamp'])
+    Samples are averaged into one column per output pixel and drawn as a
+    single image, so render time does not grow with channels or duration.
+    Only the configured active cells are drawn (devices.yaml CVM24P
+    cell_channels); the stack channel would swamp the colour scale.
+    """
+    df = dataset.get('CV')
     
-    if 'AI03' not in df.columns or 'AI03' not in SENSOR_CONVERSIONS:
-        print("  ⚠ AI03 not configured")
+    if df is None:
+        print("  [!] CV.csv not found")
         return
     
-    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
-    add_shading(ax, purge_periods, active_periods)
-    
-    # Plot actual current (AI03)
-    config = SENSOR_CONVERSIONS['AI03']
-    actual_current = df['AI03'].apply(lambda x: convert_mA_to_eng(x, config))
-    ax.plot(df['timestamp'], actual_current, label='Actual Current', linewidth=1.5, color='blue')
-    
-    # Plot target current from LabJack (AIN0: 0-5V → 0-100A)
-    if labjack_path.exists():
-        df_lj = pd.read_csv(labjack_path, parse_dates=['timestamp'])
-        if 'AIN0_voltage' in df_lj.columns:
-            target_current = df_lj['AIN0_voltage'] * 20.0  # 0-5V → 0-100A
-            ax.plot(df_lj['timestamp'], target_current, label='Target Current', 
-                   linewidth=1.5, color='orange', linestyle='--', alpha=0.8)
-    
-    ax.set_xlabel('Time')
-    ax.set_ylabel('Current [A]')
-    ax.set_title('Current')
-    ax.set_ylim(0, 120)
-    ax.set_xlim(df['timestamp'].min(), df['timestamp'].max())
-    ax.grid(True, alpha=0.3)
-    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.25), ncol=3, fontsize=8, frameon=False)
-    
-    # Format x-axis
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    # Save
-    output_path = plots_dir / f"current.{PLOT_FORMAT}"
-    plt.savefig(output_path, dpi=PLOT_DPI, format=PLOT_FORMAT)
-    plt.close()
-    
-    print(f"  ✓ Current → {output_path.name}")
-
-
-def plot_flowrates(test_dir, plots_dir, purge_periods, active_periods):
-    """Plot flowrate sensors (AI04, AI05)"""
-    csv_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_AIX.csv"
-    
-    if not csv_path.exists():
-        print("  [!] AIX.csv not found")
+    cells = cell_columns(df)
+    if not cells or df.empty:
+        print("  [!] No cell voltage data")
         return
     
-    df = pd.read_csv(csv_path, parse_dates=['timestamp'])
+    image = binned_mean(df['timestamp'].to_numpy(), df[cells].to_numpy(dtype=np.float64, na_value=np.nan),
+                        pixel_columns(FIGURE_SIZE, PLOT_DPI)).T
+    finite = image[np.isfinite(image)]
+    vmin, vmax = np.percentile(finite, [1, 99]) if finite.size else (0, 1)
     
     fig, ax = plt.subplots(figsize=FIGURE_SIZE)
-    add_shading(ax, purge_periods, active_periods)
     
-    # Convert and plot AI04, AI05
-    for channel in ['AI04', 'AI05']:
-        if channel in df.columns and channel in SENSOR_CONVERSIONS:
-            config = SENSOR_CONVERSIONS[channel]
-            converted = df[channel].apply(lambda x: convert_mA_to_eng(x, config))
-            ax.plot(df['timestamp'], converted, label=config['label'], linewidth=1.5)
+    t0, t1 = mdates.date2num(df['timestamp'].min()), mdates.date2num(df['timestamp'].max())
+    im = ax.imshow(image, aspect='auto', interpolation='nearest', cmap='viridis',
+                     vmin=vmin, vmax=vmax, extent=(t0, t1, len(cells) + 0.5, 0.5))
+    fig.colorbar(im, ax=ax, label='Cell Voltage [V]', pad=0.01)
+    
+    # Active/purge periods as outlines (fills would hide the image)
+    add_period_spans(ax, active_periods, facecolor='none', edgecolor='white', linewidth=0.8)
+    add_period_spans(ax, purge_periods, facecolor='none', edgecolor='gray', linewidth=0.8, linestyle='--')
     
     ax.set_xlabel('Time')
-    ax.set_ylabel('Flowrate [L/min]')
-    ax.set_title('Flowrates')
-    ax.set_ylim(0, 10)
-    ax.set_xlim(df['timestamp'].min(), df['timestamp'].max())
-    ax.grid(True, alpha=0.3)
-    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.25), ncol=3, fontsize=8, frameon=False)
+    ax.set_ylabel('Cell')
+    ax.set_title('Cell Voltages')
+    ax.set_xlim(t0, t1)
+    ticks = np.unique(np.linspace(0, len(cells) - 1, min(len(cells), 13)).astype(int))
+    ax.set_yticks(ticks + 1, [cells[i] for i in ticks])
     
     # Format x-axis
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
@@ -483,23 +413,21 @@ def plot_flowrates(test_dir, plots_dir, purge_periods, active_periods):
     plt.tight_layout()
     
     # Save
-    output_path = plots_dir / f"flowrates.{PLOT_FORMAT}"
+    output_path = plots_dir / f"cell_heatmap.{PLOT_FORMAT}"
     plt.savefig(output_path, dpi=PLOT_DPI, format=PLOT_FORMAT)
     plt.close()
     
-    print(f"  ✓ Flowrates → {output_path.name}")
+    print(f"  [OK] Cell Voltage Heatmap -> {output_path.name} ({len(cells)} cells)")
 
 
-def plot_pressures(test_dir, plots_dir, purge_periods, active_periods):
+def plot_pressures(dataset, plots_dir, purge_periods, active_periods):
     """Plot pressure sensors from converted data"""
-    csv_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_AIX_converted.csv"
+    df = dataset.get('AIX_converted')
     
-    if not csv_path.exists():
+    if df is None:
         print("  [!] AIX_converted.csv not found")
         return
     
-    df = pd.read_csv(csv_path, parse_dates=['timestamp'])
-    
     fig, ax = plt.subplots(figsize=FIGURE_SIZE)
     add_shading(ax, purge_periods, active_periods)
     
@@ -507,7 +435,7 @@ def plot_pressures(test_dir, plots_dir, purge_periods, active_periods):
     plotted = 0
     for col in df.columns:
         if col != 'timestamp' and 'Pressure' in col:  # Match columns with "Pressure" in name
-            ax.plot(df['timestamp'], df[col], label=col, linewidth=1.5)
+            plot_series(ax, df['timestamp'], df[col], label=col, linewidth=1.5)
             plotted += 1
     
     if plotted == 0:
@@ -537,16 +465,14 @@ def plot_pressures(test_dir, plots_dir, purge_periods, active_periods):
     print(f"  [OK] Pressures -> {output_path.name} ({plotted} channels)")
 
 
-def plot_flowrates(test_dir, plots_dir, purge_periods, active_periods):
+def plot_flowrates(dataset, plots_dir, purge_periods, active_periods):
     """Plot flowrate sensors from converted data"""
-    csv_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_AIX_converted.csv"
+    df = dataset.get('AIX_converted')
     
-    if not csv_path.exists():
+    if df is None:
         print("  [!] AIX_converted.csv not found")
         return
     
-    df = pd.read_csv(csv_path, parse_dates=['timestamp'])
-    
     fig, ax = plt.subplots(figsize=FIGURE_SIZE)
     add_shading(ax, purge_periods, active_periods)
     
@@ -554,7 +480,7 @@ def plot_flowrates(test_dir, plots_dir, purge_periods, active_periods):
     plotted = 0
     for col in df.columns:
         if col != 'timestamp' and 'Flowrate' in col:
-            ax.plot(df['timestamp'], df[col], label=col, linewidth=1.5, color='blue')
+            plot_series(ax, df['timestamp'], df[col], label=col, linewidth=1.5, color='blue')
             plotted += 1
     
     if plotted == 0:
@@ -584,10 +510,8 @@ def plot_flowrates(test_dir, plots_dir, purge_periods, active_periods):
     print(f"  [OK] Flowrate -> {output_path.name}")
 
 
-def plot_current(test_dir, plots_dir, purge_periods, active_periods):
+def plot_current(dataset, plots_dir, purge_periods, active_periods):
     """Plot measured current and PSU current"""
-    aix_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_AIX_converted.csv"
-    psu_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_PSU.csv"
     
     fig, ax = plt.subplots(figsize=FIGURE_SIZE)
     add_shading(ax, purge_periods, active_periods)
@@ -596,24 +520,24 @@ def plot_current(test_dir, plots_dir, purge_periods, active_periods):
     plotted = 0
     
     # Plot measured current (column name is label from CSV)
-    if aix_path.exists():
-        df_aix = pd.read_csv(aix_path, parse_dates=['timestamp'])
+    df_aix = dataset.get('AIX_converted')
+    if df_aix is not None:
         time_range = (df_aix['timestamp'].min(), df_aix['timestamp'].max())
         # Find current column
         for col in df_aix.columns:
             if col != 'timestamp' and 'Current' in col:
-                ax.plot(df_aix['timestamp'], df_aix[col], label=col, linewidth=1.5, color='blue')
+                plot_series(ax, df_aix['timestamp'], df_aix[col], label=col, linewidth=1.5, color='blue')
                 plotted += 1
                 break
     
     # Plot PSU current
-    if psu_path.exists():
-        df_psu = pd.read_csv(psu_path, parse_dates=['timestamp'])
+    df_psu = dataset.get('PSU')
+    if df_psu is not None:
         if time_range is None:
             time_range = (df_psu['timestamp'].min(), df_psu['timestamp'].max())
         if 'current' in df_psu.columns and 'set_current_rb' in df_psu.columns:
-            ax.plot(df_psu['timestamp'], df_psu['current'], label='PSU Actual', linewidth=1.5, color='green')
-            ax.plot(df_psu['timestamp'], df_psu['set_current_rb'], label='PSU Set', linewidth=1.5, color='orange', linestyle='--')
+            plot_series(ax, df_psu['timestamp'], df_psu['current'], label='PSU Actual', linewidth=1.5, color='green')
+            plot_series(ax, df_psu['timestamp'], df_psu['set_current_rb'], label='PSU Set', linewidth=1.5, color='orange', linestyle='--')
             plotted += 2
     
     if plotted == 0:
@@ -644,10 +568,8 @@ def plot_current(test_dir, plots_dir, purge_periods, active_periods):
     print(f"  [OK] Current -> {output_path.name}")
 
 
-def plot_voltage(test_dir, plots_dir, purge_periods, active_periods):
+def plot_voltage(dataset, plots_dir, purge_periods, active_periods):
     """Plot measured voltage and PSU voltage"""
-    aix_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_AIX_converted.csv"
-    psu_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_PSU.csv"
     
     fig, ax = plt.subplots(figsize=FIGURE_SIZE)
     add_shading(ax, purge_periods, active_periods)
@@ -656,24 +578,24 @@ def plot_voltage(test_dir, plots_dir, purge_periods, active_periods):
     plotted = 0
     
     # Plot measured voltage (column name is label from CSV)
-    if aix_path.exists():
-        df_aix = pd.read_csv(aix_path, parse_dates=['timestamp'])
+    df_aix = dataset.get('AIX_converted')
+    if df_aix is not None:
         time_range = (df_aix['timestamp'].min(), df_aix['timestamp'].max())
         # Find voltage column
         for col in df_aix.columns:
             if col != 'timestamp' and 'Voltage' in col:
-                ax.plot(df_aix['timestamp'], df_aix[col], label=col, linewidth=1.5, color='blue')
+                plot_series(ax, df_aix['timestamp'], df_aix[col], label=col, linewidth=1.5, color='blue')
                 plotted += 1
                 break
     
     # Plot PSU voltage
-    if psu_path.exists():
-        df_psu = pd.read_csv(psu_path, parse_dates=['timestamp'])
+    df_psu = dataset.get('PSU')
+    if df_psu is not None:
         if time_range is None:
             time_range = (df_psu['timestamp'].min(), df_psu['timestamp'].max())
         if 'voltage' in df_psu.columns and 'set_voltage_rb' in df_psu.columns:
-            ax.plot(df_psu['timestamp'], df_psu['voltage'], label='PSU Actual', linewidth=1.5, color='green')
-            ax.plot(df_psu['timestamp'], df_psu['set_voltage_rb'], label='PSU Set', linewidth=1.5, color='orange', linestyle='--')
+            plot_series(ax, df_psu['timestamp'], df_psu['voltage'], label='PSU Actual', linewidth=1.5, color='green')
+            plot_series(ax, df_psu['timestamp'], df_psu['set_voltage_rb'], label='PSU Set', linewidth=1.5, color='orange', linestyle='--')
             plotted += 2
     
     if plotted == 0:
@@ -704,16 +626,14 @@ def plot_voltage(test_dir, plots_dir, purge_periods, active_periods):
     print(f"  [OK] Voltage -> {output_path.name}")
 
 
-def plot_power(test_dir, plots_dir, purge_periods, active_periods):
+def plot_power(dataset, plots_dir, purge_periods, active_periods):
     """Plot PSU power"""
-    csv_path = test_dir / 'csv' / f"{test_dir.name.split('_')[0]}_PSU.csv"
+    df = dataset.get('PSU')
     
-    if not csv_path.exists():
+    if df is None:
         print("  [!] PSU.csv not found")
         return
     
-    df = pd.read_csv(csv_path, parse_dates=['timestamp'])
-    
     if 'power' not in df.columns:
         print("  [!] No power data")
         return
@@ -722,7 +642,7 @@ def plot_power(test_dir, plots_dir, purge_periods, active_periods):
     add_shading(ax, purge_periods, active_periods)
     
     # Plot power (convert W to kW)
-    ax.plot(df['timestamp'], df['power'] / 1000, linewidth=1.5, color='green')
+    plot_series(ax, df['timestamp'], df['power'] / 1000, linewidth=1.5, color='green')
     
     ax.set_xlabel('Time')
     ax.set_ylabel('Power [kW]')
@@ -745,16 +665,125 @@ def plot_power(test_dir, plots_dir, purge_periods, active_periods):
     print(f"  [OK] Power -> {output_path.name}")
 
 
-def plot_psu_data(test_dir, plots_dir):
+def plot_psu_data(dataset, plots_dir):
     """Deprecated - replaced by individual voltage/current/power plots"""
     pass
 
 
-def generate_plots():
-    """Generate all plots from CSV data"""
+def _init_worker(test_dir, settings):
+    """Pool initializer: apply the parent's plot settings"""
+    global _worker_test_dir, PLOT_DPI, PLOT_FORMAT, FIGURE_SIZE, PLOT_DECIMATE
+    PLOT_DPI, PLOT_FORMAT, FIGURE_SIZE, PLOT_DECIMATE = settings
+    _worker_test_dir = test_dir
+
+
+def _job_groups(job, dataset):
+    """CSV groups a plot job reads (see PLOT_GROUPS)"""
+    groups = []
+    for group in PLOT_GROUPS.get(job[1], ()):
+        groups += [dataset.bga_group(bga_id) for bga_id in BGA_IDS] if group == 'BGA' else [group]
+    return groups
+
+
+def _render_job(job, plots_dir, shading, dataset=None, frames=None):
+    """Render one plot job, returning (name, seconds, captured output)
+    
+    In a pool worker the job's frames come from the parent, so no CSV is
+    parsed more than once however the jobs are spread across workers.
+    """
+    name, func_name, kwargs = job
+    if dataset is None:
+        dataset = TestDataset(_worker_test_dir, labels=SENSOR_LABELS, frames=frames)
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        globals()[func_name](dataset, plots_dir, *shading, **kwargs)
+    return name, time.perf_counter() - start, output.getvalue()
+
+
+def _report(name, elapsed, output, timings):
+    """Print a job's captured output with its render time appended"""
+    timings[name] = elapsed
+    lines = output.rstrip().splitlines() or [f"  [OK] {name}"]
+    lines[-1] += f" [{elapsed:.1f}s]"
+    print("\n".join(lines))
+
+
+def _plot_workers(job_count):
+    """Number of worker processes (PLOT_WORKERS: 0 = auto, 1 = serial)"""
+    if PLOT_WORKERS and PLOT_WORKERS > 0:
+        return min(PLOT_WORKERS, job_count)
+    return max(1, min(os.cpu_count() or 1, job_count))
+
+
+def _render_serial(jobs, dataset, plots_dir, shading, timings, progress, should_cancel):
+    """Render jobs one after another in this process"""
+    for index, job in enumerate(jobs, start=1):
+        name = job[0]
+        if should_cancel and should_cancel():
+            print("  [!] Plotting cancelled")
+            raise PlotCancelled(f"Cancelled before {name}")
+        if progress:
+            progress(f"Plotting {name} ({index}/{len(jobs)})")
+        _report(*_render_job(job, plots_dir, shading, dataset), timings)
+
+
+def _render_parallel(jobs, dataset, plots_dir, shading, workers, timings, progress, should_cancel):
+    """Render jobs in a process pool; returns jobs left unrendered if the pool broke
+    
+    CSVs are parsed here, once, and each job is sent the frames it reads.
+    """
+    # spawn: never fork a process that may be running Qt threads
+    context = multiprocessing.get_context('spawn')
+    settings = (PLOT_DPI, PLOT_FORMAT, FIGURE_SIZE, PLOT_DECIMATE)
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(dataset.test_dir, settings))
+    futures = {executor.submit(_render_job, job, plots_dir, shading,
+                               frames=dataset.frames(_job_groups(job, dataset))): job
+               for job in jobs}
+    pending = set(futures)
+    try:
+        if progress:
+            progress(f"Plotting {len(jobs)} plots on {workers} processes")
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                _report(*future.result(), timings)
+                if progress:
+                    progress(f"Plotted {futures[future][0]} ({len(timings)}/{len(jobs)})")
+            if pending and should_cancel and should_cancel():
+                print("  [!] Plotting cancelled")
+                raise PlotCancelled(f"Cancelled with {len(pending)} plots remaining")
+    except BrokenProcessPool:
+        print("  [!] Plot worker pool failed, rendering remaining plots serially")
+        return [job for job in jobs if job[0] not in timings]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return []
+
+
+def generate_plots(test_dir=None, progress=None, should_cancel=None, dataset=None):
+    """Generate all plots from CSV data
+    
+    Plots are rendered in parallel worker processes (see PLOT_WORKERS in
+    test_config.py) and each plot's render time is reported.
+    
+    Args:
+        test_dir: Test directory to plot (defaults to TEST_DIR or the latest)
+        progress: Optional callback(message) invoked as plots start/finish
+        should_cancel: Optional callable; checked between plots, raises
+            PlotCancelled when it returns True
+        dataset: Optional TestDataset for test_dir to share parsed CSVs
+            with later steps (KPIs, polarization)
+    
+    Returns:
+        dict: Render time [s] per plot name (None if test_dir is missing)
+    """
     
     # Find test directory
-    if TEST_DIR:
+    if test_dir is not None:
+        test_dir = Path(test_dir)
+    elif TEST_DIR:
         test_dir = Path(__file__).parent / TEST_DIR
     else:
         test_dir = find_latest_test_dir()
@@ -771,29 +800,35 @@ def generate_plots():
     print(f"Gen3 AWE Data Plotting")
     print("=" * 60)
     print(f"Test directory: {test_dir.name}")
-    print(f"Output: {plots_dir.relative_to(Path(__file__).parent)}/")
+    print(f"Output: {test_dir.name}/{plots_dir.name}/")
     print()
     
+    # Each CSV is parsed once, on first use, and shared by every plot
+    if dataset is None:
+        dataset = TestDataset(test_dir, labels=SENSOR_LABELS)
+    
     # Get shading periods (purge/active) for context
-    purge_periods, active_periods = get_shading_periods(test_dir)
+    shading = get_shading_periods(dataset)
     
     # Generate Gen3 plots
-    plot_analog_inputs(test_dir, plots_dir, purge_periods, active_periods)
-    plot_temperatures(test_dir, plots_dir, purge_periods, active_periods)
-    plot_pressures(test_dir, plots_dir, purge_periods, active_periods)
-    plot_flowrates(test_dir, plots_dir, purge_periods, active_periods)
-    plot_current(test_dir, plots_dir, purge_periods, active_periods)
-    plot_voltage(test_dir, plots_dir, purge_periods, active_periods)
-    plot_power(test_dir, plots_dir, purge_periods, active_periods)
-    plot_gas_purity(test_dir, plots_dir, purge_periods, active_periods, ylim=(0, 100))
-    plot_gas_purity(test_dir, plots_dir, purge_periods, active_periods, ylim=(90, 100), suffix="_detail")
+    jobs = list(PLOT_JOBS)
+    workers = _plot_workers(len(jobs))
+    timings = {}
+    start = time.perf_counter()
+    if workers > 1:
+        jobs = _render_parallel(jobs, dataset, plots_dir, shading, workers,
+                                timings, progress, should_cancel)
+    _render_serial(jobs, dataset, plots_dir, shading, timings, progress, should_cancel)
+    elapsed = time.perf_counter() - start
     
     print()
     print("=" * 60)
     print(f"[OK] Plots saved to: {plots_dir}")
+    print(f"Render time: {elapsed:.1f}s wall, {sum(timings.values()):.1f}s total "
+          f"across {len(timings)} plots ({workers} process{'es' if workers > 1 else ''})")
     print("=" * 60)
+    return timings
 
 
 if __name__ == "__main__":
     generate_plots()
-
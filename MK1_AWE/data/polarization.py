@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Polarization (IV) curve extraction from ramp and step data. Configuration in test_config.py
+
+Current ramps (PSU panel ramp_steps x ramp_step_duration) and step profiles
+hold the stack at a series of current plateaus. A sample is steady when the
+rolling standard deviation of the PSU current over PLATEAU_WINDOW stays below
+PLATEAU_CURRENT_TOL; the trailing window also skips the transient after
+each step. Runs of steady samples become plateaus, and stack voltage, cell
+voltages (CV group) and temperatures (TC group) are averaged per plateau.
+
+Writes polarization_curve.csv next to test_config.json and
+plots/polarization_curve.<PLOT_FORMAT>.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # File output only; safe off the GUI thread
+import matplotlib.pyplot as plt
+
+from test_config import (
+    PLOT_DPI, PLOT_FORMAT, FIGURE_SIZE, ACTIVE_CURRENT_ON,
+    PLATEAU_WINDOW, PLATEAU_CURRENT_TOL, PLATEAU_MIN_DURATION
+)
+import events
+from dataset import TestDataset, cell_columns
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gui'))
+from config_loader import load_sensor_labels
+
+
+def steady_mask(times, values, window_s, tolerance):
+    """True where the trailing rolling std of values is below tolerance"""
+    series = pd.Series(np.asarray(values, dtype=np.float64),
+                       index=pd.DatetimeIndex(pd.Series(times).to_numpy()))
+    rolling = series.rolling(pd.Timedelta(seconds=window_s), min_periods=2)
+    std = rolling.std().to_numpy()
+    # Require a full window of history so a step's transient is excluded
+    span = (series.index - series.index[0]) >= pd.Timedelta(seconds=window_s) if len(series) else []
+    return (std < tolerance) & np.asarray(span, dtype=bool)
+
+
+def detect_plateaus(df_psu):
+    """Steady current plateaus above the active threshold
+
+    Returns:
+        tuple: (starts, ends) datetime64 arrays (see events.py)
+    """
+    if df_psu is None or 'current' not in df_psu.columns or df_psu.empty:
+        return events.empty_periods()
+    current = df_psu['current'].to_numpy(dtype=np.float64)
+    mask = steady_mask(df_psu['timestamp'], current, PLATEAU_WINDOW, PLATEAU_CURRENT_TOL)
+    mask &= current > ACTIVE_CURRENT_ON
+    return events.detect_periods(df_psu['timestamp'], mask, PLATEAU_MIN_DURATION)
+
+
+def plateau_means(df, plateaus, columns, prefix=''):
+    """Per-plateau mean of the given columns, indexed by plateau"""
+    if df is None or not columns:
+        return None
+    idx = events.period_index(df['timestamp'], plateaus)
+    inside = idx >= 0
+    grouped = df.loc[inside, columns].groupby(idx[inside])
+    means = grouped.mean().add_prefix(prefix)
+    return means.reindex(range(len(plateaus[0])))
+
+
+def extract_curve(dataset):
+    """Build the polarization table, one row per plateau (in time order)"""
+    df_psu = dataset.get('PSU')
+    if df_psu is not None and 'voltage' not in df_psu.columns:
+        print("  [!] PSU voltage not found, no polarization curve")
+        df_psu = None
+    plateaus = detect_plateaus(df_psu)
+    starts, ends = plateaus
+    table = pd.DataFrame({
+        'start': starts,
+        'end': ends,
+        'duration_s': (ends - starts) / np.timedelta64(1, 's'),
+    })
+    if len(starts) == 0:
+        return table
+
+    idx = events.period_index(df_psu['timestamp'], plateaus)
+    inside = idx >= 0
+    psu = df_psu.loc[inside, ['current', 'voltage']].groupby(idx[inside])
+    stats = psu.agg(['mean', 'std']).reindex(range(len(starts)))
+    table['current_a'] = stats[('current', 'mean')].to_numpy()
+    table['current_std_a'] = stats[('current', 'std')].to_numpy()
+    table['stack_voltage_v'] = stats[('voltage', 'mean')].to_numpy()
+    table['stack_voltage_std_v'] = stats[('voltage', 'std')].to_numpy()
+
+    # Cell voltages: per-cell plateau means plus summary across the active cells
+    # (stack channel and unused channels excluded, as in the cell plots)
+    df_cv = dataset.get('CV')
+    if df_cv is not None:
+        cells = cell_columns(df_cv)
+        cell_means = plateau_means(df_cv, plateaus, cells)
+        if cell_means is not None:
+            table['cell_voltage_mean_v'] = cell_means.mean(axis=1).to_numpy()
+            table['cell_voltage_min_v'] = cell_means.min(axis=1).to_numpy()
+            table['cell_voltage_max_v'] = cell_means.max(axis=1).to_numpy()
+            table = table.join(cell_means)
+
+    # Temperatures (thermocouples, labelled columns)
+    df_tc = dataset.get('TC')
+    if df_tc is not None:
+        tc_cols = [c for c in df_tc.columns if c != 'timestamp']
+        tc_means = plateau_means(df_tc, plateaus, tc_cols, prefix='temp_')
+        if tc_means is not None:
+            table = table.join(tc_means)
+
+    return table
+
+
+def plot_curve(table, plots_dir):
+    """Stack voltage (and mean cell voltage) against current"""
+    if table.empty or 'current_a' not in table.columns:
+        print("  [!] No current plateaus found")
+        return None
+
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
+    ax.errorbar(table['current_a'], table['stack_voltage_v'], yerr=table['stack_voltage_std_v'],
+                marker='o', markersize=4, linewidth=1.0, capsize=2, color='blue',
+                label='Stack Voltage')
+    ax.set_xlabel('Current [A]')
+    ax.set_ylabel('Stack Voltage [V]')
+    ax.set_title('Polarization Curve')
+    ax.grid(True, alpha=0.3)
+    handles, labels = ax.get_legend_handles_labels()
+
+    if 'cell_voltage_mean_v' in table.columns:
+        ax2 = ax.twinx()
+        ax2.plot(table['current_a'], table['cell_voltage_mean_v'], marker='s', markersize=3,
+                 linewidth=1.0, linestyle='--', color='green', label='Mean Cell Voltage')
+        by_current = table.sort_values('current_a')
+        ax2.fill_between(by_current['current_a'], by_current['cell_voltage_min_v'],
+                         by_current['cell_voltage_max_v'], color='green', alpha=0.1,
+                         label='Cell Min/Max')
+        ax2.set_ylabel('Cell Voltage [V]')
+        h2, l2 = ax2.get_legend_handles_labels()
+        handles, labels = handles + h2, labels + l2
+
+    ax.legend(handles, labels, loc='upper left', fontsize=8)
+    plt.tight_layout()
+
+    output_path = Path(plots_dir) / f"polarization_curve.{PLOT_FORMAT}"
+    plt.savefig(output_path, dpi=PLOT_DPI, format=PLOT_FORMAT)
+    plt.close()
+    print(f"  [OK] Polarization Curve -> {output_path.name} ({len(table)} plateaus)")
+    return output_path
+
+
+def write_polarization(test_dir, labels=None, dataset=None):
+    """Extract the polarization curve for a test directory and save table + plot
+
+    Args:
+        dataset: TestDataset for test_dir (reuses CSVs already parsed by
+            plotting and KPIs); a new one is opened if omitted
+
+    Returns:
+        pd.DataFrame: One row per plateau
+    """
+    test_dir = Path(test_dir)
+    if dataset is None:
+        dataset = TestDataset(test_dir, labels=labels if labels is not None else load_sensor_labels())
+    table = extract_curve(dataset)
+
+    table.to_csv(test_dir / 'polarization_curve.csv', index=False, float_format='%.6f')
+    print(f"  Polarization table: polarization_curve.csv ({len(table)} plateaus)")
+
+    plots_dir = test_dir / 'plots'
+    plots_dir.mkdir(exist_ok=True)
+    plot_curve(table, plots_dir)
+    return table
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python polarization.py <test_dir>")
+        sys.exit(1)
+    write_polarization(sys.argv[1])
@@ -5,10 +5,10 @@ Gen3 AWE Complete Test Data Processing Pipeline
 Edit test_config.py to configure, then run: python process_test.py
 """
 
-import subprocess
 import sys
 import json
 import shutil
+import traceback
 from pathlib import Path
 from datetime import datetime
 
@@ -16,41 +16,66 @@ from datetime import datetime
 from test_config import (
     TEST_NAME, START_TIME, STOP_TIME, START_TIME_UTC, STOP_TIME_UTC,
     DOWNSAMPLE_AIX, DOWNSAMPLE_TC, DOWNSAMPLE_PSU, DOWNSAMPLE_BGA, DOWNSAMPLE_RL,
-    DOWNSAMPLE_FUNCTION, PLOT_DPI, PLOT_FORMAT, FIGURE_SIZE
+    DOWNSAMPLE_FUNCTION, PLOT_DPI, PLOT_FORMAT, FIGURE_SIZE, PLOT_WORKERS
 )
+import export_csv
+import plot_data
+import kpi
+import polarization
+from dataset import TestDataset
 
 
-def run_export():
-    """Run CSV export (uses test_config.py)"""
+def run_export(progress=None, should_cancel=None):
+    """Run CSV export in-process (uses test_config.py)"""
     print("=" * 70)
     print("STEP 1: Exporting CSV data from InfluxDB")
     print("=" * 70)
     print()
     
-    export_script = Path(__file__).parent / 'export_csv.py'
-    result = subprocess.run([sys.executable, str(export_script)])
-    
-    if result.returncode != 0:
-        print("\n[ERROR] CSV export failed")
-        sys.exit(1)
+    export_csv.export_data(progress=progress, should_cancel=should_cancel)
     
     print()
 
 
-def run_plotting():
-    """Generate plots (uses test_config.py)"""
+def run_plotting(output_dir, progress=None, should_cancel=None, dataset=None):
+    """Generate plots in-process (uses test_config.py)"""
     print("=" * 70)
     print("STEP 2: Generating plots from CSV data")
     print("=" * 70)
     print()
     
-    plot_script = Path(__file__).parent / 'plot_data.py'
-    result = subprocess.run([sys.executable, str(plot_script)])
+    plot_data.generate_plots(output_dir, progress=progress, should_cancel=should_cancel,
+                             dataset=dataset)
     
-    if result.returncode != 0:
-        print("\n[ERROR] Plotting failed")
-        sys.exit(1)
+    print()
+
+
+def run_kpis(output_dir, progress=None, dataset=None):
+    """Compute KPIs (energy, H2, efficiency, purity) and the polarization curve
+    
+    A failure is reported and skipped: the CSVs and plots are already written.
+    """
+    print("=" * 70)
+    print("STEP 3: Computing KPIs")
+    print("=" * 70)
+    print()
     
+    if progress:
+        progress("Computing KPIs")
+    try:
+        kpi.write_kpis(output_dir, dataset=dataset)
+    except Exception as e:
+        print(f"  [ERROR] KPI summary failed: {e}")
+        traceback.print_exc()
+    print()
+    
+    if progress:
+        progress("Extracting polarization curve")
+    try:
+        polarization.write_polarization(output_dir, dataset=dataset)
+    except Exception as e:
+        print(f"  [ERROR] Polarization curve failed: {e}")
+        traceback.print_exc()
     print()
 
 
@@ -77,7 +102,8 @@ def save_test_config(output_dir):
         'plot_settings': {
             'dpi': PLOT_DPI,
             'format': PLOT_FORMAT,
-            'figure_size': FIGURE_SIZE
+            'figure_size': FIGURE_SIZE,
+            'workers': PLOT_WORKERS
         }
     }
     
@@ -95,16 +121,19 @@ def save_test_config(output_dir):
     print(f"  Devices snapshot: devices.yaml")
 
 
-def main():
-    """Main processing pipeline"""
-    print()
-    print("=" * 70)
-    print("GEN3 AWE TEST DATA PROCESSING")
-    print("=" * 70)
-    print(f"Test: {TEST_NAME}")
-    print(f"Time: {START_TIME.strftime('%Y-%m-%d %H:%M')} to {STOP_TIME.strftime('%H:%M %Z')}")
-    print()
+def run_pipeline(progress=None, should_cancel=None):
+    """Run export, plotting and KPI analysis in the current process
+    
+    Args:
+        progress: Optional callback(message) for per-group progress
+        should_cancel: Optional callable checked between groups
+    
+    Returns:
+        Path: Output directory for this test
     
+    Raises:
+        export_csv.ExportCancelled, plot_data.PlotCancelled: If cancelled
+    """
     # Create output directory
     date_str = START_TIME.strftime('%Y-%m-%d')
     output_dir = Path(__file__).parent / f"{date_str}_{TEST_NAME}"
@@ -116,10 +145,35 @@ def main():
     print()
     
     # Step 1: Export CSVs
-    run_export()
+    run_export(progress, should_cancel)
+    
+    # Each CSV is parsed once and shared by plots, KPIs and polarization
+    dataset = TestDataset(output_dir, labels=plot_data.SENSOR_LABELS)
     
     # Step 2: Generate plots
-    run_plotting()
+    run_plotting(output_dir, progress, should_cancel, dataset)
+    
+    # Step 3: KPI summary
+    run_kpis(output_dir, progress, dataset)
+    
+    return output_dir
+
+
+def main():
+    """Main processing pipeline"""
+    print()
+    print("=" * 70)
+    print("GEN3 AWE TEST DATA PROCESSING")
+    print("=" * 70)
+    print(f"Test: {TEST_NAME}")
+    print(f"Time: {START_TIME.strftime('%Y-%m-%d %H:%M')} to {STOP_TIME.strftime('%H:%M %Z')}")
+    print()
+    
+    try:
+        output_dir = run_pipeline()
+    except Exception as e:
+        print(f"\n[ERROR] Processing failed: {e}")
+        sys.exit(1)
     
     print("=" * 70)
     print("[OK] PROCESSING COMPLETE")
@@ -128,10 +182,11 @@ def main():
     print(f"Output directory: {output_dir.name}/")
     print("  - CSVs: YYYY-MM-DD_*.csv")
     print("  - Plots: plots/*.jpg")
+    print("  - KPIs: kpi_summary.json, kpi_periods.parquet")
+    print("  - Polarization: polarization_curve.csv, plots/polarization_curve.jpg")
     print("  - Config: test_config.json, devices.yaml")
     print()
 
 
 if __name__ == "__main__":
     main()
-
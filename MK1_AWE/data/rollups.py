@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""InfluxDB rollup (downsampling) provisioning and source selection
+
+Rollup tiers are configured in config/devices.yaml (rollups section). Each tier
+has its own bucket, filled by an InfluxDB task that writes the mean, min and
+max of every numeric field per window, tagged fn=mean|min|max. The first tier
+reads the raw bucket; each further tier cascades from the one before it.
+
+Run this script to create/update the buckets and tasks:
+    python rollups.py              # provision buckets + tasks
+    python rollups.py --dry-run    # print the task Flux only
+    python rollups.py --backfill-days 7   # also roll up existing raw data
+
+Provisioning records from when each tier bucket is complete (task creation
+or backfill start) in config/rollup_coverage.json. export_csv.py calls
+select_source() to read the coarsest usable tier; a tier with no recorded
+coverage, or coverage starting after the query start, is never used.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gui'))
+from config_loader import get_influx_params, get_rollup_config
+
+ROLLUP_FUNCTIONS = ('mean', 'min', 'max')
+TASK_PREFIX = 'rollup_'
+COVERAGE_PATH = Path(__file__).resolve().parent.parent / "config" / "rollup_coverage.json"
+
+_DURATION_UNITS = {
+    'ns': 1, 'us': 1_000, 'ms': 1_000_000, 's': 1_000_000_000,
+    'm': 60_000_000_000, 'h': 3_600_000_000_000, 'd': 86_400_000_000_000,
+    'w': 604_800_000_000_000,
+}
+_DURATION_PART = re.compile(r'(\d+)(ns|us|ms|s|m|h|d|w)')
+
+
+def parse_duration(text):
+    """Flux duration literal ("100ms", "1m30s", ...) to nanoseconds"""
+    text = str(text).strip()
+    parts = _DURATION_PART.findall(text)
+    if not parts or ''.join(n + u for n, u in parts) != text:
+        raise ValueError(f"Invalid duration: {text}")
+    return sum(int(n) * _DURATION_UNITS[u] for n, u in parts)
+
+
+def load_coverage(path=COVERAGE_PATH):
+    """{bucket: aware datetime from which the bucket is complete} ({} if never provisioned)"""
+    try:
+        with open(path, 'r') as f:
+            return {bucket: datetime.fromisoformat(since) for bucket, since in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_coverage(coverage, path=COVERAGE_PATH):
+    with open(path, 'w') as f:
+        json.dump({bucket: since.isoformat() for bucket, since in sorted(coverage.items())}, f, indent=2)
+
+
+def tier_coverage(config=None, coverage=None):
+    """{bucket: start of complete data} for each tier, None where not covered
+
+    A cascaded tier is only complete where the tier it reads from is, and
+    only from its first window that lies wholly inside that range.
+    """
+    config = config or get_rollup_config()
+    coverage = load_coverage() if coverage is None else coverage
+    result = {}
+    since = datetime.min.replace(tzinfo=timezone.utc)
+    for tier in sorted(config['tiers'], key=lambda t: parse_duration(t['every'])):
+        own = coverage.get(tier['bucket'])
+        if own is None or since is None:
+            since = None
+        else:
+            every_ns = parse_duration(tier['every'])
+            latest_ns = int(max(since, own).timestamp()) * 1_000_000_000
+            aligned_ns = -(-latest_ns // every_ns) * every_ns  # Round up to the window grid
+            since = datetime.fromtimestamp(aligned_ns / 1e9, tz=timezone.utc)
+        result[tier['bucket']] = since
+    return result
+
+
+def raw_source(influx_params=None):
+    """Source dict for the raw (un-rolled) bucket"""
+    influx_params = influx_params or get_influx_params()
+    return {'bucket': influx_params['bucket'], 'fn': None, 'every': None}
+
+
+def select_source(window, function, start=None, stop=None, now=None, config=None,
+                  influx_params=None, coverage=None):
+    """Pick the coarsest rollup tier that can serve an aggregateWindow query
+
+    A tier is usable when the function is one it stores (mean/min/max), its
+    window divides the requested window exactly, provisioning recorded the
+    tier as complete from before the requested start (coverage), the task
+    has already rolled up the requested stop time, and its retention still
+    covers the start.
+
+    Args:
+        window: Requested aggregateWindow duration (e.g. DOWNSAMPLE_AIX)
+        function: Aggregate function (DOWNSAMPLE_FUNCTION)
+        start, stop: Query range (aware datetimes); without start only raw is used
+        now: Current time (defaults to utcnow)
+        coverage: {bucket: complete-from datetime} (defaults to rollup_coverage.json)
+
+    Returns:
+        dict: bucket, fn (tag value to filter on, None for raw) and every
+    """
+    config = config or get_rollup_config()
+    source = raw_source(influx_params)
+    if function not in ROLLUP_FUNCTIONS or start is None:
+        return source
+
+    now = now or datetime.now(timezone.utc)
+    complete_from = tier_coverage(config, coverage)
+    window_ns = parse_duration(window)
+    tiers = sorted(config['tiers'], key=lambda t: parse_duration(t['every']), reverse=True)
+    for tier in tiers:
+        every_ns = parse_duration(tier['every'])
+        if window_ns < every_ns or window_ns % every_ns:
+            continue
+        if complete_from[tier['bucket']] is None or start < complete_from[tier['bucket']]:
+            continue  # Not provisioned, or no rollups yet for the start of the range
+        lag = timedelta(microseconds=(parse_duration(tier.get('task_every', tier['every']))
+                                      + parse_duration(tier.get('task_offset', '0s'))) / 1000)
+        if stop is not None and stop > now - lag:
+            continue  # Not rolled up yet
+        retention_ns = parse_duration(tier.get('retention', '0s'))
+        if retention_ns and start < now - timedelta(microseconds=retention_ns / 1000):
+            continue  # Already expired from this tier
+        return {'bucket': tier['bucket'], 'fn': function, 'every': tier['every']}
+    return source
+
+
+def source_filter(source):
+    """Flux filter line selecting the rollup series for a source ('' for raw)"""
+    if not source['fn']:
+        return ''
+    return f'  |> filter(fn: (r) => r.fn == "{source["fn"]}")\n'
+
+
+def describe_source(source):
+    """Short human-readable description for export logs"""
+    if not source['fn']:
+        return f"{source['bucket']} (raw)"
+    return f"{source['bucket']} ({source['every']} {source['fn']} rollup)"
+
+
+def _rollup_query(tier, input_bucket, cascaded, measurements, org, range_line):
+    """Flux body: read input, aggregate per function, write to the tier bucket"""
+    measurement_filter = ' or '.join(f'r._measurement == "{m}"' for m in measurements)
+    lines = [
+        f'data = from(bucket: "{input_bucket}")',
+        f'  {range_line}',
+        f'  |> filter(fn: (r) => {measurement_filter})',
+        '  |> filter(fn: (r) => types.isNumeric(v: r._value))',
+    ]
+    for fn in ROLLUP_FUNCTIONS:
+        lines += [
+            '',
+            'data',
+        ]
+        if cascaded:
+            # Coarser tiers aggregate the matching series of the finer tier
+            lines.append(f'  |> filter(fn: (r) => r.fn == "{fn}")')
+        lines += [
+            # Stamp rollups at window start so cascaded/exported windows line up
+            f'  |> aggregateWindow(every: {tier["every"]}, fn: {fn}, timeSrc: "_start", createEmpty: false)',
+            f'  |> set(key: "fn", value: "{fn}")',
+            f'  |> to(bucket: "{tier["bucket"]}", org: "{org}")',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def task_plan(config=None, influx_params=None):
+    """(tier, input bucket, cascaded) for each configured tier, finest first"""
+    config = config or get_rollup_config()
+    influx_params = influx_params or get_influx_params()
+    tiers = sorted(config['tiers'], key=lambda t: parse_duration(t['every']))
+    plan = []
+    input_bucket = influx_params['bucket']
+    for index, tier in enumerate(tiers):
+        plan.append((tier, input_bucket, index > 0))
+        input_bucket = tier['bucket']
+    return plan
+
+
+def task_name(tier):
+    return f"{TASK_PREFIX}{tier['every']}"
+
+
+def task_flux(tier, input_bucket, cascaded, measurements, org):
+    """Complete Flux script (with task options) for one rollup tier"""
+    header = (f'import "types"\n\n'
+              f'option task = {{name: "{task_name(tier)}", '
+              f'every: {tier.get("task_every", "1h")}, offset: {tier.get("task_offset", "0s")}}}\n\n')
+    return header + _rollup_query(tier, input_bucket, cascaded, measurements, org,
+                                  '|> range(start: -task.every)')
+
+
+def backfill_flux(tier, input_bucket, cascaded, measurements, org, start, stop):
+    """One-off Flux script rolling up [start, stop) into a tier"""
+    start_utc = start.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    stop_utc = stop.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return 'import "types"\n\n' + _rollup_query(tier, input_bucket, cascaded, measurements, org,
+                                                 f'|> range(start: {start_utc}, stop: {stop_utc})')
+
+
+def ensure_bucket(client, org, tier):
+    """Create the tier bucket if missing (retention from config); True if created"""
+    from influxdb_client import BucketRetentionRules
+
+    buckets_api = client.buckets_api()
+    if buckets_api.find_bucket_by_name(tier['bucket']):
+        print(f"  [OK] Bucket {tier['bucket']} exists")
+        return False
+    retention_s = parse_duration(tier.get('retention', '0s')) // 1_000_000_000
+    rules = BucketRetentionRules(type='expire', every_seconds=retention_s)
+    buckets_api.create_bucket(bucket_name=tier['bucket'], retention_rules=rules, org=org)
+    print(f"  [OK] Bucket {tier['bucket']} created (retention {tier.get('retention', '0s')})")
+    return True
+
+
+def ensure_task(client, org, name, flux):
+    """Create the task, or update its Flux if it already exists; True if created"""
+    from influxdb_client.domain.task_create_request import TaskCreateRequest
+    from influxdb_client.domain.task_update_request import TaskUpdateRequest
+
+    tasks_api = client.tasks_api()
+    existing = [t for t in tasks_api.find_tasks(name=name) if t.name == name]
+    if existing:
+        tasks_api.update_task_request(existing[0].id, TaskUpdateRequest(flux=flux, status='active'))
+        print(f"  [OK] Task {name} updated")
+        return False
+    else:
+        tasks_api.create_task(task_create_request=TaskCreateRequest(
+            flux=flux, org=org, status='active',
+            description='Downsampling rollup (mean/min/max), see MK1_AWE/data/rollups.py'))
+        print(f"  [OK] Task {name} created")
+        return True
+
+
+def backfill(client, org, plan, measurements, days, coverage):
+    """Roll up the last N days of existing data, one day per query
+
+    Each tier is backfilled up to the start of its current task period, from
+    where the (now active) task's own runs take over, so the tier is
+    recorded as complete from the backfill start.
+    """
+    query_api = client.query_api()
+    for tier, input_bucket, cascaded in plan:
+        period_ns = parse_duration(tier.get('task_every', '1h'))
+        now_ns = int(datetime.now(timezone.utc).timestamp()) * 1_000_000_000
+        stop = datetime.fromtimestamp(now_ns // period_ns * period_ns / 1e9, tz=timezone.utc)
+        print(f"  Backfilling {tier['bucket']} ({days} days)...")
+        for day in range(days, 0, -1):
+            chunk_start = stop - timedelta(days=day)
+            chunk_stop = chunk_start + timedelta(days=1)
+            query_api.query(backfill_flux(tier, input_bucket, cascaded, measurements, org,
+                                          chunk_start, chunk_stop), org=org)
+        since = stop - timedelta(days=days)
+        coverage[tier['bucket']] = min(coverage.get(tier['bucket'], since), since)
+        print(f"  [OK] {tier['bucket']} backfilled (complete from {since:%Y-%m-%d %H:%M} UTC)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision InfluxDB rollup buckets and tasks")
+    parser.add_argument('--dry-run', action='store_true', help="Print task Flux without connecting")
+    parser.add_argument('--backfill-days', type=int, default=0,
+                        help="Also roll up the last N days of existing data")
+    args = parser.parse_args()
+
+    config = get_rollup_config()
+    influx_params = get_influx_params()
+    if not config['tiers'] or not config['measurements']:
+        print("Error: no rollups configured in devices.yaml")
+        sys.exit(1)
+    plan = task_plan(config, influx_params)
+
+    if args.dry_run:
+        for tier, input_bucket, cascaded in plan:
+            print(f"// ---- {task_name(tier)} -> {tier['bucket']}")
+            print(task_flux(tier, input_bucket, cascaded, config['measurements'], influx_params['org']))
+        return
+
+    # Load .env file if it exists (same as export_csv.py)
+    try:
+        from dotenv import load_dotenv
+        env_path = Path(__file__).parent.parent.parent / ".env"
+        if env_path.exists():
+            load_dotenv(env_path)
+    except ImportError:
+        pass
+
+    token = os.getenv('INFLUXDB_ADMIN_TOKEN')
+    if not token:
+        print("Error: INFLUXDB_ADMIN_TOKEN environment variable not set")
+        sys.exit(1)
+
+    from influxdb_client import InfluxDBClient
+
+    print("=" * 60)
+    print("InfluxDB Rollup Provisioning")
+    print("=" * 60)
+    coverage = load_coverage()
+    with InfluxDBClient(url=influx_params['url'], token=token, org=influx_params['org']) as client:
+        for tier, input_bucket, cascaded in plan:
+            print(f"\n{task_name(tier)}: {input_bucket} -> {tier['bucket']}")
+            created_at = datetime.now(timezone.utc)
+            if ensure_bucket(client, influx_params['org'], tier):
+                coverage.pop(tier['bucket'], None)  # New bucket: older coverage is void
+            if ensure_task(client, influx_params['org'], task_name(tier),
+                           task_flux(tier, input_bucket, cascaded, config['measurements'],
+                                     influx_params['org'])):
+                coverage[tier['bucket']] = created_at
+            elif tier['bucket'] not in coverage:
+                print(f"  [!] No recorded coverage for {tier['bucket']}: export uses raw data "
+                      "until --backfill-days is run")
+        if args.backfill_days > 0:
+            print()
+            backfill(client, influx_params['org'], plan, config['measurements'],
+                     args.backfill_days, coverage)
+    save_coverage(coverage)
+    print(f"\n[OK] Rollups provisioned (coverage: {COVERAGE_PATH.name})")
+
+
+if __name__ == "__main__":
+    main()
@@ -40,8 +40,25 @@ DOWNSAMPLE_TC = "1s"         # Thermocouples (1Hz native)
 DOWNSAMPLE_PSU = "100ms"     # PSU (10Hz native)
 DOWNSAMPLE_BGA = "500ms"     # BGAs (2Hz native)
 DOWNSAMPLE_RL = "100ms"      # Relays (10Hz native)
+DOWNSAMPLE_CV = "1s"         # Cell voltages (10Hz native, 120 channels)
 DOWNSAMPLE_FUNCTION = "mean" # mean, median, max, min, first, last
 
+# CSV timestamp column: "local" (YYYY-MM-DD HH:MM:SS.mmm, Pacific) or "epoch_ms"
+CSV_TIME_FORMAT = "local"
+
+# Period Detection (plot shading)
+ACTIVE_CURRENT_ON = 1.0      # A, active period starts above this PSU current
+ACTIVE_CURRENT_OFF = ACTIVE_CURRENT_ON  # A, ...and ends below this (lower it for hysteresis)
+MIN_PERIOD_DURATION = 0      # s, shorter purge/active periods are ignored (0 = keep all)
+
+# KPI Analysis
+STACK_CELLS = 5              # Series cells in the stack (Faraday efficiency)
+
+# Polarization Curve (current plateau detection)
+PLATEAU_WINDOW = 2.0         # s, rolling window for the steadiness check
+PLATEAU_CURRENT_TOL = 0.5    # A, max rolling std of PSU current on a plateau
+PLATEAU_MIN_DURATION = 2.0   # s, shorter plateaus are ignored
+
 # Sensor Conversions (loaded from devices.yaml)
 SENSOR_CONVERSIONS = get_sensor_conversions()
 
@@ -49,4 +66,6 @@ SENSOR_CONVERSIONS = get_sensor_conversions()
 PLOT_DPI = 300
 PLOT_FORMAT = 'jpg'
 FIGURE_SIZE = (12, 6)
+PLOT_WORKERS = 0             # Parallel plot processes (0 = one per CPU, 1 = serial)
+PLOT_DECIMATE = True         # Min/max per pixel column before plotting (visually lossless)
 
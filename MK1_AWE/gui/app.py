@@ -3,6 +3,7 @@
 
 import sys
 import logging
+import multiprocessing
 import ctypes
 from pathlib import Path
 from PySide6.QtWidgets import QApplication
@@ -33,5 +34,6 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Plot worker processes in the frozen build
     main()
 
@@ -1,6 +1,7 @@
 """Configuration loader for MK1_AWE devices.yaml"""
 
 import os
+import sys
 import yaml
 
 
@@ -88,6 +89,31 @@ def get_influx_params():
     }
 
 
+def get_rollup_config():
+    """Get InfluxDB rollup configuration (downsampling tiers).
+    
+    Returns:
+        dict: measurements list and tiers (finest first); empty if not configured
+    """
+    config = load_config()
+    rollups = config.get('rollups') or {}
+    return {
+        'measurements': rollups.get('measurements', []),
+        'tiers': rollups.get('tiers', [])
+    }
+
+
+def get_cell_channels():
+    """Get CVM24P stack and active cell channels.
+    
+    Returns:
+        tuple: (stack_channel, cell_channels), e.g. ('CV001', ['CV002', ..., 'CV006'])
+    """
+    config = load_config()
+    cvm = config['devices']['CVM24P']
+    return cvm['stack_channel'], cvm['cell_channels']
+
+
 def get_psu_config():
     """Get PSU control configuration.
     
@@ -98,6 +124,37 @@ def get_psu_config():
     return config['psu_control']
 
 
+def is_simulated(device):
+    """Check whether devices.yaml selects the hardware simulator for a device.
+    
+    Args:
+        device: Simulator name (ni_cdaq, pico_tc08, bga244, psu, cvm24p, labjack)
+        
+    Returns:
+        bool: True if simulation.devices lists the device or 'all'
+    """
+    config = load_config()
+    devices = (config.get('simulation') or {}).get('devices') or []
+    return 'all' in devices or device in devices
+
+
+def import_nidaqmx():
+    """Import nidaqmx, or the hdw/sim stand-in when ni_cdaq is simulated.
+    
+    Returns:
+        module: nidaqmx (or sim.fake_nidaqmx with the same Task/system API)
+    """
+    if is_simulated('ni_cdaq'):
+        hdw_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hdw')
+        if hdw_dir not in sys.path:
+            sys.path.insert(0, hdw_dir)
+        import sim.fake_nidaqmx as nidaqmx
+    else:
+        import nidaqmx
+        import nidaqmx.system
+    return nidaqmx
+
+
 def load_sensor_labels():
     """Load sensor labels from sensor_labels.yaml.
     
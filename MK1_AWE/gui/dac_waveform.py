@@ -0,0 +1,209 @@
+"""Hardware-timed LabJack DAC waveforms (LJM stream-out)
+
+A waveform (sine, ramp or a CSV current profile) is compiled into DAC
+voltage samples at a fixed scan rate and played by the LabJack stream-out
+engine, so update timing comes from the device scan clock instead of
+Python sleeps.
+
+The device stream-out buffer (STREAM_OUT0_BUFFER_SIZE bytes) is a ring
+buffer: it is primed with the first samples and topped up from the compiled
+array every time eStreamRead returns a block (scans_per_read scans). The
+DAC feedback input (AIN) is streamed alongside and kept as readback. If the
+host falls behind and the buffer drains, the device keeps repeating the
+last value written (loop of one value) and the player counts an underrun.
+
+Usage (Gen2 profile, settings from devices.yaml psu_control.gen2):
+    player = player_from_config(load_profile())
+    player.start()
+    player.status()  # played, total, underruns, feedback_v, ...
+    player.stop()
+"""
+
+import bisect
+import threading
+
+import numpy as np
+
+try:
+    from .config_loader import get_psu_config, load_config
+except ImportError:
+    from config_loader import get_psu_config, load_config
+
+STREAM_OUT0 = 4800             # Scan list address of the STREAM_OUT0 channel
+BUFFER_BYTES = 16384           # Device stream-out buffer (power of 2, T7 max 16384)
+BYTES_PER_VALUE = 4            # STREAM_OUT0_BUFFER_F32
+DEFAULT_SCAN_RATE = 100        # DAC updates per second
+
+
+def sine(frequency, v_min, v_max, duration, rate=DEFAULT_SCAN_RATE):
+    """Sine between v_min and v_max [V] for `duration` seconds"""
+    t = np.arange(int(round(duration * rate))) / rate
+    return (v_max + v_min) / 2 + (v_max - v_min) / 2 * np.sin(2 * np.pi * frequency * t)
+
+
+def ramp(v_start, v_end, duration, rate=DEFAULT_SCAN_RATE):
+    """Linear ramp from v_start to v_end [V] over `duration` seconds"""
+    return np.linspace(v_start, v_end, max(2, int(round(duration * rate))))
+
+
+def compile_profile(points, rate=DEFAULT_SCAN_RATE, interpolate=False):
+    """Sample a (time_s, value) profile on the scan clock
+
+    Args:
+        points: [(time_seconds, value), ...] with increasing times (load_profile())
+        interpolate: Linear between points; default holds each value until
+            the next point (same as the step-by-step profile player)
+
+    Returns:
+        np.ndarray: One value per scan from t=0 through the last point
+    """
+    times = np.array([p[0] for p in points], dtype=np.float64)
+    values = np.array([p[1] for p in points], dtype=np.float64)
+    t = np.arange(int(np.floor(times[-1] * rate)) + 1) / rate
+    if interpolate:
+        return np.interp(t, times, values)
+    return values[np.clip(np.searchsorted(times, t, side='right') - 1, 0, len(values) - 1)]
+
+
+def current_to_dac_voltage(amps, gen2_config):
+    """DAC voltage for a current setpoint (linear 0-current_max -> 0-voltage_max, clamped)"""
+    voltage = np.asarray(amps, dtype=np.float64) / gen2_config['current_max'] * gen2_config['voltage_max']
+    return np.clip(voltage, gen2_config['voltage_min'], gen2_config['voltage_max'])
+
+
+class WaveformPlayer:
+    """Play DAC samples through LJM stream-out on a background thread"""
+
+    def __init__(self, host, dac_channel, samples, scan_rate=DEFAULT_SCAN_RATE,
+                 feedback_channel='AIN0', scans_per_read=None, device_type='ANY',
+                 buffer_bytes=BUFFER_BYTES):
+        self.host = host
+        self.dac_channel = dac_channel
+        self.samples = np.ascontiguousarray(samples, dtype=np.float64)
+        self.scan_rate = scan_rate
+        self.feedback_channel = feedback_channel
+        self.scans_per_read = scans_per_read or max(1, int(scan_rate // 10))
+        self.device_type = device_type
+        self.buffer_bytes = buffer_bytes
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._status = {'played': 0, 'written': 0, 'total': len(self.samples),
+                        'underruns': 0, 'ljm_backlog': 0, 'feedback_v': None,
+                        'actual_rate': None, 'done': False, 'error': None}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop output; the DAC holds the last value played"""
+        self._stop.set()
+
+    def wait(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self):
+        with self._lock:
+            return dict(self._status)
+
+    def elapsed(self):
+        """Seconds of waveform output so far (device scan clock)"""
+        return self.status()['played'] / self.scan_rate
+
+    def _update(self, **values):
+        with self._lock:
+            self._status.update(values)
+
+    def _run(self):
+        from labjack import ljm
+
+        handle = None
+        capacity = self.buffer_bytes // BYTES_PER_VALUE
+        written = played = underruns = 0
+        try:
+            handle = ljm.openS(self.device_type, 'ETHERNET', self.host)
+            ljm.eWriteName(handle, 'STREAM_OUT0_ENABLE', 0)
+            ljm.eWriteName(handle, 'STREAM_OUT0_TARGET', ljm.nameToAddress(self.dac_channel)[0])
+            ljm.eWriteName(handle, 'STREAM_OUT0_BUFFER_SIZE', self.buffer_bytes)
+            ljm.eWriteName(handle, 'STREAM_OUT0_ENABLE', 1)
+
+            # Prime the device buffer, then hold the last value if it ever runs dry
+            written = min(capacity - 1, len(self.samples))
+            ljm.eWriteNameArray(handle, 'STREAM_OUT0_BUFFER_F32', written, self.samples[:written].tolist())
+            ljm.eWriteName(handle, 'STREAM_OUT0_LOOP_NUM_VALUES', 1)
+            ljm.eWriteName(handle, 'STREAM_OUT0_SET_LOOP', 1)
+
+            scan_list = [STREAM_OUT0, ljm.nameToAddress(self.feedback_channel)[0]]
+            actual_rate = ljm.eStreamStart(handle, self.scans_per_read, len(scan_list), scan_list,
+                                           self.scan_rate)
+            self._update(written=written, actual_rate=actual_rate)
+
+            while not self._stop.is_set():
+                # Blocks until the next scans_per_read scans (paces the refill loop)
+                data, device_backlog, ljm_backlog = ljm.eStreamRead(handle)
+                played = min(played + self.scans_per_read, len(self.samples))
+
+                # STREAM_OUT0_BUFFER_STATUS: free values in the device ring buffer
+                free = int(ljm.eReadName(handle, 'STREAM_OUT0_BUFFER_STATUS'))
+                queued = capacity - free
+                if written < len(self.samples):
+                    if queued <= 1:
+                        underruns += 1
+                    n = min(free - 1, len(self.samples) - written)
+                    if n > 0:
+                        ljm.eWriteNameArray(handle, 'STREAM_OUT0_BUFFER_F32', n,
+                                            self.samples[written:written + n].tolist())
+                        written += n
+                elif queued <= 1:
+                    played = len(self.samples)
+                    self._update(played=played, done=True)
+                    break
+
+                self._update(played=played, written=written, underruns=underruns,
+                             ljm_backlog=ljm_backlog, feedback_v=data[-1])
+        except Exception as e:
+            self._update(error=str(e))
+        finally:
+            if handle is not None:
+                try:
+                    ljm.eStreamStop(handle)
+                except Exception:
+                    pass
+                try:
+                    # Hold the last value played (stream stop releases the DAC).
+                    # Samples past `played` were only queued, up to a full
+                    # buffer ahead of the output.
+                    if played:
+                        ljm.eWriteName(handle, self.dac_channel, float(self.samples[played - 1]))
+                except Exception:
+                    pass
+                ljm.close(handle)
+            self._update(done=True)
+
+
+def player_from_config(profile_data):
+    """WaveformPlayer for a Gen2 current profile (psu_control.gen2 in devices.yaml)
+
+    Args:
+        profile_data: [(time_seconds, current_amps), ...] from load_profile()
+    """
+    gen2_config = get_psu_config()['gen2']
+    stream_config = gen2_config.get('stream_out', {})
+    device = load_config()['devices'][gen2_config['device']]
+    rate = stream_config.get('scan_rate', DEFAULT_SCAN_RATE)
+    amps = compile_profile(profile_data, rate, stream_config.get('interpolate', False))
+    return WaveformPlayer(device['ip'], gen2_config['dac_channel'],
+                          current_to_dac_voltage(amps, gen2_config), scan_rate=rate,
+                          feedback_channel=stream_config.get('feedback_channel', 'AIN0'))
+
+
+def profile_position(profile_data, elapsed):
+    """Index of the next profile point after `elapsed` seconds"""
+    return bisect.bisect_right([p[0] for p in profile_data], elapsed)
@@ -0,0 +1,75 @@
+"""Background worker for in-process data export and plotting"""
+
+import sys
+import importlib
+from pathlib import Path
+from PySide6.QtCore import QThread, Signal
+
+# data/ scripts import each other by module name (test_config, export_csv, ...)
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+# Reload order matters: test_config first, then everything that imports it
+PIPELINE_MODULES = ['test_config', 'csv_writer', 'rollups', 'export_csv', 'dataset', 'decimate', 'events', 'plot_data', 'kpi', 'polarization', 'process_test']
+
+
+class ExportWorker(QThread):
+    """Run process_test.run_pipeline() off the GUI thread
+
+    Progress messages are emitted per export group / plot. Cancellation is
+    cooperative: the pipeline stops at the next group boundary.
+    """
+    progress = Signal(str)
+    export_finished = Signal(str)  # Output directory
+    export_failed = Signal(str)    # Error message
+    export_cancelled = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Request cancellation (takes effect between groups)"""
+        self._cancel_requested = True
+
+    def is_cancel_requested(self):
+        return self._cancel_requested
+
+    def run(self):
+        """Reload pipeline modules and run export + plotting"""
+        try:
+            process_test = self._load_pipeline()
+        except Exception as e:
+            self.export_failed.emit(str(e))
+            return
+
+        # Imported after the reload so these are the classes the pipeline raises
+        from export_csv import ExportCancelled
+        from plot_data import PlotCancelled
+
+        try:
+            output_dir = process_test.run_pipeline(
+                progress=self.progress.emit,
+                should_cancel=self.is_cancel_requested
+            )
+        except (ExportCancelled, PlotCancelled):
+            self.export_cancelled.emit()
+            return
+        except Exception as e:
+            self.export_failed.emit(str(e))
+            return
+
+        self.export_finished.emit(str(output_dir))
+
+    def _load_pipeline(self):
+        """Import (or re-import) data modules so edits to test_config.py apply"""
+        data_dir = str(DATA_DIR)
+        if data_dir not in sys.path:
+            sys.path.insert(0, data_dir)
+
+        module = None
+        for name in PIPELINE_MODULES:
+            if name in sys.modules:
+                module = importlib.reload(sys.modules[name])
+            else:
+                module = importlib.import_module(name)
+        return module
@@ -1,6 +1,7 @@
 """Main window for MK1_AWE Control GUI"""
 
 import sys
+from pathlib import Path
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QLabel, QFrame, QStatusBar, QDialog, QPushButton, QMessageBox
@@ -11,6 +12,10 @@ from widgets.relay_panel import RelayPanel
 from widgets.bga_panel import BGAPanel
 from widgets.psu_panel import PSUPanel
 from widgets.export_dialog import ExportDialog
+from export_worker import ExportWorker
+from profile_worker import ProfileWorker, PROFILE_SECONDS, profiling_enabled
+from config_loader import load_config
+from psu_client import get_psu_stats, close_psu_sessions
 
 
 class MainWindow(QMainWindow):
@@ -40,6 +45,12 @@ class MainWindow(QMainWindow):
         # Flag to suppress popups during shutdown
         self.is_shutting_down = False
         
+        # Background export/plot worker (None when idle)
+        self.export_worker = None
+        
+        # Background profile worker (None when idle)
+        self.profile_worker = None
+        
         # Apply modern stylesheet
         self.setStyleSheet("""
             QMainWindow {
@@ -58,6 +69,13 @@ class MainWindow(QMainWindow):
                 background-color: #252525;
                 color: #888888;
             }
+            QMenuBar, QMenu {
+                background-color: #252525;
+                color: #e0e0e0;
+            }
+            QMenu::item:selected {
+                background-color: #4a4a4a;
+            }
         """)
         
         # Create central widget and main layout
@@ -114,6 +132,25 @@ class MainWindow(QMainWindow):
         self.status_bar = QStatusBar()
         self.status_bar.showMessage("Ready")
         self.setStatusBar(self.status_bar)
+        
+        # Cancel button for running exports (hidden when idle)
+        self.cancel_export_button = QPushButton("Cancel Export")
+        self.cancel_export_button.setStyleSheet("""
+            QPushButton {
+                background-color: #4a4a4a;
+                color: #e0e0e0;
+                border: 1px solid #666666;
+                border-radius: 4px;
+                padding: 2px 10px;
+                font-size: 12px;
+            }
+        """)
+        self.cancel_export_button.clicked.connect(self._cancel_export)
+        self.cancel_export_button.hide()
+        self.status_bar.addPermanentWidget(self.cancel_export_button)
+        
+        # Debug menu (opt-in: AWE_PROFILING=1 or debug.profiling in devices.yaml)
+        self._create_debug_menu()
     
     def _update_control_availability(self, status_results):
         """Update control panel availability based on hardware status"""
@@ -248,6 +285,16 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'status_timer'):
             self.status_timer.stop()
         
+        # Stop a running profile (partial profile is still written; waited
+        # for after the safe state below)
+        if self.profile_worker and self.profile_worker.isRunning():
+            self.profile_worker.cancel()
+        
+        # Ask a running export to stop at the next group boundary (waited for
+        # after the safe state below)
+        if self.export_worker and self.export_worker.isRunning():
+            self.export_worker.cancel()
+        
         # Wait for status worker to finish if running
         if hasattr(self.hw_status_widget, 'worker') and self.hw_status_widget.worker:
             if self.hw_status_widget.worker.isRunning():
@@ -283,6 +330,17 @@ class MainWindow(QMainWindow):
             except Exception as e:
                 print(f"Error closing purge valves on shutdown: {e}")
         
+        # Close pooled PSU connections (MK1)
+        close_psu_sessions()
+        
+        # Hardware is safe; now let the background workers finish. No timeout:
+        # destroying a QThread that is still running aborts the process
+        if self.profile_worker and self.profile_worker.isRunning():
+            self.profile_worker.wait()
+        if self.export_worker and self.export_worker.isRunning():
+            print("Waiting for export to stop at the next group boundary...")
+            self.export_worker.wait()
+        
         print("Safe shutdown complete")
         event.accept()
     
@@ -293,38 +351,109 @@ class MainWindow(QMainWindow):
         dialog.exec()
     
     def _run_export(self):
-        """Execute data export as subprocess"""
-        import subprocess
-        from pathlib import Path
+        """Run export + plotting in a background worker (GUI stays responsive)"""
+        if self.export_worker and self.export_worker.isRunning():
+            self.status_bar.showMessage("Export already running", 5000)
+            return
         
         self.status_bar.showMessage("Exporting data...")
-        
+        self.hw_status_widget.save_button.setEnabled(False)
+        self.cancel_export_button.setEnabled(True)
+        self.cancel_export_button.show()
+        
+        self.export_worker = ExportWorker(self)
+        self.export_worker.progress.connect(self.status_bar.showMessage)
+        self.export_worker.export_finished.connect(self._on_export_finished)
+        self.export_worker.export_failed.connect(self._on_export_failed)
+        self.export_worker.export_cancelled.connect(self._on_export_cancelled)
+        self.export_worker.finished.connect(self._on_export_worker_done)
+        self.export_worker.start()
+    
+    def _cancel_export(self):
+        """Request cancellation of the running export"""
+        if self.export_worker and self.export_worker.isRunning():
+            self.export_worker.cancel()
+            self.cancel_export_button.setEnabled(False)
+            self.status_bar.showMessage("Cancelling export (after current group)...")
+    
+    def _on_export_finished(self, output_dir):
+        """Export worker completed successfully"""
+        self.status_bar.showMessage("Export complete!", 5000)
+        if not self.is_shutting_down:
+            self._show_info("Export Complete", 
+                          "Data exported and plots generated successfully!\n\n"
+                          f"Output: MK1_AWE/data/{Path(output_dir).name}/")
+    
+    def _on_export_failed(self, error):
+        """Export worker raised an error"""
+        self.status_bar.showMessage("Export failed", 5000)
+        if not self.is_shutting_down:
+            self._show_error("Export Failed", f"Error during export:\n{error[:500]}")
+    
+    def _on_export_cancelled(self):
+        """Export worker stopped on request"""
+        self.status_bar.showMessage("Export cancelled", 5000)
+    
+    def _on_export_worker_done(self):
+        """Restore controls once the worker thread exits"""
+        self.cancel_export_button.hide()
+        self.hw_status_widget.save_button.setEnabled(True)
+    
+    def _create_debug_menu(self):
+        """Add the Debug menu when profiling is enabled"""
         try:
-            # Run process_test.py script
-            script_path = Path(__file__).parent.parent / "data" / "process_test.py"
-            python_exe = Path(sys.executable)
-            
-            # Run in subprocess
-            result = subprocess.run(
-                [str(python_exe), str(script_path)],
-                capture_output=True,
-                text=True,
-                cwd=script_path.parent
-            )
-            
-            if result.returncode == 0:
-                self.status_bar.showMessage("Export complete!", 5000)
-                self._show_info("Export Complete", 
-                              "Data exported and plots generated successfully!\n\n"
-                              "Check MK1_AWE/data/ folder for output.")
-            else:
-                self.status_bar.showMessage("Export failed", 5000)
-                self._show_error("Export Failed", 
-                               f"Error during export:\n{result.stderr[:500]}")
-        
+            enabled = profiling_enabled(load_config())
         except Exception as e:
-            self.status_bar.showMessage("Export error", 5000)
-            self._show_error("Export Error", f"Failed to run export:\n{e}")
+            print(f"Error reading profiling setting: {e}")
+            return
+        if not enabled:
+            return
+        debug_menu = self.menuBar().addMenu("Debug")
+        self.profile_action = debug_menu.addAction(f"Save CPU Profile ({PROFILE_SECONDS} s)")
+        self.profile_action.triggered.connect(self._run_profile)
+        debug_menu.addAction("PSU Session Stats").triggered.connect(self._show_psu_stats)
+    
+    def _run_profile(self):
+        """Sample the GUI process in the background and write the profile to disk"""
+        if self.profile_worker and self.profile_worker.isRunning():
+            return
+        self.profile_action.setEnabled(False)
+        self.status_bar.showMessage(f"Profiling GUI for {PROFILE_SECONDS} s...")
+        self.profile_worker = ProfileWorker(PROFILE_SECONDS, self)
+        self.profile_worker.profile_finished.connect(self._on_profile_finished)
+        self.profile_worker.profile_failed.connect(self._on_profile_failed)
+        self.profile_worker.finished.connect(lambda: self.profile_action.setEnabled(True))
+        self.profile_worker.start()
+    
+    def _on_profile_finished(self, path):
+        """Profile worker wrote its output"""
+        self.status_bar.showMessage(f"Profile saved: {path}", 10000)
+        if not self.is_shutting_down:
+            self._show_info("Profile Saved",
+                          f"CPU profile ({PROFILE_SECONDS} s) saved to:\n{path}\n\n"
+                          "Open the .folded file in speedscope.app or flamegraph.pl; "
+                          "the .json file lists the hottest functions.")
+    
+    def _on_profile_failed(self, error):
+        """Profile worker raised an error"""
+        self.status_bar.showMessage("Profiling failed", 5000)
+        if not self.is_shutting_down:
+            self._show_error("Profiling Failed", f"Error while profiling:\n{error[:500]}")
+    
+    def _show_psu_stats(self):
+        """Per-PSU Modbus session stats (MK1 pooled connections)"""
+        stats = get_psu_stats()
+        if not stats:
+            self._show_info("PSU Session Stats", "No PSU sessions open")
+            return
+        lines = []
+        for ip, s in stats.items():
+            latency = f"p50 {s['p50_ms']} / p95 {s['p95_ms']} / max {s['max_ms']} ms" if 'p50_ms' in s else "no writes"
+            lines.append(f"{ip}: {s['writes']} ok, {s['failures']} failed, "
+                         f"{s['reconnects']} reconnects, {latency}")
+            if s['last_error']:
+                lines.append(f"    last error: {s['last_error'][:120]}")
+        self._show_info("PSU Session Stats", "\n".join(lines))
     
     def _show_info(self, title, message):
         """Show styled info dialog"""
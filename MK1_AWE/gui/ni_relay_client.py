@@ -4,12 +4,18 @@ NI cDAQ-9187 Relay Control Client
 Controls 16 relays on 2x NI-9485 modules (Slots 2 & 3)
 """
 
-import nidaqmx
 import yaml
 import threading
 from pathlib import Path
 from typing import Optional, Dict
 
+try:
+    from .config_loader import import_nidaqmx
+except ImportError:
+    from config_loader import import_nidaqmx
+
+nidaqmx = import_nidaqmx()
+
 # Configuration
 CONFIG_PATH = Path(__file__).parent.parent / "config" / "devices.yaml"
 
@@ -0,0 +1,51 @@
+"""Background worker that writes a sampling profile of the GUI process to disk"""
+
+import json
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from PySide6.QtCore import QThread, Signal
+
+# The sampling profiler lives in hdw/ (shared with the bridges' /debug/profile)
+HDW_DIR = Path(__file__).parent.parent / "hdw"
+if str(HDW_DIR) not in sys.path:
+    sys.path.insert(0, str(HDW_DIR))
+import sampling_profiler
+from sampling_profiler import profiling_enabled
+
+PROFILE_DIR = Path(__file__).parent.parent / "debug"
+PROFILE_SECONDS = 30
+
+
+class ProfileWorker(QThread):
+    """Sample every GUI thread for a fixed time, off the GUI thread
+
+    Writes <PROFILE_DIR>/gui_profile_<time>.folded (collapsed stacks for
+    flamegraph.pl / speedscope) and a .json summary of the hottest functions.
+    """
+    profile_finished = Signal(str)  # Path of the .folded file
+    profile_failed = Signal(str)    # Error message
+
+    def __init__(self, seconds=PROFILE_SECONDS, parent=None):
+        super().__init__(parent)
+        self.seconds = seconds
+        self._stop = threading.Event()
+
+    def cancel(self):
+        """Stop sampling early (what was sampled so far is still written)"""
+        self._stop.set()
+
+    def run(self):
+        try:
+            interval = sampling_profiler.DEFAULT_INTERVAL
+            stacks, ticks = sampling_profiler.sample(self.seconds, interval, self._stop)
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            stem = PROFILE_DIR / f"gui_profile_{datetime.now():%Y%m%d_%H%M%S}"
+            folded = stem.with_suffix('.folded')
+            folded.write_text(sampling_profiler.collapsed(stacks))
+            summary = sampling_profiler.summary(stacks, ticks, self.seconds, interval)
+            stem.with_suffix('.json').write_text(json.dumps(summary, indent=2))
+            self.profile_finished.emit(str(folded))
+        except Exception as e:
+            self.profile_failed.emit(str(e))
@@ -3,13 +3,29 @@
 import struct
 import os
 import csv
+import threading
+import time
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 from pymodbus.client import ModbusTcpClient
+from pymodbus.exceptions import ModbusException
 
 try:
     from .config_loader import get_psu_config, load_config, get_psu_ips
+    from .dac_waveform import current_to_dac_voltage
 except ImportError:
     from config_loader import get_psu_config, load_config, get_psu_ips
+    from dac_waveform import current_to_dac_voltage
+
+# MK1 PSU sessions (one persistent Modbus TCP connection per PSU)
+PSU_PORT = 502
+PSU_TIMEOUT = 0.5       # s per request
+PSU_IDLE_CHECK = 60     # s idle after which a session is reopened before use
+PSU_STATS_WINDOW = 256  # Most recent batch latencies kept per PSU
+
+_pool = None
+_pool_lock = threading.Lock()
 
 
 def set_current(amps, voltage=None):
@@ -65,10 +81,8 @@ def stop():
     elif mode == 'gen2':
         set_current(0.0)
     elif mode == 'mk1':
-        # MK1: Disable outputs, then set 0V/0A
-        _enable_output_mk1(False)
-        _set_voltage_mk1(0.0)
-        _set_current_mk1(0.0, voltage=0.0)
+        # MK1: Disable outputs, then set 0V/0A (one batch per PSU)
+        _write_mk1(voltage=0.0, current=0.0, enabled=False)
     else:
         set_current(0.0)
 
@@ -181,13 +195,8 @@ def _set_current_gen2(amps):
     if not (current_min <= amps <= current_max):
         raise ValueError(f"Current {amps}A out of range ({current_min}-{current_max}A)")
     
-    # Convert current to voltage (linear mapping: 0-200A → 0-5V)
-    voltage_min = gen2_config['voltage_min']
-    voltage_max = gen2_config['voltage_max']
-    voltage = (amps / current_max) * voltage_max
-    
-    # Clamp to voltage range
-    voltage = max(voltage_min, min(voltage_max, voltage))
+    # Convert current to voltage (linear mapping: 0-200A → 0-5V, clamped)
+    voltage = float(current_to_dac_voltage(amps, gen2_config))
     
     # Get LabJack connection info
     config = load_config()
@@ -223,140 +232,192 @@ def _set_current_gen2(amps):
             client.close()
 
 
-def _set_voltage_mk1(volts):
-    """MK1: Set voltage on all PSUs."""
-    psu_config = get_psu_config()
-    mk1_config = psu_config['mk1']
+class PSUSession:
+    """Persistent Modbus TCP session to one MK1 PSU
     
-    # Apply minimum threshold: <100V → 0V
-    if volts > 0 and volts < mk1_config['voltage_min']:
-        volts = 0.0
+    The connection is kept open between writes. A dropped connection is
+    detected on the next request (or when the session sat idle longer than
+    PSU_IDLE_CHECK), closed, reopened and the writes retried once; register
+    writes are idempotent. Error responses from the PSU are not retried.
+    """
     
-    # Validate range
-    if volts < 0 or volts > mk1_config['voltage_max']:
-        raise ValueError(f"Voltage {volts}V out of range (0-{mk1_config['voltage_max']}V)")
+    def __init__(self, ip, port=PSU_PORT, timeout=PSU_TIMEOUT):
+        self.ip = ip
+        self.client = ModbusTcpClient(host=ip, port=port, timeout=timeout)
+        self.lock = threading.Lock()  # One request at a time per PSU
+        self.last_used = 0.0
+        self.writes = 0
+        self.failures = 0
+        self.reconnects = 0
+        self.last_error = None
+        self.latencies = deque(maxlen=PSU_STATS_WINDOW)  # s per batch
+    
+    def _connect(self):
+        """Open (or reopen) the connection; health-check sessions left idle"""
+        if self.client.connected and time.monotonic() - self.last_used > PSU_IDLE_CHECK:
+            # Half-open sockets (PSU power cycled) only fail on the next request
+            self.client.close()
+        if not self.client.connected:
+            if self.last_used:
+                self.reconnects += 1
+            if not self.client.connect():
+                raise ConnectionError(f"Failed to connect to PSU at {self.ip}")
+    
+    def write(self, writes):
+        """Write [(register, value), ...] in order in this session; True if all succeeded"""
+        with self.lock:
+            started = time.perf_counter()
+            for attempt in range(2):
+                try:
+                    self._connect()
+                    for register, value in writes:
+                        response = self.client.write_register(register, value)
+                        if response.isError():
+                            self.last_error = f"Write to register {register} rejected: {response}"
+                            self.failures += 1
+                            return False
+                    self.last_used = time.monotonic()
+                    self.writes += 1
+                    self.latencies.append(time.perf_counter() - started)
+                    return True
+                except (ModbusException, OSError) as e:
+                    self.last_error = str(e)
+                    self.client.close()
+            self.failures += 1
+            return False
     
-    # Get register info
-    reg_addr = mk1_config['psu_registers']['write']['set_voltage']['address']
-    reg_value = int(volts / 0.1)  # Convert to register value
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        stats = {'writes': self.writes, 'failures': self.failures, 'reconnects': self.reconnects,
+                 'connected': self.client.connected, 'last_error': self.last_error}
+        if len(latencies):
+            stats.update(p50_ms=round(float(np.percentile(latencies, 50)), 2),
+                         p95_ms=round(float(np.percentile(latencies, 95)), 2),
+                         max_ms=round(float(latencies.max()), 2))
+        return stats
+    
+    def close(self):
+        with self.lock:
+            self.client.close()
+
+
+class PSUPool:
+    """One PSUSession per MK1 PSU and a long-lived worker per session"""
     
-    # Write to all PSUs in parallel
-    psu_ips = get_psu_ips()
-    successes = 0
-    failures = 0
+    def __init__(self, ips):
+        self.ips = list(ips)
+        self.sessions = {ip: PSUSession(ip) for ip in self.ips}
+        self.executor = ThreadPoolExecutor(max_workers=len(self.ips), thread_name_prefix='psu')
     
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(_write_psu_register, ip, reg_addr, reg_value): ip for ip in psu_ips}
+    def write_all(self, writes):
+        """Send the same register writes to every PSU in parallel
         
-        for future in as_completed(futures):
-            ip = futures[future]
-            try:
-                if future.result():
-                    successes += 1
-                else:
-                    failures += 1
-            except Exception:
-                failures += 1
-    
-    if successes == 0:
-        raise ConnectionError("Failed to set voltage on any PSU")
-    
-    print(f"MK1: Set voltage to {volts}V ({successes}/{len(psu_ips)} PSUs)")
+        Returns:
+            int: Number of PSUs on which all writes succeeded
+        """
+        futures = [self.executor.submit(session.write, writes) for session in self.sessions.values()]
+        return sum(1 for future in as_completed(futures) if future.result())
+    
+    def stats(self):
+        return {ip: session.stats() for ip, session in self.sessions.items()}
+    
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for session in self.sessions.values():
+            session.close()
 
 
-def _set_current_mk1(amps, voltage=None):
-    """MK1: Set current on all PSUs."""
+def _get_pool():
+    """Shared PSUPool, rebuilt if the configured PSU list changed"""
+    global _pool
+    ips = get_psu_ips()
+    with _pool_lock:
+        if _pool is None or _pool.ips != ips:
+            if _pool is not None:
+                _pool.close()
+            _pool = PSUPool(ips)
+        return _pool
+
+
+def get_psu_stats():
+    """Per-PSU session stats (writes, failures, reconnects, latency ms) by IP"""
+    with _pool_lock:
+        return _pool.stats() if _pool is not None else {}
+
+
+def close_psu_sessions():
+    """Close all pooled PSU connections"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def _write_mk1(voltage=None, current=None, enabled=None):
+    """MK1: Set voltage, current and/or output enable on all PSUs
+    
+    All requested writes go to each PSU as one batch over its pooled
+    session. Disabling is written first and enabling last, so outputs are
+    never on with a stale setpoint.
+    
+    Raises:
+        ValueError: If voltage or current out of range
+        ConnectionError: If no PSU accepted the writes
+    """
     psu_config = get_psu_config()
     mk1_config = psu_config['mk1']
+    registers = mk1_config['psu_registers']['write']
+    writes = []
     
-    # Apply minimum threshold: <1A → 0A
-    if amps > 0 and amps < mk1_config['current_min']:
-        amps = 0.0
+    if enabled is False:
+        writes.append((registers['enable_output']['address'], 0))
     
-    # Validate range
-    if amps < 0 or amps > mk1_config['current_max']:
-        raise ValueError(f"Current {amps}A out of range (0-{mk1_config['current_max']}A)")
-    
-    # Set voltage if provided
     if voltage is not None:
-        _set_voltage_mk1(voltage)
-    
-    # Get register info
-    reg_addr = mk1_config['psu_registers']['write']['set_current']['address']
-    reg_value = int(amps / 0.1)  # Convert to register value
-    
-    # Write to all PSUs in parallel
-    psu_ips = get_psu_ips()
-    successes = 0
-    failures = 0
-    
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(_write_psu_register, ip, reg_addr, reg_value): ip for ip in psu_ips}
-        
-        for future in as_completed(futures):
-            ip = futures[future]
-            try:
-                if future.result():
-                    successes += 1
-                else:
-                    failures += 1
-            except Exception:
-                failures += 1
-    
+        # Apply minimum threshold: <100V → 0V
+        if voltage > 0 and voltage < mk1_config['voltage_min']:
+            voltage = 0.0
+        if voltage < 0 or voltage > mk1_config['voltage_max']:
+            raise ValueError(f"Voltage {voltage}V out of range (0-{mk1_config['voltage_max']}V)")
+        writes.append((registers['set_voltage']['address'], int(voltage / 0.1)))
+    
+    if current is not None:
+        # Apply minimum threshold: <1A → 0A
+        if current > 0 and current < mk1_config['current_min']:
+            current = 0.0
+        if current < 0 or current > mk1_config['current_max']:
+            raise ValueError(f"Current {current}A out of range (0-{mk1_config['current_max']}A)")
+        writes.append((registers['set_current']['address'], int(current / 0.1)))
+    
+    if enabled is True:
+        writes.append((registers['enable_output']['address'], 1))
+    
+    pool = _get_pool()
+    successes = pool.write_all(writes)
+    
+    parts = []
+    if voltage is not None:
+        parts.append(f"{voltage}V")
+    if current is not None:
+        parts.append(f"{current}A")
+    if enabled is not None:
+        parts.append("output enabled" if enabled else "output disabled")
     if successes == 0:
-        raise ConnectionError("Failed to set current on any PSU")
+        raise ConnectionError(f"Failed to set {', '.join(parts)} on any PSU")
     
-    print(f"MK1: Set current to {amps}A ({successes}/{len(psu_ips)} PSUs)")
+    print(f"MK1: Set {', '.join(parts)} ({successes}/{len(pool.ips)} PSUs)")
 
 
-def _enable_output_mk1(enabled):
-    """MK1: Enable or disable output on all PSUs."""
-    psu_config = get_psu_config()
-    mk1_config = psu_config['mk1']
-    
-    # Get register info
-    reg_addr = mk1_config['psu_registers']['write']['enable_output']['address']
-    reg_value = 1 if enabled else 0
-    
-    # Write to all PSUs in parallel
-    psu_ips = get_psu_ips()
-    successes = 0
-    failures = 0
-    
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(_write_psu_register, ip, reg_addr, reg_value): ip for ip in psu_ips}
-        
-        for future in as_completed(futures):
-            ip = futures[future]
-            try:
-                if future.result():
-                    successes += 1
-                else:
-                    failures += 1
-            except Exception:
-                failures += 1
-    
-    if successes == 0:
-        raise ConnectionError("Failed to enable/disable any PSU")
-    
-    action = "enabled" if enabled else "disabled"
-    print(f"MK1: Output {action} ({successes}/{len(psu_ips)} PSUs)")
+def _set_voltage_mk1(volts):
+    """MK1: Set voltage on all PSUs."""
+    _write_mk1(voltage=volts)
 
 
-def _write_psu_register(ip, register, value):
-    """Write a single register to one PSU."""
-    client = None
-    try:
-        client = ModbusTcpClient(host=ip, port=502, timeout=0.5)
-        if not client.connect():
-            return False
-        
-        response = client.write_register(register, value)
-        return not response.isError()
-        
-    except Exception:
-        return False
-    finally:
-        if client:
-            client.close()
+def _set_current_mk1(amps, voltage=None):
+    """MK1: Set current (and voltage, in the same batch) on all PSUs."""
+    _write_mk1(voltage=voltage, current=amps)
 
+
+def _enable_output_mk1(enabled):
+    """MK1: Enable or disable output on all PSUs."""
+    _write_mk1(enabled=enabled)
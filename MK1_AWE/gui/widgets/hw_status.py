@@ -3,17 +3,18 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel
 from PySide6.QtCore import Qt, QThread, Signal
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import nidaqmx.system
 import ctypes
 import requests
 
 try:
-    from ..config_loader import load_config
+    from ..config_loader import load_config, import_nidaqmx
     from ..bga_client import is_bridge_available
 except ImportError:
-    from config_loader import load_config
+    from config_loader import load_config, import_nidaqmx
     from bga_client import is_bridge_available
 
+nidaqmx = import_nidaqmx()
+
 
 class StatusWorker(QThread):
     """Background worker for checking hardware status"""
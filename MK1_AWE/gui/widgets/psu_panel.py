@@ -10,9 +10,11 @@ from PySide6.QtCore import Qt, Signal, QTimer
 try:
     from ..psu_client import set_current, stop, get_max_current, get_ramp_config, load_profile
     from ..config_loader import get_psu_config
+    from ..dac_waveform import player_from_config, profile_position
 except ImportError:
     from psu_client import set_current, stop, get_max_current, get_ramp_config, load_profile
     from config_loader import get_psu_config
+    from dac_waveform import player_from_config, profile_position
 
 import time
 
@@ -35,6 +37,8 @@ class PSUPanel(QWidget):
         self.profile_index = 0
         self.profile_timer = None
         self.profile_voltage = None
+        self.waveform_player = None  # Gen2 hardware-timed profile (LJM stream-out)
+        self.waveform_underruns = 0
         self.ramp_voltage = None
         self.operation_start_time = None
         self.operation_total_duration = None
@@ -354,6 +358,8 @@ class PSUPanel(QWidget):
             
         # For profiling: calculate remaining based on current vs last point
         elif self.is_profiling and self.profile_data:
+            if self.waveform_player and not self._poll_waveform_player():
+                return
             if self.profile_index < len(self.profile_data):
                 current_target_time = self.profile_data[self.profile_index][0]
                 last_target_time = self.profile_data[-1][0]
@@ -457,12 +463,11 @@ class PSUPanel(QWidget):
                 max_voltage = psu_config['mk1']['voltage_max']
                 
                 try:
-                    from ..psu_client import _set_voltage_mk1, _enable_output_mk1
+                    from ..psu_client import _write_mk1
                 except ImportError:
-                    from psu_client import _set_voltage_mk1, _enable_output_mk1
+                    from psu_client import _write_mk1
                 
-                _set_voltage_mk1(max_voltage)
-                _enable_output_mk1(True)
+                _write_mk1(voltage=max_voltage, enabled=True)
             except Exception as e:
                 self._show_error("Ramp Setup Error", f"Failed to prepare PSUs:\n{e}")
                 return
@@ -620,12 +625,11 @@ class PSUPanel(QWidget):
                 max_voltage = psu_config['mk1']['voltage_max']
                 
                 try:
-                    from ..psu_client import _set_voltage_mk1, _enable_output_mk1
+                    from ..psu_client import _write_mk1
                 except ImportError:
-                    from psu_client import _set_voltage_mk1, _enable_output_mk1
+                    from psu_client import _write_mk1
                 
-                _set_voltage_mk1(max_voltage)
-                _enable_output_mk1(True)
+                _write_mk1(voltage=max_voltage, enabled=True)
             except Exception as e:
                 self._show_error("Profile Setup Error", f"Failed to prepare PSUs:\n{e}")
                 return
@@ -642,6 +646,15 @@ class PSUPanel(QWidget):
         # Start progress timer (updates every second)
         self.progress_update_timer.start(1000)
         
+        # Gen2: Play the whole profile from the LabJack stream-out buffer
+        if self.mode == 'gen2' and get_psu_config()['gen2'].get('stream_out', {}).get('enabled', False):
+            try:
+                self.waveform_player = player_from_config(self.profile_data).start()
+            except Exception as e:
+                self._show_error("Profile Error", f"Failed to start DAC waveform:\n{e}")
+                self._finish_profile()
+            return
+        
         # Execute first point immediately
         self._execute_profile_step()
     
@@ -688,12 +701,38 @@ class PSUPanel(QWidget):
             self._show_error("Profile Error", f"Failed during profile execution:\n{e}")
             self._cancel_profile()
     
+    def _poll_waveform_player(self):
+        """Track a stream-out profile; returns False once it has ended"""
+        status = self.waveform_player.status()
+        if status['underruns'] > self.waveform_underruns:
+            print(f"Warning: DAC waveform underruns: {status['underruns']}")
+            self.waveform_underruns = status['underruns']
+        if status['error']:
+            self._show_error("Profile Error", f"Failed during profile execution:\n{status['error']}")
+            self._cancel_profile()
+            return False
+        self.profile_index = profile_position(self.profile_data, self.waveform_player.elapsed())
+        if status['done']:
+            target_current = self.profile_data[-1][1]
+            self.current_setpoint = target_current
+            self.current_changed.emit(target_current)
+            self.current_input.setText(f"{target_current:.1f}")
+            print(f"Profile complete: {status['played']} samples, {status['underruns']} underruns")
+            self._finish_profile()
+            return False
+        return True
+    
     def _cancel_profile(self):
         """Cancel ongoing profile execution"""
         if self.profile_timer:
             self.profile_timer.stop()
             self.profile_timer = None
         
+        # Stream must be stopped before the DAC can be written directly
+        if self.waveform_player:
+            self.waveform_player.stop()
+            self.waveform_player.wait(2)
+        
         stop()
         self.current_setpoint = 0.0
         self.current_changed.emit(0.0)
@@ -721,6 +760,8 @@ class PSUPanel(QWidget):
         self.profile_data = None
         self.profile_index = 0
         self.profile_voltage = None
+        self.waveform_player = None
+        self.waveform_underruns = 0
         self.progress_update_timer.stop()
         self.progress_bar.setValue(0)
         self.progress_label.setText("")
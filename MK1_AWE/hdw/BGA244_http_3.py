@@ -4,9 +4,15 @@ import serial
 import time
 import yaml
 from pathlib import Path
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 import threading
+import json
+
+from line_push import pusher_from_config
+from sim import simulated
+from stage_timing import StageTimer, timer_from_config
+from sampling_profiler import profiling_enabled, handle_profile_request
 
 # Load configuration
 CONFIG_PATH = Path(__file__).parent.parent / "config" / "devices.yaml"
@@ -20,6 +26,10 @@ HTTP_PORT = config['devices']['BGA03']['http_port']
 GASES = {"7782-44-7": "O2", "1333-74-0": "H2", "7727-37-9": "N2"}
 OVERLOAD = 9.9E37
 
+if simulated('bga244', config):
+    from sim.bga244_emulator import BGA244Emulator
+    COM_PORT = BGA244Emulator(seed=3).start()
+
 # Global variables to store latest readings
 latest_data = {
     "connected": False,
@@ -28,9 +38,13 @@ latest_data = {
     "purity": None,
     "uncertainty": None,
     "temperature": None,
-    "pressure": None
+    "pressure": None,
+    "timestamp_ns": None
 }
 data_lock = threading.Lock()
+pusher = None  # LinePusher when devices.yaml selects push ingestion
+timer = StageTimer()  # Per-stage latency (/debug/timing)
+profiling = False  # /debug/profile enabled (AWE_PROFILING or debug.profiling)
 
 # Command queue for external control
 command_queue = []
@@ -62,6 +76,27 @@ def get_num(text):
             pass
     return None
 
+def format_line(data):
+    """InfluxDB line protocol for one reading (None if no numeric fields)"""
+    # Add gas type fields (as tags in the metric line)
+    gas_tags = f'primary_gas={data["primary_gas"]},secondary_gas={data["secondary_gas"]}'
+    
+    # Add numeric measurements
+    fields = []
+    if data["purity"] is not None:
+        fields.append(f'purity={data["purity"]:.3f}')
+    if data["uncertainty"] is not None:
+        fields.append(f'uncertainty={data["uncertainty"]:.3f}')
+    if data["temperature"] is not None:
+        fields.append(f'temperature={data["temperature"]:.3f}')
+    if data["pressure"] is not None:
+        fields.append(f'pressure={data["pressure"]:.3f}')
+    
+    if not fields:
+        return None
+    # Format: measurement,tag1=value1,tag2=value2 field1=value1,field2=value2 timestamp
+    return f'bga_metrics,{gas_tags} {",".join(fields)} {data["timestamp_ns"]}'
+
 def poll_bga():
     """Continuously poll BGA and update global data"""
     global latest_data, command_queue
@@ -83,12 +118,18 @@ def poll_bga():
                 pg = cmd(ser, "GASP?")
                 sg = cmd(ser, "GASS?")
                 
+                # Stamp with the purity request send time (the primary reading)
+                acquire_start = time.perf_counter()
+                timestamp_ns = time.time_ns()
                 pur = get_num(cmd(ser, "RATO? 1%"))
                 unc = get_num(cmd(ser, "UNCT?%"))
                 tc = get_num(cmd(ser, "TCEL? C"))
                 ps = get_num(cmd(ser, "PRES?"))
+                acquire_end = time.perf_counter()
                 
                 # Update global data
+                line = None
+                convert_s = 0.0
                 with data_lock:
                     # Check if we have valid data (not disconnected)
                     if pg is None and sg is None and all(v is None for v in [pur, unc, tc, ps]):
@@ -101,6 +142,15 @@ def poll_bga():
                         latest_data["uncertainty"] = unc
                         latest_data["temperature"] = tc
                         latest_data["pressure"] = ps
+                        latest_data["timestamp_ns"] = timestamp_ns
+                        convert_start = time.perf_counter()
+                        line = format_line(latest_data) if pusher else None
+                        convert_s = time.perf_counter() - convert_start
+                
+                if line:
+                    pusher.push(line)
+                timer.stages(acquire_end - acquire_start, convert_s,
+                             time.perf_counter() - acquire_end - convert_s)
                 
                 time.sleep(0.5)
                 
@@ -117,6 +167,12 @@ class MetricsHandler(BaseHTTPRequestHandler):
         """Handle GET requests"""
         if self.path == '/metrics':
             self.send_metrics()
+        elif self.path == '/health':
+            self.send_health()
+        elif self.path == '/debug/timing':
+            self.send_json(timer.report())
+        elif urlparse(self.path).path == '/debug/profile':
+            self.send_profile()
         else:
             self.send_error(404)
     
@@ -138,6 +194,7 @@ class MetricsHandler(BaseHTTPRequestHandler):
     
     def send_metrics(self):
         """Send metrics in InfluxDB line protocol format"""
+        started = time.perf_counter()
         with data_lock:
             # Don't send data if disconnected
             if not latest_data["connected"]:
@@ -146,32 +203,44 @@ class MetricsHandler(BaseHTTPRequestHandler):
                 return
             
             # Build metrics string
-            metrics = []
-            
-            # Add gas type fields (as tags in the metric line)
-            gas_tags = f'primary_gas={latest_data["primary_gas"]},secondary_gas={latest_data["secondary_gas"]}'
-            
-            # Add numeric measurements
-            fields = []
-            if latest_data["purity"] is not None:
-                fields.append(f'purity={latest_data["purity"]:.3f}')
-            if latest_data["uncertainty"] is not None:
-                fields.append(f'uncertainty={latest_data["uncertainty"]:.3f}')
-            if latest_data["temperature"] is not None:
-                fields.append(f'temperature={latest_data["temperature"]:.3f}')
-            if latest_data["pressure"] is not None:
-                fields.append(f'pressure={latest_data["pressure"]:.3f}')
-            
-            if fields:
-                # Format: measurement,tag1=value1,tag2=value2 field1=value1,field2=value2
-                metric_line = f'bga_metrics,{gas_tags} {",".join(fields)}'
-                metrics.append(metric_line)
+            metric_line = format_line(latest_data)
+            metrics = [metric_line] if metric_line else []
         
         # Send response
         self.send_response(200)
         self.send_header('Content-Type', 'text/plain')
         self.end_headers()
         self.wfile.write('\n'.join(metrics).encode() + b'\n')
+        timer.served(started)
+    
+    def send_health(self):
+        """Send bridge status (and push backlog) as JSON"""
+        with data_lock:
+            timestamp_ns = latest_data["timestamp_ns"]
+            response = {
+                'status': "online" if latest_data["connected"] else "offline",
+                'device_online': latest_data["connected"],
+                'data_age_seconds': (time.time_ns() - timestamp_ns) / 1e9 if timestamp_ns else None
+            }
+        if pusher:
+            response['push'] = pusher.stats()
+        self.send_json(response)
+    
+    def send_profile(self):
+        """Send a sampling profile of this process (?seconds=N&format=collapsed|json)"""
+        query = parse_qs(urlparse(self.path).query)
+        status, content_type, body = handle_profile_request(query, profiling)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_json(self, response):
+        """Send a JSON response body"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response, indent=2).encode())
     
     def log_message(self, format, *args):
         """Suppress request logging"""
@@ -179,12 +248,18 @@ class MetricsHandler(BaseHTTPRequestHandler):
 
 def main():
     """Main entry point"""
+    global pusher, timer, profiling
+    pusher = pusher_from_config(f'bga03', config=config)
+    timer = timer_from_config(config, pusher)
+    profiling = profiling_enabled(config)
+    
     # Start BGA polling thread
     poll_thread = threading.Thread(target=poll_bga, daemon=True)
     poll_thread.start()
     
     # Start HTTP server
-    server = HTTPServer(('localhost', HTTP_PORT), MetricsHandler)
+    # Threaded so a long /debug/profile request does not stall /metrics
+    server = ThreadingHTTPServer(('localhost', HTTP_PORT), MetricsHandler)
     print(f"BGA03 HTTP server started on port {HTTP_PORT}")
     print(f"Polling BGA on {COM_PORT} at {BAUD_RATE} baud")
     print(f"Config: {CONFIG_PATH}")
@@ -1,79 +1,230 @@
 #!/usr/bin/env python3
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from pymodbus.client import ModbusTcpClient
-from struct import pack, unpack
-import threading, time, json
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from pymodbus.client import AsyncModbusTcpClient
+from operator import add
+from itertools import compress
+from pathlib import Path
+import asyncio, threading, time, json
+import numpy as np
+import yaml
+
+from line_push import pusher_from_config
+from sim import simulated, sim_config
+from stage_timing import StageTimer, timer_from_config
+from sampling_profiler import profiling_enabled, handle_profile_request
 
 # Configuration
 GATEWAY_IP = '192.168.10.15'
 PORT = 502
 UNITS = [0xA1, 0xA4, 0xA6, 0xA7, 0xA9]
 TIMEOUT = 0.5
+CHANNELS_PER_UNIT = 24
+CONNECTIONS = len(UNITS)  # Gateway sessions read in parallel (pymodbus serialises requests per client)
+
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "devices.yaml"
+with open(CONFIG_PATH, 'r') as f:
+    config = yaml.safe_load(f)
+cvm_config = config['devices']['CVM24P']
+bridge_config = config['bridges']['cvm24p']
+HTTP_PORT = bridge_config['port']
+POLL_INTERVAL = 1.0 / bridge_config.get('sample_rate', 10)  # s between cycle starts
+CELL_V_MIN = cvm_config.get('cell_v_min', 1.2)  # stack_summary out-of-limit thresholds [V]
+CELL_V_MAX = cvm_config.get('cell_v_max', 2.2)
+# stack_summary covers the active cells only (not the stack channel or unused channels)
+SUMMARY_CELLS = np.array([int(name[2:]) for name in cvm_config['cell_channels']])
+
+if simulated('cvm24p'):
+    # Local gateway; simulation.cvm_units scales the channel count (24 per unit)
+    from sim.modbus_sim import ModbusTcpSimulator, cvm_banks
+    settings = sim_config()
+    UNITS = [0xA1 + i for i in range(settings.get('cvm_units', len(UNITS)))]
+    GATEWAY_IP = '127.0.0.1'
+    PORT = settings.get('cvm_port', 15020)
+    CONNECTIONS = len(UNITS)
+    ModbusTcpSimulator(cvm_banks(UNITS, seed=settings.get('seed')), port=PORT).start()
+
+# Preformatted line protocol field names, one list per unit position
+FIELD_NAMES = [[f"CV{i * CHANNELS_PER_UNIT + ch + 1:03d}=" for ch in range(CHANNELS_PER_UNIT)]
+               for i in range(len(UNITS))]
+ALL_FIELD_NAMES = [name for names in FIELD_NAMES for name in names]
+ALL_CELLS = np.arange(1, len(UNITS) * CHANNELS_PER_UNIT + 1)
+
+
+def decode_f32_wordswapped(registers):
+    """float32 values of word-swapped big-endian register pairs (low word first), flattened"""
+    words = np.asarray(registers, dtype=np.uint16).reshape(-1, 2)[:, ::-1].astype('>u2')
+    return words.view('>f4').ravel()
+
+
+def stack_summary(voltages, cells, timestamp_ns):
+    """stack_summary line (min/max/mean/std, extreme cells, out-of-limit count); None if no valid cell
+
+    voltages: channel voltages [V]; cells: matching 1-based channel (CV) numbers.
+    Only the configured active cells (SUMMARY_CELLS) are summarised.
+    """
+    valid = np.isfinite(voltages) & np.isin(cells, SUMMARY_CELLS)
+    if not valid.any():
+        return None
+    v = voltages[valid].astype(np.float64)
+    cells = cells[valid]
+    low = int(np.count_nonzero(v < CELL_V_MIN))
+    high = int(np.count_nonzero(v > CELL_V_MAX))
+    return (f"stack_summary "
+            f"cells={v.size}i,"
+            f"min_v={v.min():.5f},"
+            f"max_v={v.max():.5f},"
+            f"mean_v={v.mean():.5f},"
+            f"std_v={v.std():.5f},"
+            f"min_cell={cells[v.argmin()]}i,"
+            f"max_cell={cells[v.argmax()]}i,"
+            f"low_cells={low}i,"
+            f"high_cells={high}i,"
+            f"out_of_limits={low + high}i "
+            f"{timestamp_ns}")
+
 
 class CVM:
     def __init__(self):
         self.data = None
         self.lock = threading.Lock()
-        self.client = None
+        self.registers = np.zeros((len(UNITS), 2 * CHANNELS_PER_UNIT), dtype=np.uint16)
+        self.line = bytearray()  # Reused line protocol buffer
+        self.unit_timer = StageTimer()  # Per-unit read time (/debug/units)
+        self.unit_stats = {unit: {'reads': 0, 'errors': 0, 'last_error': None} for unit in UNITS}
         
-    def f32_wordlittle_bytebig(self, w0, w1):
-        """Convert two Modbus registers to float32 (word-swapped big-endian)"""
-        return unpack(">f", pack(">HH", w1, w0))[0]
+    async def read_unit(self, client, unit):
+        """Read all 24 channels of one unit (48 registers); None on error"""
+        stats = self.unit_stats[unit]
+        call_start = time.perf_counter()
+        try:
+            result = await client.read_holding_registers(192, count=2 * CHANNELS_PER_UNIT, device_id=unit)  # device_id like in test script
+            if result.isError() or len(result.registers) != 2 * CHANNELS_PER_UNIT:
+                raise ValueError(f"Bad response: {result}")
+            return result.registers
+        except Exception as e:
+            with self.lock:
+                stats['errors'] += 1
+                stats['last_error'] = str(e)
+            return None
+        finally:
+            self.unit_timer.record(f'0x{unit:02X}', time.perf_counter() - call_start)
+            with self.lock:
+                stats['reads'] += 1
+    
+    async def session(self):
+        """Read all units concurrently until the gateway connection is lost"""
+        clients = [AsyncModbusTcpClient(GATEWAY_IP, port=PORT, timeout=TIMEOUT) for _ in range(CONNECTIONS)]
+        try:
+            if not all(await asyncio.gather(*(client.connect() for client in clients))):
+                raise ConnectionError(f"Could not connect to CVM at {GATEWAY_IP}:{PORT}")
+            print(f"Connected to CVM at {GATEWAY_IP}:{PORT} ({CONNECTIONS} sessions, {len(UNITS)} units)")
+            
+            next_cycle = time.perf_counter()
+            while True:
+                acquire_start = time.perf_counter()
+                # Sample time = Modbus request send time (all units go out together)
+                timestamp_ns = time.time_ns()
+                # One request in flight per session; all units in about one round trip
+                results = await asyncio.gather(*(
+                    self.read_unit(clients[i % CONNECTIONS], unit) for i, unit in enumerate(UNITS)))
+                acquire_end = time.perf_counter()
+                
+                # Channels are fixed per unit position (a failed unit leaves a gap)
+                ok = [i for i, registers in enumerate(results) if registers is not None]
+                if ok:
+                    for i in ok:
+                        self.registers[i] = results[i]
+                    if len(ok) == len(UNITS):
+                        names, cells, blocks = ALL_FIELD_NAMES, ALL_CELLS, self.registers
+                    else:
+                        names = [name for i in ok for name in FIELD_NAMES[i]]
+                        cells = ALL_CELLS.reshape(len(UNITS), CHANNELS_PER_UNIT)[ok].ravel()
+                        blocks = self.registers[ok]
+                    voltages = decode_f32_wordswapped(blocks)
+                    
+                    # Format for InfluxDB; NaN/inf are not valid field values
+                    finite = np.isfinite(voltages)
+                    if not finite.all():
+                        names, voltages, cells = list(compress(names, finite)), voltages[finite], cells[finite]
+                    line = self.line
+                    line.clear()
+                    if len(voltages):
+                        line += b"cell_voltages "
+                        line += ','.join(map(add, names, map(repr, voltages.tolist()))).encode()
+                        line += b" %d" % timestamp_ns
+                    summary = stack_summary(voltages, cells, timestamp_ns)
+                    if summary:
+                        line += (b"\n" if line else b"") + summary.encode()
+                    data = bytes(line)
+                    converted = time.perf_counter()
+                    with self.lock:
+                        self.data = data
+                    if pusher and data:
+                        pusher.push(data.decode().split('\n'))
+                    timer.loop(acquire_start, acquire_end, converted, time.perf_counter())
+                elif not any(client.connected for client in clients):
+                    raise ConnectionError("Lost connection to CVM gateway")
+                
+                # Fixed rate; skip missed cycles rather than bursting to catch up
+                next_cycle = max(next_cycle + POLL_INTERVAL, time.perf_counter())
+                await asyncio.sleep(next_cycle - time.perf_counter())
+        finally:
+            for client in clients:
+                client.close()
     
     def run(self):
         while True:
             try:
-                self.client = ModbusTcpClient(GATEWAY_IP, port=PORT, timeout=TIMEOUT)
-                if self.client.connect():
-                    print(f"Connected to CVM at {GATEWAY_IP}:{PORT}")
-                    
-                    while True:
-                        readings = {}
-                        channel = 1
-                        
-                        for unit in UNITS:
-                            # Read all 24 channels for this unit (48 registers)
-                            result = self.client.read_holding_registers(192, count=48, device_id=unit)  # device_id like in test script
-                            
-                            if hasattr(result, 'registers') and len(result.registers) == 48:
-                                # Process 24 channels
-                                for ch in range(24):
-                                    reg_idx = ch * 2
-                                    voltage = self.f32_wordlittle_bytebig(
-                                        result.registers[reg_idx], 
-                                        result.registers[reg_idx + 1]
-                                    )
-                                    readings[f"CV{channel:03d}"] = voltage
-                                    channel += 1
-                        
-                        # Format for InfluxDB
-                        if readings:
-                            fields = ','.join(f'{k}={v}' for k, v in readings.items())
-                            with self.lock:
-                                self.data = f"cell_voltages {fields} {int(time.time()*1e9)}"
-                        
-                        time.sleep(0.1)  # 10Hz update rate
-                        
+                asyncio.run(self.session())
             except Exception as e:
                 print(f"Error: {e}")
-                if self.client:
-                    self.client.close()
                 time.sleep(1)
+    
+    def unit_report(self):
+        """JSON body for /debug/units: read/error counts and read-time percentiles per unit"""
+        durations = self.unit_timer.summary()
+        with self.lock:
+            return {f'0x{unit:02X}': {**stats, **durations.get(f'0x{unit:02X}', {'count': 0})}
+                    for unit, stats in self.unit_stats.items()}
 
 class Handler(BaseHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/metrics':
+            started = time.perf_counter()
             with cvm.lock:
                 data = cvm.data
             if data:
                 self.send_response(200)
                 self.end_headers()
-                self.wfile.write(data.encode())
+                self.wfile.write(data)
+                timer.served(started)
             else:
                 self.send_error(503)
+        elif self.path == '/debug/timing':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(timer.report(), indent=2).encode())
+        elif self.path == '/debug/units':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(cvm.unit_report(), indent=2).encode())
+        elif urlparse(self.path).path == '/debug/profile':
+            query = parse_qs(urlparse(self.path).query)
+            status, content_type, body = handle_profile_request(query, profiling)
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.end_headers()
+            self.wfile.write(body)
                 
     def log_message(self, *args): pass
 
+pusher = pusher_from_config('cvm24p', config=config)  # LinePusher when devices.yaml selects push ingestion
+timer = timer_from_config(config, pusher)  # Per-stage latency (/debug/timing)
+profiling = profiling_enabled(config)  # /debug/profile (AWE_PROFILING or debug.profiling)
 cvm = CVM()
 threading.Thread(target=cvm.run, daemon=True).start()
-HTTPServer(('0.0.0.0', 8890), Handler).serve_forever()
\ No newline at end of file
+print(f"CVM24P HTTP server started on port {HTTP_PORT}")
+ThreadingHTTPServer(('0.0.0.0', HTTP_PORT), Handler).serve_forever()
\ No newline at end of file
@@ -1,86 +1,294 @@
 #!/usr/bin/env python3
-"""HTTP server for LabJack AIN0 (PSU control voltage feedback) on port 8891"""
+"""
+LabJack T-series Analog Input HTTP Bridge (PSU control voltage feedback and spare AINs)
+Reads the AIN channels listed in devices.yaml (bridges.labjack) and exposes them
+via HTTP /metrics. Two acquisition modes:
+    modbus  one persistent Modbus TCP connection; every channel in a single
+            register read per poll (sample_rate)
+    stream  LJM stream mode: hardware-timed blocks at stream.scan_rate
+            (scan n at t0 + n / rate); live values and InfluxDB get the
+            stream decimated to sample_rate
+The newest history_seconds of samples (full rate) are kept in a ring buffer
+and served at /history?seconds=N.
+"""
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 from pymodbus.client import ModbusTcpClient
-import struct
+from pathlib import Path
+import json
+import re
 import threading
 import time
 
+import numpy as np
+import yaml
+
+from line_push import pusher_from_config
+from sim import simulated, sim_config
+from stage_timing import StageTimer, timer_from_config
+from sampling_profiler import profiling_enabled, handle_profile_request
+
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "devices.yaml"
+RECONNECT_DELAY = 1  # seconds
+LJM_DUMMY = -9999.0  # LJM fills samples skipped by stream auto-recovery with this
+
+with open(CONFIG_PATH, 'r') as f:
+    config = yaml.safe_load(f)
+
 # LabJack Configuration
-HOST = "192.168.10.21"
-PORT = 502
+HOST = config['devices']['LabJack']['ip']
+PORT = config['devices']['LabJack'].get('port', 502)
+bridge_config = config['bridges']['labjack']
+HTTP_PORT = bridge_config['port']
+CHANNELS = bridge_config.get('channels', ['AIN0'])
+SAMPLE_RATE = bridge_config.get('sample_rate', 10)  # Hz (Modbus polls / live values)
+MODE = bridge_config.get('mode', 'modbus')
+STREAM = bridge_config.get('stream', {})
+HISTORY_SECONDS = bridge_config.get('history_seconds', 60)
+
+if simulated('labjack'):
+    from sim.modbus_sim import ModbusTcpSimulator, labjack_bank
+    HOST = '127.0.0.1'
+    PORT = sim_config().get('labjack_port', 15021)
+    ModbusTcpSimulator({1: labjack_bank()}, port=PORT).start()
+    if MODE == 'stream':
+        print("Stream mode needs LJM hardware; simulator uses Modbus polling")
+        MODE = 'modbus'
+
+if MODE == 'stream':
+    from labjack import ljm
 
 # Global variables
-latest_voltage = None
+latest_data = {}  # 'timestamp_ns', 'values' (one float per channel)
+device_online = False
 data_lock = threading.Lock()
+pusher = None  # LinePusher when devices.yaml selects push ingestion
+history = None  # History ring buffer, sized in main()
+timer = StageTimer()  # Per-stage latency (/debug/timing)
+profiling = profiling_enabled(config)  # /debug/profile (AWE_PROFILING or debug.profiling)
 
 
-def read_ain0():
-    """Read AIN0 as FLOAT32 from LabJack"""
-    client = None
-    try:
-        client = ModbusTcpClient(HOST, port=PORT, timeout=1)
-        if not client.connect():
-            return None
-        
-        # Read input registers 0 and 1 (AIN0 as FLOAT32)
-        result = client.read_input_registers(address=0, count=2)
-        
-        if hasattr(result, 'registers') and len(result.registers) >= 2:
-            # Convert to float (big-endian word order, big-endian bytes)
-            bytes_data = struct.pack('>HH', result.registers[0], result.registers[1])
-            voltage = struct.unpack('>f', bytes_data)[0]
-            return voltage
-        
-        return None
-        
-    except Exception:
+def ain_numbers(channels):
+    """AIN indices from names like 'AIN3' (FLOAT32 at Modbus address 2 * n)"""
+    numbers = []
+    for name in channels:
+        match = re.fullmatch(r'AIN(\d+)', name)
+        if not match:
+            raise ValueError(f"Unsupported LabJack channel: {name} (expected AIN<n>)")
+        numbers.append(int(match.group(1)))
+    return numbers
+
+
+class History:
+    """Ring buffer of the newest samples: timestamps [ns] and values[sample, channel]"""
+
+    def __init__(self, capacity, n_channels):
+        self.capacity = max(1, int(capacity))
+        self.times = np.zeros(self.capacity, dtype=np.int64)
+        self.values = np.zeros((self.capacity, n_channels), dtype=np.float32)
+        self.count = 0  # Samples appended since start
+        self.lock = threading.Lock()
+
+    def append(self, times_ns, block):
+        """Add a block of samples (block[sample, channel]); oldest are overwritten"""
+        times_ns, block = times_ns[-self.capacity:], block[-self.capacity:]
+        with self.lock:
+            idx = (self.count + np.arange(len(times_ns))) % self.capacity
+            self.times[idx] = times_ns
+            self.values[idx] = block
+            self.count += len(times_ns)
+
+    def snapshot(self, seconds=None):
+        """(timestamps, values) in time order, optionally only the last `seconds`"""
+        with self.lock:
+            n = min(self.count, self.capacity)
+            idx = (self.count - n + np.arange(n)) % self.capacity
+            times, values = self.times[idx], self.values[idx]
+        if seconds is not None and n:
+            keep = times >= times[-1] - int(seconds * 1e9)
+            times, values = times[keep], values[keep]
+        return times, values
+
+
+def format_line(values, timestamp_ns):
+    """InfluxDB line protocol for one sample of all channels (None if no finite values)"""
+    fields = ','.join(f"{name}_voltage={value:.6f}" for name, value in zip(CHANNELS, values)
+                      if np.isfinite(value))
+    if not fields:
         return None
-    finally:
-        if client:
+    return f"labjack {fields} {timestamp_ns}"
+
+
+def publish(times_ns, block, first_index=0, decimation=1):
+    """Store a block in the history; live values and InfluxDB get every Nth sample"""
+    history.append(times_ns, block)
+    keep = np.arange((-first_index) % decimation, len(times_ns), decimation)
+    if not len(keep):
+        return
+    if pusher:
+        lines = [format_line(block[k], int(times_ns[k])) for k in keep]
+        pusher.push([line for line in lines if line])
+    with data_lock:
+        latest_data['timestamp_ns'] = int(times_ns[keep[-1]])
+        latest_data['values'] = block[keep[-1]].tolist()
+
+
+def poll_modbus():
+    """Poll all channels over one persistent Modbus TCP connection"""
+    global device_online
+
+    # One read spanning every configured AIN (input registers, FLOAT32 big-endian)
+    numbers = ain_numbers(CHANNELS)
+    first = 2 * min(numbers)
+    count = 2 * (max(numbers) - min(numbers) + 1)
+    if count > 125:
+        raise ValueError(f"AIN span {CHANNELS} exceeds one Modbus read (125 registers)")
+    offsets = [n - min(numbers) for n in numbers]
+    period = 1.0 / SAMPLE_RATE
+
+    while True:
+        client = ModbusTcpClient(HOST, port=PORT, timeout=1)
+        try:
+            if not client.connect():
+                raise ConnectionError(f"Cannot connect to {HOST}:{PORT}")
+            print(f"✓ Connected to LabJack at {HOST}:{PORT} (Modbus, {len(CHANNELS)} channels)")
+            device_online = True
+            next_poll = time.perf_counter()
+
+            while True:
+                acquire_start = time.perf_counter()
+                timestamp_ns = time.time_ns()  # Sample time = Modbus request send time
+                result = client.read_input_registers(address=first, count=count)
+                acquire_end = time.perf_counter()
+                if result.isError() or len(result.registers) != count:
+                    raise IOError(f"Read failed: {result}")
+
+                values = np.asarray(result.registers, dtype=np.uint16).astype('>u2').view('>f4')[offsets]
+                converted = time.perf_counter()
+                publish(np.array([timestamp_ns]), values[None, :].astype(np.float32))
+                timer.loop(acquire_start, acquire_end, converted, time.perf_counter())
+
+                next_poll = max(next_poll + period, time.perf_counter())
+                time.sleep(max(0.0, next_poll - time.perf_counter()))
+
+        except Exception as e:
+            device_online = False
+            print(f"✗ LabJack offline: {e}")
+            print(f"  Retrying in {RECONNECT_DELAY}s...")
+        finally:
             client.close()
+        time.sleep(RECONNECT_DELAY)
 
 
-def poll_labjack():
-    """Continuously poll LabJack AIN0"""
-    global latest_voltage
-    
+def stream_ljm():
+    """Hardware-timed LJM stream of all channels at stream.scan_rate"""
+    global device_online
+
+    scan_rate = float(STREAM.get('scan_rate', 1000))
+    scans_per_read = int(STREAM.get('scans_per_read', max(1, scan_rate // 10)))
+
     while True:
+        handle = None
         try:
-            voltage = read_ain0()
-            
-            with data_lock:
-                latest_voltage = voltage
-            
-            time.sleep(0.1)  # 1Hz polling
-            
+            handle = ljm.openS(STREAM.get('device_type', 'ANY'), 'ETHERNET', HOST)
+            addresses = ljm.namesToAddresses(len(CHANNELS), CHANNELS)[0]
+            actual_rate = ljm.eStreamStart(handle, scans_per_read, len(addresses), addresses, scan_rate)
+
+            # Anchor the scan clock: scan n was taken at t0 + n * period
+            t0_ns = time.time_ns()
+            period_ns = 1e9 / actual_rate
+            decimation = max(1, round(actual_rate / SAMPLE_RATE))
+            scan_index = 0
+            print(f"✓ Streaming LabJack at {HOST}: {len(CHANNELS)} channels at {actual_rate:g} Hz")
+            device_online = True
+
+            while True:
+                acquire_start = time.perf_counter()
+                data, device_backlog, ljm_backlog = ljm.eStreamRead(handle)
+                acquire_end = time.perf_counter()
+
+                block = np.asarray(data, dtype=np.float32).reshape(-1, len(CHANNELS))
+                block[block == LJM_DUMMY] = np.nan
+                times_ns = t0_ns + np.round((scan_index + np.arange(len(block))) * period_ns).astype(np.int64)
+                converted = time.perf_counter()
+                publish(times_ns, block, scan_index, decimation)
+                timer.loop(acquire_start, acquire_end, converted, time.perf_counter())
+                scan_index += len(block)
+                with data_lock:
+                    latest_data['scans'] = scan_index
+                    latest_data['device_backlog'] = device_backlog
+                    latest_data['ljm_backlog'] = ljm_backlog
+
         except Exception as e:
-            print(f"Error: {e}")
-            time.sleep(1)
+            device_online = False
+            print(f"✗ LabJack stream offline: {e}")
+            print(f"  Retrying in {RECONNECT_DELAY}s...")
+        finally:
+            if handle is not None:
+                try:
+                    ljm.eStreamStop(handle)
+                except Exception:
+                    pass
+                ljm.close(handle)
+        time.sleep(RECONNECT_DELAY)
 
 
 class MetricsHandler(BaseHTTPRequestHandler):
     """HTTP request handler for metrics endpoint"""
-    
+
+    def send_json(self, body, status=200, indent=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body, indent=indent).encode())
+
     def do_GET(self):
-        if self.path == '/metrics':
+        url = urlparse(self.path)
+        if url.path == '/metrics':
+            started = time.perf_counter()
             with data_lock:
-                voltage = latest_voltage
-            
-            if voltage is not None:
-                # Format for InfluxDB line protocol
-                metric_line = f"labjack AIN0_voltage={voltage:.6f} {int(time.time()*1e9)}"
-                
+                values = latest_data.get('values')
+                timestamp_ns = latest_data.get('timestamp_ns')
+
+            if device_online and values is not None:
+                # Format for InfluxDB line protocol (empty when every channel is NaN)
+                metric_line = format_line(values, timestamp_ns)
+
                 self.send_response(200)
                 self.send_header('Content-Type', 'text/plain')
                 self.end_headers()
-                self.wfile.write(metric_line.encode())
+                self.wfile.write((metric_line or '').encode())
+                timer.served(started)
             else:
                 self.send_error(503, "No data available")
+        elif url.path == '/history':
+            try:
+                seconds = float(parse_qs(url.query).get('seconds', [HISTORY_SECONDS])[0])
+            except ValueError as e:
+                self.send_json({'success': False, 'error': str(e)}, 400)
+                return
+            times, values = history.snapshot(seconds)
+            self.send_json({
+                'channels': CHANNELS,
+                'timestamps_ns': times.tolist(),
+                'values': {name: [None if np.isnan(v) else v for v in values[:, i].tolist()]
+                           for i, name in enumerate(CHANNELS)},
+            })
+        elif url.path == '/debug/timing':
+            with data_lock:
+                stream_state = {k: latest_data[k] for k in ('scans', 'device_backlog', 'ljm_backlog')
+                                if k in latest_data}
+            self.send_json({**timer.report(), **stream_state}, indent=2)
+        elif url.path == '/debug/profile':
+            status, content_type, body = handle_profile_request(parse_qs(url.query), profiling)
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.end_headers()
+            self.wfile.write(body)
         else:
             self.send_error(404)
-    
+
     def log_message(self, *args):
         """Suppress request logging"""
         pass
@@ -88,15 +296,26 @@ class MetricsHandler(BaseHTTPRequestHandler):
 
 def main():
     """Main entry point"""
-    # Start LabJack polling thread
-    poll_thread = threading.Thread(target=poll_labjack, daemon=True)
+    global pusher, timer, history
+    pusher = pusher_from_config('labjack', config=config)
+    timer = timer_from_config(config, pusher)
+    rate = STREAM.get('scan_rate', 1000) if MODE == 'stream' else SAMPLE_RATE
+    history = History(HISTORY_SECONDS * rate, len(CHANNELS))
+
+    # Start LabJack acquisition thread
+    target = stream_ljm if MODE == 'stream' else poll_modbus
+    poll_thread = threading.Thread(target=target, daemon=True)
     poll_thread.start()
-    
+
     # Start HTTP server
-    server = HTTPServer(('localhost', 8891), MetricsHandler)
-    print(f"LabJack HTTP server started on port 8891")
-    print(f"Polling AIN0 at {HOST}:{PORT}")
-    
+    # Threaded so a long /debug/profile request does not stall /metrics
+    server = ThreadingHTTPServer(('localhost', HTTP_PORT), MetricsHandler)
+    print(f"LabJack HTTP server started on port {HTTP_PORT}")
+    print(f"Reading {', '.join(CHANNELS)} at {HOST}:{PORT} ({MODE} mode)")
+    print(f"Endpoints: /metrics, /history, /debug/timing, /debug/profile")
+    if profiling:
+        print("Profiling enabled: /debug/profile?seconds=N")
+
     try:
         server.serve_forever()
     except KeyboardInterrupt:
@@ -106,4 +325,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
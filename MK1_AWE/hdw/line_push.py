@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+Push ingestion for the hardware bridges
+Batches InfluxDB line protocol and POSTs it over one persistent HTTP
+connection, instead of Telegraf polling /metrics. With ingest.target
+"influxdb" (default) batches go straight to InfluxDB's /api/v2/write, which
+answers 204 only once the points are stored; the tags Telegraf would add
+(global_tags, host) are added here so the series are the same. With target
+"telegraf" they go to Telegraf's http_listener_v2, whose 2xx only means the
+lines reached Telegraf's in-memory buffer.
+
+Lines are queued in a LineJournal (append-only segment files on disk) so
+samples produced while InfluxDB is down survive both the outage and a
+bridge restart; a batch leaves the journal only after the write was
+acknowledged, and the sender thread backfills the backlog in batches once
+the target is reachable again. Without a journal_dir, a bounded in-memory
+queue is used instead.
+
+Settings come from devices.yaml (telegraf.ingest, bridges.<name>.tags).
+"""
+
+import http.client
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from urllib.parse import urlencode, urlparse
+
+import yaml
+
+DEFAULT_URL = "http://localhost:8186/telegraf"
+# 4xx that every batch would get alike (auth, bucket, timeout, rate limit): keep queued
+RETRY_STATUSES = {401, 403, 404, 408, 429}
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+class MemoryBuffer:
+    """Bounded in-memory line queue (oldest lines dropped when full)"""
+
+    def __init__(self, max_lines=100_000):
+        self._lines = deque()
+        self._first_seq = 0  # Sequence number of self._lines[0]
+        self._max_lines = max_lines
+        self._lock = threading.Lock()
+        self.dropped_lines = 0
+
+    def append(self, lines):
+        with self._lock:
+            self._lines.extend(lines)
+            overflow = len(self._lines) - self._max_lines
+            for _ in range(max(0, overflow)):
+                self._lines.popleft()
+            if overflow > 0:
+                self._first_seq += overflow
+                self.dropped_lines += overflow
+            return len(self._lines)
+
+    def read_batch(self, max_lines):
+        """Oldest unsent lines and the sequence number after them (commit token)"""
+        with self._lock:
+            n = min(max_lines, len(self._lines))
+            return [self._lines[i] for i in range(n)], self._first_seq + n
+
+    def commit(self, token):
+        """Remove lines up to sequence number token (already dropped ones are skipped)"""
+        with self._lock:
+            while self._lines and self._first_seq < token:
+                self._lines.popleft()
+                self._first_seq += 1
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {'backlog_lines': len(self._lines), 'dropped_lines': self.dropped_lines}
+
+
+class LineJournal:
+    """Append-only, crash-safe line-protocol journal in rotating segment files
+
+    Lines are appended to <dir>/<seq>.lp; a segment is closed once it reaches
+    segment_bytes and a new one started. The read position (segment, byte
+    offset) is stored in <dir>/cursor, replaced atomically after each batch
+    is acknowledged, and fully sent segments are deleted. If the journal grows
+    beyond max_bytes the oldest segments are dropped (and counted).
+
+    After a crash, a torn last line (no trailing newline) is truncated and
+    appending continues in a fresh segment. Delivery is at-least-once: a batch
+    sent just before a crash is resent, which InfluxDB stores as the same
+    points (identical series and timestamps).
+    """
+
+    SUFFIX = '.lp'
+
+    def __init__(self, directory, segment_bytes=16 * 2**20, max_bytes=4 * 2**30, fsync=True):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.dropped_lines = 0
+
+        self._segments = sorted(int(p.stem) for p in self.dir.glob(f'*{self.SUFFIX}') if p.stem.isdigit())
+        self._cursor = self._load_cursor()
+        if self._segments:
+            self._repair(self._segments[-1])
+        self._backlog_lines = self._count_backlog()
+        self._open_segment((self._segments[-1] + 1) if self._segments else 0)
+
+    def _path(self, seq):
+        return self.dir / f"{seq:010d}{self.SUFFIX}"
+
+    def _load_cursor(self):
+        try:
+            seq, offset = (self.dir / 'cursor').read_text().split()
+            return int(seq), int(offset)
+        except (OSError, ValueError):
+            return (self._segments[0] if self._segments else 0), 0
+
+    def _save_cursor(self):
+        tmp = self.dir / 'cursor.tmp'
+        tmp.write_text(f"{self._cursor[0]} {self._cursor[1]}\n")
+        os.replace(tmp, self.dir / 'cursor')
+
+    def _repair(self, seq):
+        """Drop a partially written last line left by a crash"""
+        path = self._path(seq)
+        data = path.read_bytes()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+
+    def _count_backlog(self):
+        count = 0
+        for seq in self._segments:
+            if seq < self._cursor[0]:
+                continue
+            with open(self._path(seq), 'rb') as f:
+                if seq == self._cursor[0]:
+                    f.seek(self._cursor[1])
+                count += f.read().count(b'\n')
+        return count
+
+    def _open_segment(self, seq):
+        self._write_seq = seq
+        self._writer = open(self._path(seq), 'ab')
+        self._write_size = self._writer.tell()
+        if seq not in self._segments:
+            self._segments.append(seq)
+
+    def _total_bytes(self):
+        return sum(self._path(seq).stat().st_size for seq in self._segments[:-1]) + self._write_size
+
+    def _flush(self):
+        self._writer.flush()
+        if self.fsync:
+            os.fsync(self._writer.fileno())
+        self._dirty = False
+
+    def append(self, lines):
+        data = ''.join(line + '\n' for line in lines).encode()
+        with self._lock:
+            self._writer.write(data)
+            self._write_size += len(data)
+            self._backlog_lines += len(lines)
+            self._dirty = True
+            if self._write_size >= self.segment_bytes:
+                # Rotate
+                self._flush()
+                self._writer.close()
+                self._open_segment(self._write_seq + 1)
+                self._enforce_limit()
+            return self._backlog_lines
+
+    def _enforce_limit(self):
+        """Delete the oldest segments while the journal exceeds max_bytes"""
+        while len(self._segments) > 1 and self._total_bytes() > self.max_bytes:
+            seq = self._segments.pop(0)
+            path = self._path(seq)
+            with open(path, 'rb') as f:
+                if seq == self._cursor[0]:
+                    f.seek(self._cursor[1])
+                lost = f.read().count(b'\n') if seq >= self._cursor[0] else 0
+            path.unlink()
+            self.dropped_lines += lost
+            self._backlog_lines -= lost
+            if self._cursor[0] <= seq:
+                self._cursor = (self._segments[0], 0)
+                self._save_cursor()
+
+    def sync(self):
+        """Make appended lines durable (flush + fsync the active segment)"""
+        with self._lock:
+            if self._dirty:
+                self._flush()
+
+    def read_batch(self, max_lines):
+        """Up to max_lines oldest unsent lines and the cursor after them"""
+        with self._lock:
+            if self._dirty:
+                self._writer.flush()
+            seq, offset = self._cursor
+            lines = []
+            while len(lines) < max_lines and seq <= self._write_seq:
+                path = self._path(seq)
+                if not path.exists():
+                    seq, offset = seq + 1, 0
+                    continue
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    for raw in f:
+                        if not raw.endswith(b'\n'):
+                            break  # Partially flushed line; read it next time
+                        lines.append(raw[:-1].decode())
+                        offset += len(raw)
+                        if len(lines) >= max_lines:
+                            break
+                if len(lines) < max_lines and seq < self._write_seq:
+                    seq, offset = seq + 1, 0  # Segment fully read
+                else:
+                    break
+            return lines, (seq, offset, len(lines))
+
+    def commit(self, token):
+        """Advance the cursor past a sent batch and delete finished segments"""
+        seq, offset, n_lines = token
+        with self._lock:
+            if self._segments and seq < self._segments[0]:
+                return  # Segment dropped by the size limit while the batch was in flight
+            self._cursor = (seq, offset)
+            self._backlog_lines -= n_lines
+            self._save_cursor()
+            while self._segments and self._segments[0] < seq:
+                self._path(self._segments.pop(0)).unlink(missing_ok=True)
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._writer.close()
+
+    def stats(self):
+        with self._lock:
+            backlog_bytes = (sum(self._path(s).stat().st_size for s in self._segments[:-1]
+                                 if s >= self._cursor[0])
+                             + self._write_size - self._cursor[1])
+            return {
+                'backlog_lines': self._backlog_lines,
+                'backlog_bytes': backlog_bytes,
+                'journal_segments': len(self._segments),
+                'dropped_lines': self.dropped_lines,
+            }
+
+
+class LinePusher:
+    """Background batcher that pushes line protocol to InfluxDB or Telegraf
+
+    push() never blocks on the network: lines go to the buffer (journal or
+    memory) and a worker thread sends them every flush_interval (or as soon
+    as batch_size lines are waiting). While the target is unreachable, lines
+    accumulate; after recovery the backlog is sent batch by batch, oldest
+    first, with the original sample timestamps.
+
+    headers are sent with every request (InfluxDB: Authorization). A
+    non-retryable 4xx (400 malformed line, 413 too large, 422 field type
+    conflict) rejects the whole batch, so it is split in halves and resent
+    until only the offending lines are left; those are logged and dropped.
+    Errors that would hit every batch alike (auth, missing bucket, rate
+    limit, 5xx, network) keep the batch queued for the next interval.
+    """
+
+    def __init__(self, url=DEFAULT_URL, tags=None, batch_size=500, flush_interval=0.5,
+                 buffer=None, timeout=2.0, headers=None):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 80
+        self.path = parsed.path + (f"?{parsed.query}" if parsed.query else '') or '/'
+        self.url = url
+        self.headers = {'Content-Type': 'text/plain; charset=utf-8', **(headers or {})}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.tag_str = ','.join(f"{k}={v}" for k, v in sorted((tags or {}).items()))
+        self.buffer = buffer if buffer is not None else MemoryBuffer()
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._conn = None
+        self._thread = None
+
+        self.sent_lines = 0
+        self.sent_batches = 0
+        self.failed_batches = 0
+        self.rejected_lines = 0
+        self.last_error = None
+        self.last_push_time = None
+
+    def start(self):
+        """Start the sender thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, flush=True):
+        """Stop the sender thread, optionally sending what is queued"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.timeout * 2)
+        if flush:
+            self._send_pending()
+        self._close()
+        self.buffer.close()
+
+    def push(self, lines):
+        """Queue one line or a list of complete line-protocol lines"""
+        if isinstance(lines, str):
+            lines = [lines]
+        if self.tag_str:
+            lines = [self._add_tags(line) for line in lines]
+        if self.buffer.append(lines) >= self.batch_size:
+            self._wake.set()
+
+    def stats(self):
+        """Counters for /health (backlog_lines = samples not yet delivered)"""
+        return {
+            'url': self.url,
+            **self.buffer.stats(),
+            'sent_lines': self.sent_lines,
+            'sent_batches': self.sent_batches,
+            'failed_batches': self.failed_batches,
+            'rejected_lines': self.rejected_lines,
+            'last_error': self.last_error,
+            'last_push_age_seconds': (time.time() - self.last_push_time
+                                      if self.last_push_time else None),
+        }
+
+    def _add_tags(self, line):
+        """Insert the static tags after the measurement name"""
+        for i, ch in enumerate(line):
+            if ch == ',' or ch == ' ':
+                return f"{line[:i]},{self.tag_str}{line[i:]}"
+        return line
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.buffer.sync()
+            self._send_pending()
+
+    def _send_pending(self):
+        """Send queued lines in batch_size chunks until empty or a send fails"""
+        while True:
+            batch, token = self.buffer.read_batch(self.batch_size)
+            if not batch:
+                return
+            result = self._post(batch)
+            if result == 'rejected':
+                result = self._send_split(batch)
+            if not result:
+                return  # Keep lines queued; retry next interval
+            self.buffer.commit(token)
+            self.sent_batches += 1
+            self.last_push_time = time.time()
+
+    def _send_split(self, lines):
+        """Resend a rejected batch in halves, dropping only the lines rejected alone
+
+        Returns:
+            True once every line was delivered or dropped, False on a
+            retryable error (the whole batch stays queued; lines already
+            delivered are rewritten on retry, which InfluxDB deduplicates)
+        """
+        if len(lines) == 1:
+            self.rejected_lines += 1
+            print(f"✗ Line rejected, dropped ({self.last_error}): {lines[0][:200]}")
+            return True
+        mid = len(lines) // 2
+        for half in (lines[:mid], lines[mid:]):
+            result = self._post(half)
+            if result == 'rejected':
+                result = self._send_split(half)
+            if not result:
+                return False
+        return True
+
+    def _post(self, lines):
+        """POST lines over the persistent connection (reconnect once)
+
+        Returns:
+            True when acknowledged, 'rejected' for a non-retryable 4xx,
+            False to keep the batch queued
+        """
+        body = '\n'.join(lines) + '\n'
+
+        for attempt in range(2):
+            try:
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                self._conn.request('POST', self.path, body=body.encode(), headers=self.headers)
+                response = self._conn.getresponse()
+                detail = response.read()
+                if 400 <= response.status < 500 and response.status not in RETRY_STATUSES:
+                    self.last_error = f"HTTP {response.status}: {detail[:200].decode(errors='replace')}"
+                    return 'rejected'
+                if response.status >= 300:
+                    # Auth, rate limit or server errors: retry the same batch later
+                    self.last_error = f"HTTP {response.status} {response.reason}"
+                    break
+                self.last_error = None
+                self.sent_lines += len(lines)
+                return True
+            except Exception as e:
+                self.last_error = str(e)
+                self._close()
+        self.failed_batches += 1
+        return False
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+
+def influx_token():
+    """INFLUXDB_ADMIN_TOKEN from the environment or the repo .env file"""
+    try:
+        from dotenv import load_dotenv
+        env_path = REPO_ROOT / ".env"
+        if env_path.exists():
+            load_dotenv(env_path)
+    except ImportError:
+        pass
+    return os.getenv('INFLUXDB_ADMIN_TOKEN')
+
+
+def target_settings(config):
+    """(url, extra tags, headers) for telegraf.ingest.target
+
+    influxdb: /api/v2/write on system.influxdb_url, plus the tags Telegraf
+    would add (global_tags and host) so the series match the Telegraf path.
+    telegraf: http_listener_v2 at ingest.url.
+    """
+    telegraf = config.get('telegraf', {})
+    ingest = telegraf.get('ingest', {})
+    target = ingest.get('target', 'influxdb')
+    if target == 'telegraf':
+        return ingest.get('url', DEFAULT_URL), {}, {}
+    if target != 'influxdb':
+        raise ValueError(f"telegraf.ingest.target must be 'influxdb' or 'telegraf', not {target!r}")
+
+    system = config.get('system', {})
+    query = urlencode({'org': system.get('influxdb_org', 'electrolyzer'),
+                       'bucket': system.get('influxdb_bucket', 'electrolyzer_data'),
+                       'precision': 'ns'})
+    url = f"{system.get('influxdb_url', 'http://localhost:8086').rstrip('/')}/api/v2/write?{query}"
+    tags = dict(telegraf.get('global_tags', {}))
+    agent = telegraf.get('agent', {})
+    if agent.get('hostname') and not agent.get('omit_hostname', False):
+        tags['host'] = agent['hostname']
+    token = influx_token()
+    if not token:
+        print("✗ INFLUXDB_ADMIN_TOKEN not set: lines stay queued until it is")
+    return url, tags, {'Authorization': f"Token {token}"}
+
+
+def pusher_from_config(bridge_name, config=None, config_path=None):
+    """Start a LinePusher for a bridge if devices.yaml selects push ingestion
+
+    Args:
+        bridge_name: Key under devices.yaml 'bridges' (e.g. 'ni_analog', 'bga01')
+        config: Parsed devices.yaml (loaded from config_path if omitted)
+
+    Returns:
+        LinePusher or None (poll mode)
+    """
+    if config is None:
+        with open(config_path, 'r') as f:
+            config = yaml.safe_load(f)
+    ingest = config.get('telegraf', {}).get('ingest', {})
+    if ingest.get('mode', 'poll') != 'push':
+        return None
+    bridge = config.get('bridges', {}).get(bridge_name, {})
+    url, target_tags, headers = target_settings(config)
+
+    if ingest.get('journal_dir'):
+        journal_dir = REPO_ROOT / ingest['journal_dir'] / bridge_name
+        buffer = LineJournal(journal_dir,
+                             segment_bytes=int(ingest.get('journal_segment_mb', 16) * 2**20),
+                             max_bytes=int(ingest.get('journal_max_mb', 4096) * 2**20),
+                             fsync=ingest.get('journal_fsync', True))
+        backlog = buffer.stats()['backlog_lines']
+        print(f"Journal: {journal_dir} ({backlog} lines to backfill)")
+    else:
+        buffer = MemoryBuffer(ingest.get('max_buffer', 100_000))
+
+    pusher = LinePusher(
+        url=url,
+        tags={**target_tags, **bridge.get('tags', {})},
+        batch_size=ingest.get('batch_size', 500),
+        flush_interval=ingest.get('flush_interval', 0.5),
+        buffer=buffer,
+        headers=headers,
+    )
+    print(f"Pushing to {ingest.get('target', 'influxdb')} at {pusher.url.split('?')[0]} "
+          f"(batch {pusher.batch_size}, every {pusher.flush_interval}s)")
+    return pusher.start()
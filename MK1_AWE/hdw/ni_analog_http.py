@@ -2,18 +2,34 @@
 """
 NI cDAQ-9187 Analog Input HTTP Bridge
 Reads 16 channels (4-20mA) from 2x NI-9253 modules and exposes via HTTP /metrics endpoint
+Samples are timestamped from the hardware sample clock (index x period from task start)
+Optional raw recorder (raw_recorder.py) captures all channels at kHz rates; the
+live values and InfluxDB then get the stream decimated to SAMPLE_RATE
 """
 
-import nidaqmx
+import numpy as np
 import yaml
 import time
 import threading
-from flask import Flask, Response
+from flask import Flask, Response, request, jsonify
 from pathlib import Path
 
+from line_push import pusher_from_config, REPO_ROOT
+from raw_recorder import RawRecorder
+from stage_timing import StageTimer, timer_from_config
+from sampling_profiler import profiling_enabled, handle_profile_request
+from sim import simulated
+
+if simulated('ni_cdaq'):
+    import sim.fake_nidaqmx as nidaqmx
+    from sim.fake_nidaqmx import AnalogMultiChannelReader
+else:
+    import nidaqmx
+    from nidaqmx.stream_readers import AnalogMultiChannelReader
+
 # Configuration
 CONFIG_PATH = Path(__file__).parent.parent / "config" / "devices.yaml"
-SAMPLE_RATE = 10  # Hz per channel
+SAMPLE_RATE = 10  # Hz per channel (bridges.ni_analog.sample_rate overrides)
 RECONNECT_DELAY = 5  # seconds
 
 app = Flask(__name__)
@@ -22,6 +38,10 @@ app = Flask(__name__)
 latest_data = {}
 device_online = False
 data_lock = threading.Lock()
+pusher = None  # LinePusher when devices.yaml selects push ingestion
+recorder = None  # RawRecorder when bridges.ni_analog.recorder is enabled
+timer = StageTimer()  # Per-stage latency (/debug/timing)
+profiling = False  # /debug/profile enabled (AWE_PROFILING or debug.profiling)
 
 
 def load_config():
@@ -46,9 +66,26 @@ def convert_to_engineering_units(current_ma, hw_config, label_config):
     return eng_value
 
 
+def channel_scale(hw_config, label_config):
+    """4-20 mA scaling of a channel in A, stored with raw captures"""
+    return {
+        'range_min': hw_config['range_min'],
+        'range_max': hw_config['range_max'],
+        'eng_min': label_config.get('eng_min', 0.0),
+        'eng_max': label_config.get('eng_max', 100.0),
+        'unit': label_config.get('eng_unit', 'units'),
+    }
+
+
+def format_lines(readings, timestamp_ns):
+    """InfluxDB line protocol for one sample of all channels"""
+    return [f"ni_analog,channel={ch_name} value={data['value']:.3f},raw_ma={data['raw_ma']:.3f} {timestamp_ns}"
+            for ch_name, data in readings.items()]
+
+
 def read_analog_inputs():
     """Continuously read analog inputs from NI cDAQ"""
-    global latest_data, device_online
+    global latest_data, device_online, recorder
     
     config = load_config()
     labels_config = yaml.safe_load(open(CONFIG_PATH.parent / "sensor_labels.yaml"))
@@ -57,6 +94,10 @@ def read_analog_inputs():
     slot1_config = config['modules']['NI_cDAQ_Analog']['slot_1']
     slot4_config = config['modules']['NI_cDAQ_Analog']['slot_4']
     ai_labels = labels_config.get('analog_inputs', {})
+    # Task channel order: Slot 1 (AI01-AI08), then Slot 4 (AI09-AI16)
+    channel_configs = list(slot1_config.items()) + list(slot4_config.items())
+    recorder_config = config['bridges']['ni_analog'].get('recorder', {})
+    recorder_config = recorder_config if recorder_config.get('enabled') else None
     
     while True:
         try:
@@ -82,62 +123,108 @@ def read_analog_inputs():
                         name_to_assign_to_channel=ch_name
                     )
                 
-                # Configure timing
+                # Configure timing (raw recorder runs the sample clock at its own rate)
+                task_rate = recorder_config['rate'] if recorder_config else SAMPLE_RATE
                 task.timing.cfg_samp_clk_timing(
-                    rate=SAMPLE_RATE,
+                    rate=task_rate,
                     sample_mode=nidaqmx.constants.AcquisitionType.CONTINUOUS
                 )
                 
-                # Minimal buffer - only 0.5 seconds worth
-                task.in_stream.input_buf_size = int(SAMPLE_RATE * 16 * 0.5)
+                # Minimal buffer - only 0.5 seconds worth (2 s when recording raw)
+                buffer_seconds = 2.0 if recorder_config else 0.5
+                task.in_stream.input_buf_size = int(task_rate * 16 * buffer_seconds)
+                
+                # Anchor the sample clock: sample n was taken at t0 + n * period
+                # (float period, rounded per sample, so no error accumulates)
+                actual_rate = task.timing.samp_clk_rate
+                period_ns = 1e9 / actual_rate
+                # Live values / InfluxDB get every Nth sample (SAMPLE_RATE)
+                decimation = max(1, round(actual_rate / SAMPLE_RATE))
+                reader = AnalogMultiChannelReader(task.in_stream)
+                read_buffer = np.empty(len(channel_configs) * int(actual_rate * buffer_seconds + 1))
+                task.start()
+                t0_ns = time.time_ns()
+                sample_index = 0
+                
+                if recorder_config:
+                    recorder = RawRecorder(
+                        REPO_ROOT / recorder_config.get('directory', 'MK1_AWE/raw'),
+                        channels=[ch_name for ch_name, _ in channel_configs],
+                        scales=[channel_scale(hw_config, ai_labels.get(ch_name, {}))
+                                for ch_name, hw_config in channel_configs],
+                        rate=actual_rate, t0_ns=t0_ns,
+                        mode=recorder_config.get('mode', 'triggered'),
+                        segment_seconds=recorder_config.get('segment_seconds', 60),
+                        max_gb=recorder_config.get('max_gb', 20),
+                        trigger=recorder_config.get('trigger'))
+                    print(f"  Raw recorder: {recorder.mode} at {actual_rate:g} Hz -> {recorder.dir}")
                 
                 print(f"✓ Connected to {device_name}")
                 device_online = True
                 
                 # Read loop
                 while True:
-                    # Read one sample from all channels
-                    data = task.read()
-                    
-                    # Convert to engineering units
-                    readings = {}
-                    idx = 0
+                    # Read every buffered sample from all channels: block[channel, sample]
+                    acquire_start = time.perf_counter()
+                    n_samples = min(task.in_stream.avail_samp_per_chan,
+                                    len(read_buffer) // len(channel_configs))
+                    if n_samples:
+                        block = read_buffer[:len(channel_configs) * n_samples].reshape(
+                            len(channel_configs), n_samples)
+                        reader.read_many_sample(block, number_of_samples_per_channel=n_samples)
+                        if recorder:
+                            recorder.write(block, sample_index)
+                    acquire_end = time.perf_counter()
+                    convert_s = publish_s = 0.0
                     
-                    # Process Slot 1
-                    for ch_name, hw_config in slot1_config.items():
-                        current_ma = data[idx] * 1000  # Convert A to mA
-                        label_config = ai_labels.get(ch_name, {})
-                        eng_value = convert_to_engineering_units(current_ma, hw_config, label_config)
-                        readings[ch_name] = {
-                            'value': eng_value,
-                            'unit': label_config.get('eng_unit', 'units'),
-                            'raw_ma': current_ma
-                        }
-                        idx += 1
+                    # Samples on the SAMPLE_RATE grid (every sample without recorder)
+                    for k in range((-sample_index) % decimation, n_samples, decimation):
+                        # Convert to engineering units
+                        convert_start = time.perf_counter()
+                        readings = {}
+                        idx = 0
+                        for ch_name, hw_config in channel_configs:
+                            current_ma = block[idx, k] * 1000  # Convert A to mA
+                            label_config = ai_labels.get(ch_name, {})
+                            eng_value = convert_to_engineering_units(current_ma, hw_config, label_config)
+                            readings[ch_name] = {
+                                'value': eng_value,
+                                'unit': label_config.get('eng_unit', 'units'),
+                                'raw_ma': current_ma
+                            }
+                            idx += 1
+                        
+                        timestamp_ns = t0_ns + round((sample_index + k) * period_ns)
+                        lines = format_lines(readings, timestamp_ns) if pusher else None
+                        publish_start = time.perf_counter()
+                        convert_s += publish_start - convert_start
+                        
+                        # Push every sample (Telegraf listener) instead of 1 Hz polling
+                        if pusher:
+                            pusher.push(lines)
+                        
+                        # Update global state with the newest sample
+                        with data_lock:
+                            latest_data['timestamp'] = timestamp_ns / 1e9
+                            latest_data['timestamp_ns'] = timestamp_ns
+                            latest_data['readings'] = readings
+                        publish_s += time.perf_counter() - publish_start
                     
-                    # Process Slot 4
-                    for ch_name, hw_config in slot4_config.items():
-                        current_ma = data[idx] * 1000
-                        label_config = ai_labels.get(ch_name, {})
-                        eng_value = convert_to_engineering_units(current_ma, hw_config, label_config)
-                        readings[ch_name] = {
-                            'value': eng_value,
-                            'unit': label_config.get('eng_unit', 'units'),
-                            'raw_ma': current_ma
-                        }
-                        idx += 1
-                    
-                    # Update global state
+                    if n_samples:
+                        timer.stages(acquire_end - acquire_start, convert_s, publish_s)
+                    sample_index += n_samples
                     with data_lock:
-                        latest_data['timestamp'] = time.time()
-                        latest_data['readings'] = readings
+                        latest_data['samples_acquired'] = sample_index
                     
-                    # Short sleep to prevent CPU spinning (sample at ~10Hz)
+                    # Short sleep to prevent CPU spinning (buffer drained every ~50 ms)
                     time.sleep(0.05)
         
         except Exception as e:
             device_online = False
             print(f"✗ Device offline: {e}")
+            if recorder:
+                recorder.close()
+                recorder = None
             print(f"  Retrying in {RECONNECT_DELAY}s...")
             time.sleep(RECONNECT_DELAY)
 
@@ -145,6 +232,7 @@ def read_analog_inputs():
 @app.route('/metrics')
 def metrics():
     """Return metrics in InfluxDB line protocol format"""
+    started = time.perf_counter()
     if not device_online:
         return Response("# Device offline\n", status=503, mimetype='text/plain')
     
@@ -153,19 +241,39 @@ def metrics():
             return Response("# No data yet\n", status=503, mimetype='text/plain')
         
         readings = latest_data['readings']
-        timestamp = latest_data['timestamp']
+        timestamp_ns = latest_data['timestamp_ns']
     
     # Build InfluxDB line protocol (analog inputs only)
-    lines = []
-    for ch_name, data in readings.items():
-        # Format: measurement,tag1=value1 field1=value1,field2=value2 timestamp
-        line = f"ni_analog,channel={ch_name} value={data['value']:.3f},raw_ma={data['raw_ma']:.3f} {int(timestamp * 1e9)}"
-        lines.append(line)
-    
-    output = '\n'.join(lines) + '\n'
+    # Format: measurement,tag1=value1 field1=value1,field2=value2 timestamp
+    output = '\n'.join(format_lines(readings, timestamp_ns)) + '\n'
+    timer.served(started)
     return Response(output, mimetype='text/plain')
 
 
+@app.route('/debug/timing')
+def debug_timing():
+    """Rolling per-stage latency percentiles"""
+    return jsonify(timer.report())
+
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sampling profile of this process (?seconds=N&format=collapsed|json)"""
+    status, content_type, body = handle_profile_request(request.args, profiling)
+    return Response(body, status=status, mimetype=content_type)
+
+
+@app.route('/record', methods=['GET', 'POST'])
+def record():
+    """Raw recorder status (GET) or manual trigger (POST)"""
+    if not recorder:
+        return jsonify({'success': False, 'error': 'Raw recorder not enabled'}), 404
+    if request.method == 'POST':
+        recorder.trigger()
+        return jsonify({'success': True, 'message': 'Capture triggered'})
+    return jsonify(recorder.status())
+
+
 @app.route('/health')
 def health():
     """Health check endpoint"""
@@ -177,8 +285,13 @@ def health():
         'status': status,
         'device_online': device_online,
         'data_age_seconds': data_age,
-        'sample_rate': SAMPLE_RATE
+        'sample_rate': SAMPLE_RATE,
+        'samples_acquired': latest_data.get('samples_acquired', 0)
     }
+    if pusher:
+        response['push'] = pusher.stats()
+    if recorder:
+        response['recorder'] = recorder.status()
     
     import json
     return Response(json.dumps(response, indent=2), mimetype='application/json')
@@ -186,10 +299,18 @@ def health():
 
 def main():
     """Main entry point"""
+    global pusher, timer, profiling, SAMPLE_RATE
+    config = load_config()
+    SAMPLE_RATE = config['bridges']['ni_analog'].get('sample_rate', SAMPLE_RATE)
     print("NI cDAQ Analog Input HTTP Bridge")
     print(f"Config: {CONFIG_PATH}")
     print(f"Sample rate: {SAMPLE_RATE} Hz")
-    print(f"Endpoints: http://localhost:8881/metrics, /health")
+    print(f"Endpoints: http://localhost:8881/metrics, /health, /record, /debug/timing, /debug/profile")
+    pusher = pusher_from_config('ni_analog', config=config)
+    timer = timer_from_config(config, pusher)
+    profiling = profiling_enabled(config)
+    if profiling:
+        print("Profiling enabled: /debug/profile?seconds=N")
     print()
     
     # Start reader thread
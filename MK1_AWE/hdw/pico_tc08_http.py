@@ -2,19 +2,26 @@
 """
 Pico TC-08 Thermocouple HTTP Bridge
 Reads 8 thermocouple channels and exposes via HTTP /metrics endpoint
+Readings are timestamped from the driver's time_buffer (ms since streaming started)
 """
 
 import ctypes
 import yaml
 import time
 import threading
-from flask import Flask, Response
+from flask import Flask, Response, request, jsonify
 from pathlib import Path
 
+from line_push import pusher_from_config
+from sim import simulated
+from stage_timing import StageTimer, timer_from_config
+from sampling_profiler import profiling_enabled, handle_profile_request
+
 # Configuration
 CONFIG_PATH = Path(__file__).parent.parent / "config" / "devices.yaml"
 SAMPLE_INTERVAL_MS = 1000  # 1Hz (hardware limitation)
 RECONNECT_DELAY = 5  # seconds
+READ_BUFFER_SIZE = 32  # Readings drained per channel per loop
 
 app = Flask(__name__)
 
@@ -23,6 +30,9 @@ latest_data = {}
 device_online = False
 data_lock = threading.Lock()
 tc08 = None
+pusher = None  # LinePusher when devices.yaml selects push ingestion
+timer = StageTimer()  # Per-stage latency (/debug/timing)
+profiling = False  # /debug/profile enabled (AWE_PROFILING or debug.profiling)
 
 
 def load_config():
@@ -73,6 +83,12 @@ def setup_dll(dll_path):
     return dll
 
 
+def format_lines(readings):
+    """InfluxDB line protocol for the valid channel readings (each with its own timestamp)"""
+    return [f"tc08,channel={ch_name},type={data['type']} temp_c={data['value']:.2f} {data['timestamp_ns']}"
+            for ch_name, data in readings.items() if data['valid']]
+
+
 def read_thermocouples():
     """Continuously read thermocouples from Pico TC-08"""
     global latest_data, device_online, tc08
@@ -81,7 +97,13 @@ def read_thermocouples():
     dll_path = config['devices']['Pico_TC08']['dll_path']
     channels_config = config['modules']['Pico_TC08_Channels']
     
-    tc08 = setup_dll(dll_path)
+    if simulated('pico_tc08', config):
+        from sim.fake_tc08 import FakeTC08DLL
+        tc08 = FakeTC08DLL(config)
+    else:
+        tc08 = setup_dll(dll_path)
+    temp_buffer = (ctypes.c_float * READ_BUFFER_SIZE)()
+    time_buffer = (ctypes.c_int32 * READ_BUFFER_SIZE)()
     
     while True:
         handle = None
@@ -102,8 +124,9 @@ def read_thermocouples():
                 tc_type = ch_config['type'].encode('ascii')
                 tc08.usb_tc08_set_channel(handle, ch_num, ctypes.c_char(tc_type))
             
-            # Start streaming
+            # Start streaming; reading times are ms relative to this call
             actual_interval = tc08.usb_tc08_run(handle, SAMPLE_INTERVAL_MS)
+            t0_ns = time.time_ns()
             if actual_interval <= 0:
                 raise RuntimeError("Failed to start streaming")
             
@@ -112,51 +135,64 @@ def read_thermocouples():
             
             # Read loop
             while True:
-                readings = {}
+                # Drain each channel's streaming buffer; time_buffer holds the
+                # driver's ms since usb_tc08_run for every reading
+                samples = {}  # time_ms -> {ch_name: reading}
                 overflow = ctypes.c_int16(0)
+                loop_start = time.perf_counter()
+                acquire_s = 0.0
                 
                 for ch_name, ch_config in channels_config.items():
                     ch_num = ch_config['channel']
                     
-                    # Prepare buffers
-                    temp_buffer = (ctypes.c_float * 1)()
-                    time_buffer = (ctypes.c_int32 * 1)()
-                    
-                    # Read temperature
-                    result = tc08.usb_tc08_get_temp(
+                    # Read temperatures
+                    call_start = time.perf_counter()
+                    count = tc08.usb_tc08_get_temp(
                         handle,
                         temp_buffer,
                         time_buffer,
-                        1,  # one reading
+                        READ_BUFFER_SIZE,
                         ctypes.byref(overflow),
                         ctypes.c_int16(ch_num),
                         ctypes.c_int16(0),  # 0 = Celsius
                         ctypes.c_int16(0)   # no trigger
                     )
+                    acquire_s += time.perf_counter() - call_start
+                    if count < 0:
+                        raise RuntimeError(f"usb_tc08_get_temp failed on channel {ch_num}")
                     
-                    temp_c = temp_buffer[0]
-                    
-                    # Filter invalid readings
-                    # TC-08 returns large negative values for open/failed thermocouples
-                    if -200 < temp_c < 1500:  # Valid range for K-type
-                        readings[ch_name] = {
-                            'value': temp_c,
-                            'unit': '°C',
-                            'type': ch_config['type'],
-                            'valid': True
-                        }
-                    else:
-                        readings[ch_name] = {
-                            'value': None,
+                    for i in range(count):
+                        temp_c = temp_buffer[i]
+                        # Filter invalid readings
+                        # TC-08 returns large negative values for open/failed thermocouples
+                        valid = -200 < temp_c < 1500  # Valid range for K-type
+                        samples.setdefault(time_buffer[i], {})[ch_name] = {
+                            'value': temp_c if valid else None,
                             'unit': '°C',
                             'type': ch_config['type'],
-                            'valid': False
+                            'valid': valid,
+                            'timestamp_ns': t0_ns + time_buffer[i] * 1_000_000
                         }
                 
-                # Update global state
-                with data_lock:
-                    latest_data['timestamp'] = time.time()
-                    latest_data['readings'] = readings
+                batches = [format_lines(samples[time_ms]) for time_ms in sorted(samples)] if pusher else []
+                converted = time.perf_counter()
+                for lines in batches:
+                    pusher.push(lines)
+                
+                if samples:
+                    # Live readings: newest value of each channel (buffer times
+                    # differ between channels; channels without a new reading
+                    # keep their last one)
+                    with data_lock:
+                        readings = dict(latest_data.get('readings', {}))
+                        for time_ms in sorted(samples):
+                            readings.update(samples[time_ms])
+                        timestamp_ns = max(r['timestamp_ns'] for r in readings.values())
+                        latest_data['timestamp'] = timestamp_ns / 1e9
+                        latest_data['timestamp_ns'] = timestamp_ns
+                        latest_data['readings'] = readings
+                    timer.stages(acquire_s, converted - loop_start - acquire_s,
+                                 time.perf_counter() - converted)
                 
                 time.sleep(SAMPLE_INTERVAL_MS / 1000.0)
         
@@ -179,6 +215,7 @@ def read_thermocouples():
 @app.route('/metrics')
 def metrics():
     """Return metrics in InfluxDB line protocol format"""
+    started = time.perf_counter()
     if not device_online:
         return Response("# Device offline\n", status=503, mimetype='text/plain')
     
@@ -187,20 +224,29 @@ def metrics():
             return Response("# No data yet\n", status=503, mimetype='text/plain')
         
         readings = latest_data['readings']
-        timestamp = latest_data['timestamp']
     
-    # Build InfluxDB line protocol
-    lines = []
-    for ch_name, data in readings.items():
-        if data['valid']:
-            # Format: measurement,tag1=value1 field1=value1 timestamp
-            line = f"tc08,channel={ch_name},type={data['type']} temp_c={data['value']:.2f} {int(timestamp * 1e9)}"
-            lines.append(line)
+    # Build InfluxDB line protocol (each channel at its own reading time)
+    # Format: measurement,tag1=value1 field1=value1 timestamp
+    lines = format_lines(readings)
     
     output = '\n'.join(lines) + '\n' if lines else "# No valid readings\n"
+    timer.served(started)
     return Response(output, mimetype='text/plain')
 
 
+@app.route('/debug/timing')
+def debug_timing():
+    """Rolling per-stage latency percentiles"""
+    return jsonify(timer.report())
+
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sampling profile of this process (?seconds=N&format=collapsed|json)"""
+    status, content_type, body = handle_profile_request(request.args, profiling)
+    return Response(body, status=status, mimetype=content_type)
+
+
 @app.route('/health')
 def health():
     """Health check endpoint"""
@@ -219,6 +265,8 @@ def health():
         'total_channels': num_total,
         'sample_interval_ms': SAMPLE_INTERVAL_MS
     }
+    if pusher:
+        response['push'] = pusher.stats()
     
     import json
     return Response(json.dumps(response, indent=2), mimetype='application/json')
@@ -226,10 +274,17 @@ def health():
 
 def main():
     """Main entry point"""
+    global pusher, timer, profiling
     print("Pico TC-08 Thermocouple HTTP Bridge")
     print(f"Config: {CONFIG_PATH}")
     print(f"Sample interval: {SAMPLE_INTERVAL_MS} ms (1 Hz)")
-    print(f"Endpoints: http://localhost:8882/metrics, /health")
+    print(f"Endpoints: http://localhost:8882/metrics, /health, /debug/timing, /debug/profile")
+    config = load_config()
+    pusher = pusher_from_config('pico_tc08', config=config)
+    timer = timer_from_config(config, pusher)
+    profiling = profiling_enabled(config)
+    if profiling:
+        print("Profiling enabled: /debug/profile?seconds=N")
     print()
     
     # Start reader thread
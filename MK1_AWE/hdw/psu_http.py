@@ -12,6 +12,11 @@ import queue
 from flask import Flask, Response, request, jsonify
 from pathlib import Path
 
+from line_push import pusher_from_config
+from sim import simulated
+from stage_timing import StageTimer, timer_from_config
+from sampling_profiler import profiling_enabled, handle_profile_request
+
 # Configuration
 CONFIG_PATH = Path(__file__).parent.parent / "config" / "devices.yaml"
 SAMPLE_RATE = 10  # Hz
@@ -24,6 +29,9 @@ latest_data = {}
 device_online = False
 data_lock = threading.Lock()
 command_queue = queue.Queue()
+pusher = None  # LinePusher when devices.yaml selects push ingestion
+timer = StageTimer()  # Per-stage latency (/debug/timing)
+profiling = False  # /debug/profile enabled (AWE_PROFILING or debug.profiling)
 
 
 def load_config():
@@ -33,6 +41,25 @@ def load_config():
     return config
 
 
+def format_line(readings, timestamp_ns):
+    """InfluxDB line protocol for one PSU sample"""
+    return (f"psu "
+            f"voltage={readings['voltage']:.2f},"
+            f"current={readings['current']:.2f},"
+            f"power={readings['power']:.2f},"
+            f"capacity={readings['capacity']:.2f},"
+            f"runtime={readings['runtime']},"
+            f"battery_v={readings['battery_v']:.2f},"
+            f"temperature={readings['temperature']},"
+            f"status={readings['status']},"
+            f"set_voltage_rb={readings['set_voltage_rb']:.2f},"
+            f"set_current_rb={readings['set_current_rb']:.2f},"
+            f"output_enable={readings['output_enable']},"
+            f"sys_fault={readings['sys_fault']},"
+            f"mod_fault={readings['mod_fault']} "
+            f"{timestamp_ns}")
+
+
 def read_psu_data():
     """Continuously read PSU data via Modbus RTU"""
     global latest_data, device_online
@@ -42,6 +69,9 @@ def read_psu_data():
     register_map = config['modules']['PSU_Registers']
     
     com_port = psu_config['com_port']
+    if simulated('psu', config):
+        from sim.modbus_sim import ModbusRtuSimulator, psu_bank
+        com_port = ModbusRtuSimulator({psu_config['slave_id']: psu_bank()}).start()
     if not com_port:
         print("✗ COM port not configured in devices.yaml")
         print("  Set devices.PSU.com_port (e.g., 'COM11')")
@@ -90,7 +120,11 @@ def read_psu_data():
                         print(f"✗ Command failed: {e}")
                 
                 # Read all 13 registers at once (0x0001-0x000D)
+                # Stamp with the request send time: the PSU samples on request
+                timestamp_ns = time.time_ns()
+                acquire_start = time.perf_counter()
                 raw_values = psu.read_registers(0x0001, 13)
+                acquire_end = time.perf_counter()
                 
                 # Mark as online only after successful read
                 if not device_online:
@@ -113,12 +147,19 @@ def read_psu_data():
                     'set_current_rb': raw_values[11] * 0.1,  # A
                     'output_enable': raw_values[12]      # 1=ON, 0=OFF
                 }
+                line = format_line(readings, timestamp_ns) if pusher else None
+                converted = time.perf_counter()
                 
                 # Update global state
                 with data_lock:
-                    latest_data['timestamp'] = time.time()
+                    latest_data['timestamp'] = timestamp_ns / 1e9
+                    latest_data['timestamp_ns'] = timestamp_ns
                     latest_data['readings'] = readings
                 
+                if pusher:
+                    pusher.push(line)
+                timer.loop(acquire_start, acquire_end, converted, time.perf_counter())
+                
                 time.sleep(1.0 / SAMPLE_RATE)
         
         except Exception as e:
@@ -131,6 +172,7 @@ def read_psu_data():
 @app.route('/metrics')
 def metrics():
     """Return metrics in InfluxDB line protocol format"""
+    started = time.perf_counter()
     if not device_online:
         return Response("# Device offline\n", status=503, mimetype='text/plain')
     
@@ -139,33 +181,27 @@ def metrics():
             return Response("# No data yet\n", status=503, mimetype='text/plain')
         
         readings = latest_data['readings']
-        timestamp = latest_data['timestamp']
+        timestamp_ns = latest_data['timestamp_ns']
     
-    # Build InfluxDB line protocol
-    lines = []
-    
-    # Main measurements (voltage, current, power)
-    line = (f"psu "
-            f"voltage={readings['voltage']:.2f},"
-            f"current={readings['current']:.2f},"
-            f"power={readings['power']:.2f},"
-            f"capacity={readings['capacity']:.2f},"
-            f"runtime={readings['runtime']},"
-            f"battery_v={readings['battery_v']:.2f},"
-            f"temperature={readings['temperature']},"
-            f"status={readings['status']},"
-            f"set_voltage_rb={readings['set_voltage_rb']:.2f},"
-            f"set_current_rb={readings['set_current_rb']:.2f},"
-            f"output_enable={readings['output_enable']},"
-            f"sys_fault={readings['sys_fault']},"
-            f"mod_fault={readings['mod_fault']} "
-            f"{int(timestamp * 1e9)}")
-    lines.append(line)
-    
-    output = '\n'.join(lines) + '\n'
+    # Build InfluxDB line protocol (voltage, current, power, ...)
+    output = format_line(readings, timestamp_ns) + '\n'
+    timer.served(started)
     return Response(output, mimetype='text/plain')
 
 
+@app.route('/debug/timing')
+def debug_timing():
+    """Rolling per-stage latency percentiles"""
+    return jsonify(timer.report())
+
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sampling profile of this process (?seconds=N&format=collapsed|json)"""
+    status, content_type, body = handle_profile_request(request.args, profiling)
+    return Response(body, status=status, mimetype=content_type)
+
+
 @app.route('/health')
 def health():
     """Health check endpoint"""
@@ -179,6 +215,8 @@ def health():
         'data_age_seconds': data_age,
         'sample_rate': SAMPLE_RATE
     }
+    if pusher:
+        response['push'] = pusher.stats()
     
     import json
     return Response(json.dumps(response, indent=2), mimetype='application/json')
@@ -206,10 +244,17 @@ def command():
 
 def main():
     """Main entry point"""
+    global pusher, timer, profiling
     print("PSU Modbus RTU HTTP Bridge")
     print(f"Config: {CONFIG_PATH}")
     print(f"Sample rate: {SAMPLE_RATE} Hz")
-    print(f"Endpoints: http://localhost:8883/metrics, /health")
+    print(f"Endpoints: http://localhost:8883/metrics, /health, /debug/timing, /debug/profile")
+    config = load_config()
+    pusher = pusher_from_config('psu', config=config)
+    timer = timer_from_config(config, pusher)
+    profiling = profiling_enabled(config)
+    if profiling:
+        print("Profiling enabled: /debug/profile?seconds=N")
     print()
     
     # Start reader thread
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+High-rate raw capture for the NI analog bridge
+Streams raw NI-9253 samples (float32, A) into preallocated memory-mapped .npy
+segment files, far above the rate sent to InfluxDB. Used for transients such
+as PSU step responses and pressure spikes.
+
+Each segment <dir>/<t0_ns>.npy has shape (samples, channels) and a sidecar
+<t0_ns>.json holding its time index: t0_ns (hardware-clock time of sample 0),
+rate, samples written, channel names and 4-20 mA scaling. Sample k was taken
+at t0_ns + k * 1e9 / rate.
+
+Modes (devices.yaml bridges.ni_analog.recorder):
+    continuous: rotate segments every segment_seconds, oldest deleted past max_gb
+    triggered:  keep pre_seconds in RAM; on a trigger-channel level crossing
+                (or a manual trigger) write pre + post_seconds into one segment
+
+Reading (zero-copy views into the memory-mapped files):
+    capture = RawCapture("MK1_AWE/raw")
+    for block in capture.read(start_ns, stop_ns):
+        block.times(), block.channel('AI03'), block.engineering('AI03')
+
+    python raw_recorder.py <dir>      # list segments
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+SIDECAR_INTERVAL = 1.0  # Seconds between sidecar updates of an open segment
+
+
+def to_engineering(values_a, scale):
+    """Raw current [A] to engineering units with a channel's 4-20 mA scaling"""
+    range_min, range_max = scale['range_min'], scale['range_max']
+    current = np.clip(values_a, range_min, range_max)
+    return scale['eng_min'] + (current - range_min) * (
+        (scale['eng_max'] - scale['eng_min']) / (range_max - range_min))
+
+
+class _Segment:
+    """One preallocated memory-mapped segment and its sidecar"""
+
+    def __init__(self, directory, t0_ns, capacity, rate, channels, scales, kind):
+        self.base = Path(directory) / str(t0_ns)
+        self.meta = {
+            't0_ns': int(t0_ns), 'rate': rate, 'n_samples': 0, 'capacity': capacity,
+            'channels': channels, 'scales': scales, 'kind': kind, 'closed': False,
+        }
+        self.data = np.lib.format.open_memmap(self.base.with_suffix('.npy'), mode='w+',
+                                              dtype=np.float32, shape=(capacity, len(channels)))
+        self._last_sidecar = 0.0
+        self._write_sidecar()
+
+    @property
+    def n(self):
+        return self.meta['n_samples']
+
+    @property
+    def free(self):
+        return self.meta['capacity'] - self.meta['n_samples']
+
+    def append(self, rows):
+        """Copy (samples, channels) rows in (casting to float32)"""
+        n = self.meta['n_samples']
+        self.data[n:n + len(rows)] = rows
+        self.meta['n_samples'] = n + len(rows)
+        if time.monotonic() - self._last_sidecar > SIDECAR_INTERVAL:
+            self._write_sidecar()
+
+    def close(self):
+        self.data.flush()
+        self.meta['closed'] = True
+        self._write_sidecar()
+        del self.data
+
+    def _write_sidecar(self):
+        tmp = self.base.with_suffix('.json.tmp')
+        tmp.write_text(json.dumps(self.meta))
+        os.replace(tmp, self.base.with_suffix('.json'))
+        self._last_sidecar = time.monotonic()
+
+
+class RawRecorder:
+    """Writes hardware-clocked sample blocks into segment files
+
+    write() takes the block exactly as read from the task, shape
+    (channels, samples), with the task-wide index of its first sample; the
+    timestamp of sample i is t0_ns + i * period.
+    """
+
+    def __init__(self, directory, channels, scales, rate, t0_ns, mode='continuous',
+                 segment_seconds=60.0, max_gb=20.0, trigger=None):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.channels = list(channels)
+        self.scales = scales
+        self.rate = float(rate)
+        self.period_ns = 1e9 / self.rate
+        self.t0_ns = int(t0_ns)
+        self.mode = mode
+        self.segment_samples = max(1, int(segment_seconds * self.rate))
+        self.max_bytes = int(max_gb * 2**30)
+        self._lock = threading.Lock()
+        self._segment = None
+        self.segments_written = 0
+
+        trigger = trigger or {}
+        self.trigger_channel = trigger.get('channel', self.channels[0])
+        self._trigger_col = self.channels.index(self.trigger_channel)
+        self.trigger_level = float(trigger.get('level', 0.0))
+        self.trigger_edge = trigger.get('edge', 'rising')
+        self.pre_samples = int(trigger.get('pre_seconds', 1.0) * self.rate)
+        self.post_samples = max(1, int(trigger.get('post_seconds', 5.0) * self.rate))
+        self._ring = np.zeros((max(1, self.pre_samples), len(self.channels)), dtype=np.float32)
+        self._ring_count = 0
+        self._ring_pos = 0
+        self._last_value = None
+        self._remaining = 0
+        self._manual = False
+        self.triggers = 0
+
+    def _time_ns(self, index):
+        return self.t0_ns + int(round(index * self.period_ns))
+
+    def _open(self, index, capacity, kind):
+        self._segment = _Segment(self.dir, self._time_ns(index), capacity, self.rate,
+                                 self.channels, self.scales, kind)
+
+    def _close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+            self.segments_written += 1
+            self._enforce_limit()
+
+    def _enforce_limit(self):
+        files = sorted(self.dir.glob('*.npy'), key=lambda p: int(p.stem))
+        total = sum(p.stat().st_size for p in files)
+        while len(files) > 1 and total > self.max_bytes:
+            oldest = files.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink()
+            oldest.with_suffix('.json').unlink(missing_ok=True)
+
+    def trigger(self):
+        """Manual trigger: start a capture at the next written sample"""
+        self._manual = True
+
+    def write(self, block, first_index):
+        """Record a (channels, samples) block whose first sample has first_index"""
+        rows = block.T  # (samples, channels) view
+        with self._lock:
+            if self.mode == 'continuous':
+                self._write_continuous(rows, first_index)
+            else:
+                self._write_triggered(rows, first_index)
+
+    def _write_continuous(self, rows, first_index):
+        pos = 0
+        while pos < len(rows):
+            if self._segment is None:
+                self._open(first_index + pos, self.segment_samples, 'continuous')
+            take = min(len(rows) - pos, self._segment.free)
+            self._segment.append(rows[pos:pos + take])
+            pos += take
+            if self._segment.free == 0:
+                self._close()
+
+    def _find_trigger(self, rows):
+        """Index of the first trigger-level crossing in rows, or None"""
+        if self._manual:
+            self._manual = False
+            return 0
+        values = to_engineering(rows[:, self._trigger_col],
+                                self.scales[self._trigger_col]).astype(np.float64)
+        if not len(values):
+            return None
+        previous = np.empty_like(values)
+        previous[0] = values[0] if self._last_value is None else self._last_value
+        previous[1:] = values[:-1]
+        self._last_value = values[-1]
+        level = self.trigger_level
+        rising = (previous < level) & (values >= level)
+        falling = (previous > level) & (values <= level)
+        crossing = {'rising': rising, 'falling': falling}.get(self.trigger_edge, rising | falling)
+        hits = np.flatnonzero(crossing)
+        return int(hits[0]) if len(hits) else None
+
+    def _ring_push(self, rows):
+        """Keep the last pre_samples rows for the next capture"""
+        if self.pre_samples == 0 or not len(rows):
+            return
+        rows = rows[-self.pre_samples:]
+        n = len(rows)
+        end = self._ring_pos + n
+        if end <= self.pre_samples:
+            self._ring[self._ring_pos:end] = rows
+        else:
+            split = self.pre_samples - self._ring_pos
+            self._ring[self._ring_pos:] = rows[:split]
+            self._ring[:n - split] = rows[split:]
+        self._ring_pos = end % self.pre_samples
+        self._ring_count = min(self.pre_samples, self._ring_count + n)
+
+    def _ring_rows(self):
+        """Buffered pre-trigger rows, oldest first"""
+        if self._ring_count < self.pre_samples:
+            return self._ring[:self._ring_count]
+        return np.concatenate((self._ring[self._ring_pos:], self._ring[:self._ring_pos]))
+
+    def _write_triggered(self, rows, first_index):
+        pos = 0
+        while pos < len(rows):
+            if self._segment is not None:
+                take = min(len(rows) - pos, self._remaining)
+                self._segment.append(rows[pos:pos + take])
+                self._remaining -= take
+                pos += take
+                if self._remaining == 0:
+                    self._close()
+                    self._ring_count = self._ring_pos = 0
+                    self._last_value = None
+                continue
+            hit = self._find_trigger(rows[pos:])
+            if hit is None:
+                self._ring_push(rows[pos:])
+                return
+            self._ring_push(rows[pos:pos + hit])
+            pre = self._ring_rows()
+            index = first_index + pos + hit
+            self._open(index - len(pre), len(pre) + self.post_samples, 'triggered')
+            self._segment.append(pre)
+            self._remaining = self.post_samples
+            self.triggers += 1
+            print(f"Raw capture triggered at sample {index} ({self.trigger_channel})")
+            pos += hit
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def status(self):
+        with self._lock:
+            segment = self._segment
+            return {
+                'mode': self.mode,
+                'rate': self.rate,
+                'directory': str(self.dir),
+                'recording': segment is not None,
+                'current_segment_samples': segment.n if segment else 0,
+                'segments_written': self.segments_written,
+                'triggers': self.triggers,
+                'trigger': {'channel': self.trigger_channel, 'level': self.trigger_level,
+                            'edge': self.trigger_edge} if self.mode == 'triggered' else None,
+            }
+
+
+class RawBlock:
+    """Contiguous hardware-clocked samples from one segment (zero-copy view)"""
+
+    def __init__(self, t0_ns, rate, channels, scales, data):
+        self.t0_ns = t0_ns
+        self.rate = rate
+        self.channels = channels
+        self.scales = scales
+        self.data = data  # (samples, channels) float32 view of the memmap
+
+    def __len__(self):
+        return len(self.data)
+
+    def times(self):
+        """Sample times [ns since epoch] as an int64 array"""
+        return self.t0_ns + np.round(np.arange(len(self.data)) * (1e9 / self.rate)).astype(np.int64)
+
+    def channel(self, name):
+        """Raw current [A] of one channel (strided view, no copy)"""
+        return self.data[:, self.channels.index(name)]
+
+    def engineering(self, name):
+        """One channel in engineering units (computed, so a copy)"""
+        col = self.channels.index(name)
+        return to_engineering(self.data[:, col], self.scales[col])
+
+
+class RawCapture:
+    """Reader for a raw capture directory"""
+
+    def __init__(self, directory):
+        self.dir = Path(directory)
+        self._maps = {}
+        self.refresh()
+
+    def refresh(self):
+        """Reload segment sidecars (picks up new and growing segments)"""
+        segments = []
+        for path in self.dir.glob('*.json'):
+            try:
+                meta = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            meta['path'] = path.with_suffix('.npy')
+            if meta['path'].exists():
+                segments.append(meta)
+        self.segments = sorted(segments, key=lambda m: m['t0_ns'])
+        self._t0 = np.array([m['t0_ns'] for m in self.segments], dtype=np.int64)
+        self._t1 = np.array([m['t0_ns'] + m['n_samples'] * 1e9 / m['rate'] for m in self.segments],
+                            dtype=np.int64)
+
+    def _map(self, meta):
+        key = meta['path']
+        if key not in self._maps:
+            self._maps[key] = np.load(key, mmap_mode='r')
+        return self._maps[key]
+
+    def read(self, start_ns=None, stop_ns=None):
+        """Blocks covering [start_ns, stop_ns), one per overlapping segment
+
+        Returns:
+            list of RawBlock whose data are views into the segment files
+            (empty if the capture has no segments yet)
+        """
+        if not self.segments:
+            return []
+        start_ns = int(self._t0.min()) if start_ns is None else start_ns
+        stop_ns = int(self._t1.max()) if stop_ns is None else stop_ns
+        blocks = []
+        for i in np.flatnonzero((self._t0 < stop_ns) & (self._t1 > start_ns)):
+            meta = self.segments[i]
+            period = 1e9 / meta['rate']
+            first = max(0, int(np.ceil((start_ns - meta['t0_ns']) / period)))
+            last = min(meta['n_samples'], int(np.ceil((stop_ns - meta['t0_ns']) / period)))
+            if last <= first:
+                continue
+            view = self._map(meta)[first:last]
+            blocks.append(RawBlock(meta['t0_ns'] + int(round(first * period)), meta['rate'],
+                                   meta['channels'], meta['scales'], view))
+        return blocks
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python raw_recorder.py <capture_dir>")
+        sys.exit(1)
+    capture = RawCapture(sys.argv[1])
+    print(f"{len(capture.segments)} segments in {capture.dir}")
+    for meta in capture.segments:
+        start = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(meta['t0_ns'] / 1e9))
+        seconds = meta['n_samples'] / meta['rate']
+        state = 'closed' if meta['closed'] else 'open'
+        print(f"  {meta['path'].name}  {start}  {seconds:8.2f}s @ {meta['rate']:g} Hz  "
+              f"{len(meta['channels'])} ch  {meta['kind']} ({state})")
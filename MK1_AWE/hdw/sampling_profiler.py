@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Opt-in sampling profiler for the live bridges and the GUI (/debug/profile)
+
+A sampler snapshots every thread's Python stack (sys._current_frames) at a
+fixed interval for N seconds; nothing is hooked into the profiled code, so
+the overhead is one stack walk per thread per interval and zero when idle.
+Output is either collapsed stacks ("thread;outer;...;inner count" per line,
+readable by flamegraph.pl, speedscope and inferno) or a JSON summary of the
+hottest functions.
+
+Disabled unless AWE_PROFILING=1 is set or devices.yaml has
+debug.profiling: true (the environment variable wins either way).
+
+Usage against a running bridge:
+    curl "http://localhost:8881/debug/profile?seconds=30" > ni.folded
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import yaml
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent / "config" / "devices.yaml"
+ENV_VAR = 'AWE_PROFILING'
+DEFAULT_INTERVAL = 0.01  # s between samples (100 Hz)
+DEFAULT_SECONDS = 10
+MAX_SECONDS = 300
+
+_busy = threading.Lock()  # One profile at a time per process
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is already being taken in this process"""
+
+
+def profiling_enabled(config=None):
+    """True if AWE_PROFILING or devices.yaml debug.profiling enables profiling"""
+    value = os.environ.get(ENV_VAR)
+    if value is not None:
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    if config is None and CONFIG_PATH.exists():
+        with open(CONFIG_PATH, 'r') as f:
+            config = yaml.safe_load(f)
+    return bool(((config or {}).get('debug') or {}).get('profiling', False))
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample(seconds, interval=DEFAULT_INTERVAL, stop=None):
+    """Sample all other threads for `seconds` (or until threading.Event stop is set)
+
+    Returns:
+        (Counter of (thread name, frame labels root->leaf) -> samples, sample count)
+    """
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        ticks = 0
+        deadline = time.perf_counter() + seconds
+        next_tick = time.perf_counter()
+        while next_tick < deadline and not (stop and stop.is_set()):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stacks[(names.get(ident, f'thread-{ident}'), tuple(reversed(labels)))] += 1
+            ticks += 1
+            next_tick += interval
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+        return stacks, ticks
+    finally:
+        _busy.release()
+
+
+def collapsed(stacks):
+    """Collapsed-stack text (flamegraph.pl / speedscope input)"""
+    lines = [';'.join((thread.replace(';', ':'),) + frames) + f' {count}'
+             for (thread, frames), count in stacks.items()]
+    return '\n'.join(sorted(lines)) + '\n'
+
+
+def summary(stacks, ticks, seconds, interval, top=30):
+    """JSON-able summary: samples per thread and hottest functions (self/total)"""
+    threads = Counter()
+    self_counts = Counter()
+    total_counts = Counter()
+    for (thread, frames), count in stacks.items():
+        threads[thread] += count
+        if frames:
+            self_counts[frames[-1]] += count
+        for label in set(frames):
+            total_counts[label] += count
+    return {
+        'seconds': seconds,
+        'interval_s': interval,
+        'ticks': ticks,
+        'threads': dict(threads.most_common()),
+        'top_self': [{'function': f, 'samples': n} for f, n in self_counts.most_common(top)],
+        'top_total': [{'function': f, 'samples': n} for f, n in total_counts.most_common(top)],
+    }
+
+
+def profile(seconds=DEFAULT_SECONDS, interval=DEFAULT_INTERVAL, fmt='collapsed'):
+    """Profile this process; returns collapsed-stack text or a summary dict"""
+    seconds = min(max(float(seconds), 0.1), MAX_SECONDS)
+    stacks, ticks = sample(seconds, interval)
+    if fmt == 'json':
+        return summary(stacks, ticks, seconds, interval)
+    return collapsed(stacks)
+
+
+def parse_query(query):
+    """(seconds, fmt) from a /debug/profile query dict (values may be lists)"""
+    def first(key, default):
+        value = query.get(key, default)
+        return value[0] if isinstance(value, list) else value
+    return float(first('seconds', DEFAULT_SECONDS)), first('format', 'collapsed')
+
+
+def handle_profile_request(query, enabled):
+    """(HTTP status, content type, body bytes) for a /debug/profile request"""
+    if not enabled:
+        body = {'success': False, 'error': f'Profiling disabled (set {ENV_VAR}=1 or debug.profiling: true)'}
+        return 404, 'application/json', json.dumps(body).encode()
+    try:
+        seconds, fmt = parse_query(query)
+        result = profile(seconds, fmt=fmt)
+    except ValueError as e:
+        return 400, 'application/json', json.dumps({'success': False, 'error': str(e)}).encode()
+    except ProfilerBusy as e:
+        return 409, 'application/json', json.dumps({'success': False, 'error': str(e)}).encode()
+    if fmt == 'json':
+        return 200, 'application/json', json.dumps(result, indent=2).encode()
+    return 200, 'text/plain', result.encode()
@@ -0,0 +1,34 @@
+"""
+Hardware simulators for running the bridges and GUI clients without hardware
+
+Selected per device in devices.yaml (simulation.devices):
+    ni_cdaq    fake_nidaqmx: nidaqmx stand-in with configurable waveforms
+    pico_tc08  fake_tc08: usbtc08.dll stand-in (ctypes call signatures)
+    bga244     bga244_emulator: BGA244 serial protocol on a pty
+    psu        modbus_sim: Modbus RTU PSU on a pty
+    cvm24p     modbus_sim: Modbus TCP gateway with CVM24P units
+    labjack    modbus_sim: Modbus TCP LabJack (AIN0)
+
+The pty-based simulators need a POSIX system (Linux/macOS).
+"""
+
+from pathlib import Path
+
+import yaml
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / "config" / "devices.yaml"
+DEVICES = ('ni_cdaq', 'pico_tc08', 'bga244', 'psu', 'cvm24p', 'labjack')
+
+
+def sim_config(config=None):
+    """The simulation section of devices.yaml (empty dict if missing)"""
+    if config is None:
+        with open(CONFIG_PATH, 'r') as f:
+            config = yaml.safe_load(f)
+    return config.get('simulation') or {}
+
+
+def simulated(device, config=None):
+    """True if devices.yaml selects the simulator for a device"""
+    devices = sim_config(config).get('devices') or []
+    return 'all' in devices or device in devices
@@ -0,0 +1,82 @@
+"""
+BGA244 binary gas analyzer emulator on a pseudo-terminal (simulation.devices: bga244)
+
+Answers the SCPI-style queries the bridges send (GASP?, GASS?, RATO? 1%,
+UNCT?%, TCEL? C, PRES?) and accepts GASP/GASS set commands, over a pty so
+the unchanged pyserial code path is exercised. Purity drifts slowly; every
+purge_period_s the secondary gas switches to N2 for purge_duration_s.
+"""
+
+import math
+import os
+import random
+import threading
+import time
+import tty
+
+O2, H2, N2 = '7782-44-7', '1333-74-0', '7727-37-9'
+
+
+class BGA244Emulator:
+    """One emulated analyzer; start() returns the serial port path"""
+
+    def __init__(self, primary=H2, secondary=O2, purity=99.5, purge_period_s=600.0,
+                 purge_duration_s=60.0, seed=None):
+        self.primary = primary
+        self.secondary = secondary
+        self.purity = purity
+        self.purge_period_s = purge_period_s
+        self.purge_duration_s = purge_duration_s
+        self._rng = random.Random(seed)
+        self._t0 = time.monotonic()
+        self._master = None
+        self.port = None
+
+    def start(self):
+        self._master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        threading.Thread(target=self._serve, daemon=True).start()
+        return self.port
+
+    def _secondary_gas(self):
+        t = time.monotonic() - self._t0
+        if self.purge_period_s and t % self.purge_period_s < self.purge_duration_s:
+            return N2
+        return self.secondary
+
+    def respond(self, command):
+        """Reply text for one command, or None for set commands"""
+        t = time.monotonic() - self._t0
+        command = command.strip()
+        if command == 'GASP?':
+            return self.primary
+        if command == 'GASS?':
+            return self._secondary_gas()
+        if command.startswith('RATO?'):
+            return f"{self.purity + 0.3 * math.sin(t / 120.0) + self._rng.gauss(0, 0.01):.4f}"
+        if command.startswith('UNCT?'):
+            return f"{0.05 + self._rng.gauss(0, 0.002):.4f}"
+        if command.startswith('TCEL?'):
+            return f"{35.0 + self._rng.gauss(0, 0.02):.3f}"
+        if command.startswith('PRES?'):
+            return f"{101.3 + self._rng.gauss(0, 0.05):.3f}"
+        name, _, value = command.partition(' ')
+        if name == 'GASP' and value:
+            self.primary = value
+        elif name == 'GASS' and value:
+            self.secondary = value
+        return None
+
+    def _serve(self):
+        pending = b''
+        while True:
+            try:
+                pending += os.read(self._master, 1024)
+            except OSError:
+                return
+            while b'\r' in pending:
+                line, pending = pending.split(b'\r', 1)
+                reply = self.respond(line.decode(errors='replace'))
+                if reply is not None:
+                    os.write(self._master, (reply + '\r\n').encode())
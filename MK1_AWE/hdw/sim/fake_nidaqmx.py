@@ -0,0 +1,206 @@
+"""
+Stand-in for the nidaqmx package (simulation.devices: ni_cdaq)
+
+Covers what the NI bridge and GUI clients use: Task with AI current and DO
+channels, sample clock timing, in_stream, read/write, the
+AnalogMultiChannelReader stream reader and System.local().devices.
+
+Analog samples are generated on a virtual sample clock that advances with
+wall time from task.start(), so reads block/return exactly like a
+continuous hardware-timed task, including the buffer-overflow error when
+the buffer is not drained in time. Values follow simulation.ni_waveforms
+(per channel name, else 'default'), in mA.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from . import sim_config, CONFIG_PATH
+
+constants = SimpleNamespace(
+    AcquisitionType=SimpleNamespace(CONTINUOUS='continuous', FINITE='finite'),
+    READ_ALL_AVAILABLE=-1,
+)
+READ_ALL_AVAILABLE = constants.READ_ALL_AVAILABLE
+
+DEFAULT_WAVEFORM = {'shape': 'sine', 'offset_ma': 12.0, 'amplitude_ma': 4.0,
+                    'period_s': 60.0, 'noise_ma': 0.02}
+
+# Digital line states shared by all tasks ("cDAQ1Mod2/port0/line0" -> bool)
+_line_states = {}
+_line_lock = threading.Lock()
+
+
+class DaqError(Exception):
+    """Raised like nidaqmx.errors.DaqError"""
+
+
+def waveform(spec, t, rng):
+    """Channel current [mA] at times t [s] for a waveform spec"""
+    offset = spec.get('offset_ma', 12.0)
+    amplitude = spec.get('amplitude_ma', 0.0)
+    phase = 2 * np.pi * t / spec.get('period_s', 60.0)
+    shape = spec.get('shape', 'sine')
+    if shape == 'sine':
+        values = offset + amplitude * np.sin(phase)
+    elif shape == 'square':
+        values = offset + amplitude * np.where(np.sin(phase) >= 0, 1.0, -1.0)
+    elif shape == 'ramp':
+        values = offset + amplitude * (2 * ((t / spec.get('period_s', 60.0)) % 1.0) - 1)
+    else:  # constant
+        values = np.full(len(t), float(offset))
+    noise = spec.get('noise_ma', 0.0)
+    if noise:
+        values = values + rng.normal(0.0, noise, len(t))
+    return values
+
+
+class _AIChannels(list):
+    def add_ai_current_chan(self, physical_channel, name_to_assign_to_channel='', min_val=-0.02,
+                            max_val=0.02, **kwargs):
+        self.append(SimpleNamespace(physical_channel=physical_channel,
+                                    name=name_to_assign_to_channel or physical_channel,
+                                    min_val=min_val, max_val=max_val))
+
+
+class _DOChannels(list):
+    def add_do_chan(self, lines, name_to_assign_to_lines='', **kwargs):
+        self.append(lines)
+
+
+class _Timing:
+    def __init__(self):
+        self.samp_clk_rate = 1000.0
+
+    def cfg_samp_clk_timing(self, rate, source='', active_edge=None, sample_mode=None,
+                            samps_per_chan=1000):
+        self.samp_clk_rate = float(rate)
+
+
+class _InStream:
+    def __init__(self, task):
+        self._task = task
+        self.input_buf_size = 0
+
+    @property
+    def avail_samp_per_chan(self):
+        return self._task._available()
+
+
+class Task:
+    """Simulated DAQmx task"""
+
+    def __init__(self, new_task_name=''):
+        self.name = new_task_name
+        self.ai_channels = _AIChannels()
+        self.do_channels = _DOChannels()
+        self.timing = _Timing()
+        self.in_stream = _InStream(self)
+        self._t0 = None
+        self._read_count = 0
+        settings = sim_config()
+        self._waveforms = settings.get('ni_waveforms') or {}
+        self._rng = np.random.default_rng(settings.get('seed'))
+
+    def start(self):
+        self._t0 = time.monotonic()
+        self._read_count = 0
+
+    def stop(self):
+        self._t0 = None
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _available(self):
+        if self._t0 is None:
+            return 0
+        available = int((time.monotonic() - self._t0) * self.timing.samp_clk_rate) - self._read_count
+        if self.in_stream.input_buf_size and available > self.in_stream.input_buf_size:
+            raise DaqError("The application is not able to keep up with the hardware acquisition "
+                           "(buffer overflow). Status Code: -200279")
+        return available
+
+    def _wait_for(self, n, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while self._available() < n:
+            if time.monotonic() > deadline:
+                raise DaqError("Wait Until Done did not indicate all samples were acquired. "
+                               "Status Code: -200284")
+            time.sleep(min(0.01, n / self.timing.samp_clk_rate))
+
+    def _generate(self, n):
+        """(channels, n) samples in A for the next n clock ticks"""
+        t = (self._read_count + np.arange(n)) / self.timing.samp_clk_rate
+        self._read_count += n
+        data = np.empty((len(self.ai_channels), n))
+        default = {**DEFAULT_WAVEFORM, **self._waveforms.get('default', {})}
+        for i, channel in enumerate(self.ai_channels):
+            spec = {**default, **self._waveforms.get(channel.name, {})}
+            data[i] = waveform(spec, t, self._rng) / 1000.0
+        return data
+
+    def read(self, number_of_samples_per_channel=None, timeout=10.0):
+        if self.do_channels:
+            with _line_lock:
+                states = [_line_states.get(line, False) for line in self.do_channels]
+            return states[0] if len(states) == 1 else states
+        if self._t0 is None:
+            self.start()  # Auto-start like DAQmx
+        if number_of_samples_per_channel == READ_ALL_AVAILABLE:
+            n = self._available()
+        else:
+            n = number_of_samples_per_channel or 1
+            self._wait_for(n, timeout)
+        data = self._generate(n)
+        if number_of_samples_per_channel is None:
+            values = [float(v) for v in data[:, 0]]
+            return values[0] if len(values) == 1 else values
+        values = data.tolist()
+        return values[0] if len(values) == 1 else values
+
+    def write(self, data, auto_start=True, timeout=10.0):
+        values = data if isinstance(data, (list, tuple)) else [data]
+        with _line_lock:
+            for line, value in zip(self.do_channels, values):
+                _line_states[line] = bool(value)
+        return len(values)
+
+
+class AnalogMultiChannelReader:
+    """Stand-in for nidaqmx.stream_readers.AnalogMultiChannelReader"""
+
+    def __init__(self, in_stream):
+        self._task = in_stream._task
+
+    def read_many_sample(self, data, number_of_samples_per_channel=READ_ALL_AVAILABLE, timeout=10.0):
+        task = self._task
+        n = number_of_samples_per_channel
+        if n == READ_ALL_AVAILABLE:
+            n = task._available()
+        else:
+            task._wait_for(n, timeout)
+        data[:, :n] = task._generate(n)
+        return n
+
+
+stream_readers = SimpleNamespace(AnalogMultiChannelReader=AnalogMultiChannelReader)
+
+
+def _local_system():
+    import yaml
+    with open(CONFIG_PATH, 'r') as f:
+        name = yaml.safe_load(f)['devices']['NI_cDAQ']['name']
+    return SimpleNamespace(devices=[SimpleNamespace(name=name)])
+
+
+system = SimpleNamespace(System=SimpleNamespace(local=_local_system))
@@ -0,0 +1,99 @@
+"""
+Stand-in for usbtc08.dll (simulation.devices: pico_tc08)
+
+Implements the functions pico_tc08_http.py calls, with the same ctypes
+argument types, in streaming mode: after usb_tc08_run() a reading per
+enabled channel is produced every interval, each get_temp call drains up
+to buffer_length readings and fills time_buffer with ms since the run
+started. Like the real driver, at most 600 readings per channel are kept
+(older ones are lost and flagged in overflow).
+"""
+
+import ctypes
+import threading
+import time
+
+import numpy as np
+
+from . import sim_config
+
+MAX_BUFFERED = 600  # Readings per channel held by the driver
+
+
+def _value(arg):
+    """Plain value from a ctypes scalar or Python number"""
+    value = getattr(arg, 'value', arg)
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class FakeTC08DLL:
+    """Simulated TC-08 driver (one unit, handle 1)"""
+
+    def __init__(self, config=None):
+        settings = sim_config(config)
+        self.base_temp = settings.get('tc08_temperature_c', 25.0)
+        self._rng = np.random.default_rng(settings.get('seed'))
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._interval_ms = None
+        self._t0 = None
+        self._read = {}
+
+    def usb_tc08_open_unit(self):
+        return 1
+
+    def usb_tc08_set_channel(self, handle, channel, tc_type):
+        self._channels[_value(channel)] = _value(tc_type)
+        return 1
+
+    def usb_tc08_run(self, handle, interval_ms):
+        with self._lock:
+            self._interval_ms = max(100, _value(interval_ms))
+            self._t0 = time.monotonic()
+            self._read = {ch: 0 for ch in self._channels}
+        return self._interval_ms
+
+    def _temperature(self, channel, t_s):
+        if channel == 0:  # Cold junction
+            return self.base_temp + self._rng.normal(0, 0.02)
+        return (self.base_temp + 2.0 * channel + 3.0 * np.sin(2 * np.pi * t_s / 300.0 + channel)
+                + self._rng.normal(0, 0.05))
+
+    def usb_tc08_get_temp(self, handle, temp_buffer, time_buffer, buffer_length, overflow,
+                          channel, units, fill_missing):
+        channel = _value(channel)
+        with self._lock:
+            if self._t0 is None or channel not in self._read:
+                return -1
+            produced = int((time.monotonic() - self._t0) * 1000 / self._interval_ms) + 1
+            first = self._read[channel]
+            lost = max(0, produced - first - MAX_BUFFERED)
+            first += lost
+            n = min(produced - first, _value(buffer_length))
+            for i in range(n):
+                time_ms = (first + i) * self._interval_ms
+                temp_buffer[i] = self._temperature(channel, time_ms / 1000.0)
+                time_buffer[i] = time_ms
+            self._read[channel] = first + n
+        if hasattr(overflow, '_obj'):
+            overflow._obj.value = (1 << channel) if lost else 0
+        return n
+
+    def usb_tc08_stop(self, handle):
+        self._t0 = None
+        return 1
+
+    def usb_tc08_close_unit(self, handle):
+        return 1
+
+
+if __name__ == "__main__":
+    dll = FakeTC08DLL()
+    dll.usb_tc08_set_channel(1, 1, ctypes.c_char(b'K'))
+    dll.usb_tc08_run(1, 100)
+    time.sleep(0.35)
+    temps = (ctypes.c_float * 8)()
+    times = (ctypes.c_int32 * 8)()
+    overflow = ctypes.c_int16(0)
+    n = dll.usb_tc08_get_temp(1, temps, times, 8, ctypes.byref(overflow), ctypes.c_int16(1), 0, 0)
+    print([(times[i], round(temps[i], 2)) for i in range(n)])
@@ -0,0 +1,250 @@
+"""
+Modbus RTU/TCP server simulators (simulation.devices: psu, cvm24p, labjack)
+
+A RegisterBank per unit id holds holding/input registers; an optional
+refresh callback recomputes values before each read and an on_write
+callback reacts to writes. handle_pdu() implements function codes 3, 4, 6
+and 16 and is shared by:
+    ModbusTcpSimulator  threaded TCP server (MBAP framing)
+    ModbusRtuSimulator  RTU framing with CRC on a pty (serial port path)
+
+Device models: psu_bank (Gen3 PSU, Modbus RTU), cvm_banks (CVM24P units
+behind a TCP gateway), labjack_bank (AIN0 feedback of DAC0).
+"""
+
+import math
+import os
+import random
+import socketserver
+import struct
+import threading
+import time
+
+ILLEGAL_FUNCTION = 0x01
+GATEWAY_TARGET_FAILED = 0x0B
+
+
+class RegisterBank:
+    """Registers of one Modbus unit"""
+
+    def __init__(self, holding=None, inputs=None, refresh=None, on_write=None):
+        self.holding = dict(holding or {})
+        self.inputs = dict(inputs or {})
+        self.refresh = refresh
+        self.on_write = on_write
+        self.lock = threading.Lock()
+
+    def read(self, table, address, count):
+        with self.lock:
+            if self.refresh:
+                self.refresh(self)
+            return [table.get(address + i, 0) & 0xFFFF for i in range(count)]
+
+    def write(self, address, values):
+        with self.lock:
+            for i, value in enumerate(values):
+                self.holding[address + i] = value & 0xFFFF
+            if self.on_write:
+                self.on_write(self, address, values)
+
+
+def float_regs(value, word_swap=False):
+    """float32 as two big-endian registers (optionally low word first)"""
+    hi, lo = struct.unpack('>HH', struct.pack('>f', value))
+    return (lo, hi) if word_swap else (hi, lo)
+
+
+def regs_float(hi, lo):
+    return struct.unpack('>f', struct.pack('>HH', hi, lo))[0]
+
+
+def handle_pdu(banks, unit, pdu):
+    """Response PDU for a request PDU addressed to unit (None: no such unit)"""
+    bank = banks.get(unit)
+    if bank is None:
+        return None
+    function = pdu[0]
+    try:
+        if function in (3, 4):
+            address, count = struct.unpack('>HH', pdu[1:5])
+            table = bank.holding if function == 3 else bank.inputs
+            values = bank.read(table, address, count)
+            return struct.pack('>BB', function, 2 * count) + struct.pack(f'>{count}H', *values)
+        if function == 6:
+            address, value = struct.unpack('>HH', pdu[1:5])
+            bank.write(address, [value])
+            return pdu[:5]
+        if function == 16:
+            address, count, _ = struct.unpack('>HHB', pdu[1:6])
+            bank.write(address, list(struct.unpack(f'>{count}H', pdu[6:6 + 2 * count])))
+            return pdu[:5]
+    except struct.error:
+        pass
+    return struct.pack('>BB', function | 0x80, ILLEGAL_FUNCTION)
+
+
+class _TcpHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        buffer = b''
+        while True:
+            try:
+                chunk = sock.recv(4096)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buffer += chunk
+            while len(buffer) >= 7:
+                tid, pid, length, unit = struct.unpack('>HHHB', buffer[:7])
+                if len(buffer) < 6 + length:
+                    break
+                pdu, buffer = buffer[7:6 + length], buffer[6 + length:]
+                if self.server.latency:
+                    time.sleep(self.server.latency)
+                response = handle_pdu(self.server.banks, unit, pdu)
+                if response is None:
+                    response = struct.pack('>BB', pdu[0] | 0x80, GATEWAY_TARGET_FAILED)
+                sock.sendall(struct.pack('>HHHB', tid, pid, len(response) + 1, unit) + response)
+
+
+class ModbusTcpSimulator(socketserver.ThreadingTCPServer):
+    """Modbus TCP server for a set of unit ids (port 0 = pick a free port)"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, banks, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), _TcpHandler)
+        self.banks = banks
+        self.latency = latency  # Simulated per-request device latency [s]
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def crc16(data):
+    """Modbus RTU CRC-16 (little-endian on the wire)"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+class ModbusRtuSimulator:
+    """Modbus RTU slave(s) on a pty; start() returns the serial port path"""
+
+    def __init__(self, banks):
+        self.banks = banks
+        self.port = None
+
+    def start(self):
+        import tty
+        self._master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        threading.Thread(target=self._serve, daemon=True).start()
+        return self.port
+
+    @staticmethod
+    def _frame_length(buffer):
+        """Expected request length, or None if more bytes are needed"""
+        if len(buffer) < 2:
+            return None
+        if buffer[1] in (3, 4, 6):
+            return 8
+        if buffer[1] == 16:
+            return 9 + buffer[6] if len(buffer) >= 7 else None
+        return len(buffer)
+
+    def _serve(self):
+        buffer = b''
+        while True:
+            try:
+                buffer += os.read(self._master, 256)
+            except OSError:
+                return
+            while True:
+                length = self._frame_length(buffer)
+                if length is None or len(buffer) < length:
+                    break
+                frame, buffer = buffer[:length], buffer[length:]
+                if crc16(frame[:-2]) != struct.unpack('<H', frame[-2:])[0]:
+                    buffer = b''  # Resynchronise on the next request
+                    break
+                response = handle_pdu(self.banks, frame[0], frame[1:-2])
+                if response is not None:
+                    reply = bytes([frame[0]]) + response
+                    os.write(self._master, reply + struct.pack('<H', crc16(reply)))
+
+
+def psu_bank(cells=5):
+    """Gen3 PSU (psu_http.py register map) driving a simulated electrolyzer stack
+
+    Constant-current mode: with output enabled the current follows the set
+    current (limited by the set voltage) and the stack voltage follows a
+    simple polarization curve.
+    """
+    state = {'enabled_at': None}
+
+    def stack_voltage(current):
+        return cells * (1.48 + 0.12 * math.log1p(current) + 0.004 * current)
+
+    def refresh(bank):
+        h = bank.holding
+        set_v, set_i, enabled = h.get(0x0101, 0) * 0.1, h.get(0x0102, 0) * 0.1, h.get(0x0103, 0)
+        current = set_i if enabled else 0.0
+        voltage = min(set_v, stack_voltage(current)) if enabled else 0.0
+        runtime = time.monotonic() - state['enabled_at'] if state['enabled_at'] else 0
+        values = [voltage, current, voltage * current, 0.0]
+        for i, value in enumerate(values):
+            h[0x0001 + i] = int(round(value * 10))
+        h[0x0005] = int(runtime)
+        h[0x0006] = 0
+        h[0x0007] = h[0x0008] = 0                  # No faults
+        h[0x0009] = int(25 + 0.2 * current)        # Temperature [C]
+        h[0x000A] = 1 if enabled else 0            # Status word
+        h[0x000B] = h.get(0x0101, 0)               # Set voltage readback
+        h[0x000C] = h.get(0x0102, 0)               # Set current readback
+        h[0x000D] = enabled
+
+    def on_write(bank, address, values):
+        if 0x0103 in range(address, address + len(values)):
+            state['enabled_at'] = time.monotonic() if bank.holding[0x0103] else None
+
+    return RegisterBank(refresh=refresh, on_write=on_write)
+
+
+def cvm_banks(units, cells_per_unit=24, seed=None):
+    """CVM24P units: cell voltages as word-swapped float32 from register 192"""
+    rng = random.Random(seed)
+    t0 = time.monotonic()
+
+    def make(offset):
+        def refresh(bank):
+            t = time.monotonic() - t0
+            for ch in range(cells_per_unit):
+                cell = offset + ch
+                voltage = 1.85 + 0.01 * math.sin(t / 30.0 + cell) + rng.gauss(0, 0.001)
+                bank.holding[192 + 2 * ch], bank.holding[193 + 2 * ch] = float_regs(voltage, word_swap=True)
+        return RegisterBank(refresh=refresh)
+
+    return {unit: make(i * cells_per_unit) for i, unit in enumerate(units)}
+
+
+def labjack_bank():
+    """LabJack T-series: AIN0 (input 0-1) follows DAC0 (holding 1000-1001) with noise"""
+    rng = random.Random()
+
+    def refresh(bank):
+        dac0 = regs_float(bank.holding.get(1000, 0), bank.holding.get(1001, 0))
+        bank.inputs[0], bank.inputs[1] = float_regs(dac0 + rng.gauss(0, 0.0005))
+
+    return RegisterBank(refresh=refresh)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Per-stage latency tracing for the hardware bridges (/debug/timing)
+
+Each bridge loop takes monotonic timestamps (time.perf_counter) around its
+stages and feeds them to a StageTimer:
+    acquire   device read (DAQ buffer, DLL call, serial/Modbus request)
+    convert   scaling / parsing / line formatting
+    publish   pushing lines and updating latest_data (includes lock wait)
+    serve     /metrics handler time
+    age       time since the last publish when /metrics is served
+
+Every stage keeps a rolling window of the most recent durations; summary()
+gives count/p50/p95/p99/max in ms. With debug.timing_push_interval set in
+devices.yaml and push ingestion enabled, the summary is also written to
+InfluxDB as the bridge_timing measurement (one line per stage).
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+DEFAULT_WINDOW = 1024  # Most recent durations kept per stage
+STAGES = ('acquire', 'convert', 'publish', 'serve', 'age')
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list"""
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class StageTimer:
+    """Rolling per-stage duration windows of one bridge"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._samples = {stage: deque(maxlen=window) for stage in STAGES}
+        self._lock = threading.Lock()
+        self.published_at = None  # perf_counter of the last publish
+
+    def record(self, stage, seconds):
+        """Add one duration to a stage window"""
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.window)
+            self._samples[stage].append(seconds)
+
+    def loop(self, acquire_start, acquire_end, converted, published):
+        """Record one loop iteration from its stage boundary timestamps"""
+        self.stages(acquire_end - acquire_start, converted - acquire_end, published - converted)
+
+    def stages(self, acquire, convert, publish):
+        """Record one loop iteration from its stage durations [s]"""
+        with self._lock:
+            self._samples['acquire'].append(acquire)
+            self._samples['convert'].append(convert)
+            self._samples['publish'].append(publish)
+            self.published_at = time.perf_counter()
+
+    def served(self, started):
+        """Record a /metrics request that started at perf_counter `started`"""
+        now = time.perf_counter()
+        with self._lock:
+            self._samples['serve'].append(now - started)
+            if self.published_at is not None:
+                self._samples['age'].append(started - self.published_at)
+
+    def summary(self):
+        """{stage: {count, p50_ms, p95_ms, p99_ms, max_ms}} over the current windows"""
+        with self._lock:
+            snapshot = {stage: sorted(values) for stage, values in self._samples.items()}
+        result = {}
+        for stage, values in snapshot.items():
+            if not values:
+                result[stage] = {'count': 0}
+                continue
+            result[stage] = {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 50) * 1000, 3),
+                'p95_ms': round(percentile(values, 95) * 1000, 3),
+                'p99_ms': round(percentile(values, 99) * 1000, 3),
+                'max_ms': round(values[-1] * 1000, 3),
+            }
+        return result
+
+    def lines(self, timestamp_ns=None):
+        """bridge_timing line protocol (one line per stage with samples)"""
+        timestamp_ns = timestamp_ns or time.time_ns()
+        lines = []
+        for stage, stats in self.summary().items():
+            if stats['count']:
+                lines.append(f"bridge_timing,stage={stage} count={stats['count']}i,"
+                             f"p50_ms={stats['p50_ms']},p95_ms={stats['p95_ms']},"
+                             f"p99_ms={stats['p99_ms']},max_ms={stats['max_ms']} {timestamp_ns}")
+        return lines
+
+    def report(self):
+        """JSON body for /debug/timing"""
+        return {'window': self.window, 'stages': self.summary()}
+
+
+def _push_loop(timer, pusher, interval):
+    while True:
+        time.sleep(interval)
+        pusher.push(timer.lines())
+
+
+def timer_from_config(config=None, pusher=None):
+    """StageTimer sized from devices.yaml (debug section)
+
+    Starts a thread writing the summary to InfluxDB every
+    debug.timing_push_interval seconds when a LinePusher is given.
+    """
+    debug = (config or {}).get('debug') or {}
+    timer = StageTimer(debug.get('timing_window', DEFAULT_WINDOW))
+    interval = debug.get('timing_push_interval', 0)
+    if interval and pusher:
+        threading.Thread(target=_push_loop, args=(timer, pusher, interval), daemon=True).start()
+        print(f"Stage timing -> InfluxDB (bridge_timing) every {interval}s")
+    return timer
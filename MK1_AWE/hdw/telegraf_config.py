@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Generate config/telegraf.conf from devices.yaml
+Agent settings, global tags, output and inputs all come from the telegraf and
+bridges sections, so bridge ports and tags are defined in one place.
+
+    python telegraf_config.py            # write config/telegraf.conf
+    python telegraf_config.py --stdout   # print only
+    python telegraf_config.py --check    # exit 1 if telegraf.conf is out of date
+
+Ingest modes (telegraf.ingest.mode):
+    push: bridges POST every sample (line_push.py), to InfluxDB directly
+          (ingest.target "influxdb") or to one http_listener_v2 input ("telegraf")
+    poll: one inputs.http per bridge, polling /metrics every poll_interval
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import yaml
+
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "devices.yaml"
+OUTPUT_PATH = Path(__file__).parent.parent / "config" / "telegraf.conf"
+
+AGENT_DEFAULTS = {
+    'interval': "1s",
+    'round_interval': True,
+    'metric_batch_size': 1000,
+    'metric_buffer_limit': 10000,
+    'collection_jitter': "0s",
+    'flush_interval': "1s",
+    'flush_jitter': "0s",
+    'precision': "",
+    'hostname': "",
+    'omit_hostname': False,
+}
+RULE = "# " + "═" * 63
+
+
+def toml_value(value):
+    """Python value to a TOML literal"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(toml_value(v) for v in value) + ']'
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def section(title):
+    return ['', RULE, f"# {title}", RULE, '']
+
+
+def table(lines, values, indent='  '):
+    for key, value in values.items():
+        lines.append(f"{indent}{key} = {toml_value(value)}")
+
+
+def render(config):
+    """Complete telegraf.conf text for a parsed devices.yaml"""
+    telegraf = config.get('telegraf', {})
+    ingest = telegraf.get('ingest', {})
+    system = config.get('system', {})
+    bridges = config.get('bridges', {})
+    mode = ingest.get('mode', 'poll')
+    if mode not in ('push', 'poll'):
+        raise ValueError(f"telegraf.ingest.mode must be 'push' or 'poll', not {mode!r}")
+
+    lines = [
+        "# Telegraf Configuration for Gen3 AWE Test Rig",
+        "# GENERATED from devices.yaml by MK1_AWE/hdw/telegraf_config.py - do not edit",
+        f"# Ingest mode: {mode}",
+        '',
+        "[global_tags]",
+    ]
+    table(lines, telegraf.get('global_tags', {}))
+    lines += ['', "[agent]"]
+    table(lines, {**AGENT_DEFAULTS, **telegraf.get('agent', {})})
+
+    lines += section("OUTPUT")
+    lines.append("[[outputs.influxdb_v2]]")
+    table(lines, {
+        'urls': [telegraf.get('output_url', "http://influxdb:8086")],
+        'token': "$INFLUXDB_ADMIN_TOKEN",
+        'organization': system.get('influxdb_org', "electrolyzer"),
+        'bucket': system.get('influxdb_bucket', "electrolyzer_data"),
+        'timeout': "5s",
+    })
+
+    lines += section("HARDWARE INPUTS")
+    if mode == 'push' and ingest.get('target', 'influxdb') == 'influxdb':
+        names = ', '.join(bridges)
+        lines += [
+            f"# Bridges write batched line protocol directly to InfluxDB ({names})",
+            "# (telegraf.ingest.target: influxdb); global_tags and host are added by each bridge",
+        ]
+    elif mode == 'push':
+        names = ', '.join(bridges)
+        lines += [
+            f"# Bridges push batched line protocol at their native rate ({names})",
+            "# Tags (hardware, bga_id, ...) are added by each bridge from devices.yaml",
+            "[[inputs.http_listener_v2]]",
+        ]
+        table(lines, {
+            'service_address': f":{ingest.get('listener_port', 8186)}",
+            'paths': [ingest.get('listener_path', "/telegraf")],
+            'methods': ["POST"],
+            'data_format': "influx",
+        })
+    else:
+        host = ingest.get('poll_host', "host.docker.internal")
+        for name, bridge in bridges.items():
+            lines += [f"# {name} bridge (latest sample every {ingest.get('poll_interval', '1s')})",
+                      "[[inputs.http]]"]
+            table(lines, {
+                'urls': [f"http://{host}:{bridge['port']}/metrics"],
+                'timeout': ingest.get('poll_timeout', "2s"),
+                'interval': ingest.get('poll_interval', "1s"),
+                'data_format': "influx",
+            })
+            if bridge.get('tags'):
+                lines += ['', "  [inputs.http.tags]"]
+                table(lines, bridge['tags'], indent='    ')
+            lines.append('')
+        lines.pop()
+
+    lines += section("SYSTEM MONITORING")
+    lines += [
+        "[[inputs.cpu]]",
+        "  percpu = false",
+        "  totalcpu = true",
+        "  collect_cpu_time = false",
+        "  report_active = false",
+        '',
+        "[[inputs.mem]]",
+        '',
+        "[[inputs.disk]]",
+        '  ignore_fs = ["tmpfs", "devtmpfs", "devfs", "iso9660", "overlay", "aufs", "squashfs"]',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate telegraf.conf from devices.yaml")
+    parser.add_argument('--config', default=str(CONFIG_PATH), help="devices.yaml path")
+    parser.add_argument('--output', default=str(OUTPUT_PATH), help="telegraf.conf path")
+    parser.add_argument('--stdout', action='store_true', help="Print instead of writing")
+    parser.add_argument('--check', action='store_true', help="Fail if the output is out of date")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        text = render(yaml.safe_load(f))
+
+    output = Path(args.output)
+    if args.stdout:
+        print(text, end='')
+    elif args.check:
+        if not output.exists() or output.read_text(encoding='utf-8') != text:
+            print(f"[!] {output} is out of date; run telegraf_config.py")
+            sys.exit(1)
+        print(f"[OK] {output} is up to date")
+    else:
+        output.write_text(text, encoding='utf-8')
+        print(f"[OK] Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,28 @@
 """
 Super Simple Sine Wave Generator
 Just change the parameters at the top and run!
+
+The waveform is played by the LabJack stream-out buffer (hardware timed),
+see MK1_AWE/gui/dac_waveform.py.
 """
 
-from labjack import ljm
-import math
+import sys
 import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "MK1_AWE" / "gui"))
+from dac_waveform import WaveformPlayer, sine, ramp, compile_profile
+from psu_client import load_profile
 
 # ============================================
 # CHANGE THESE PARAMETERS
 # ============================================
+WAVEFORM = "sine"    # "sine", "ramp" or "csv" (CSV values are volts)
 FREQUENCY = 1.0      # Hz (cycles per second)
 MIN_VOLTAGE = 0.0    # Minimum voltage (V)
 MAX_VOLTAGE = 5.0    # Maximum voltage (V)
+DURATION = 60.0      # Seconds (sine/ramp)
+CSV_PATH = "MK1_AWE/profiles/solar_profile_1.csv"
 UPDATE_RATE = 100    # Updates per second
 
 # DAC channel: "DAC0" or "DAC1"
@@ -23,44 +33,44 @@ DAC_CHANNEL = "DAC1"
 IP_ADDRESS = "192.168.10.21"
 # ============================================
 
-# Connect to LabJack
-handle = ljm.openS("T7", "ETHERNET", IP_ADDRESS)
-
-# Calculate amplitude and offset from min/max
-amplitude = (MAX_VOLTAGE - MIN_VOLTAGE) / 2
-offset = (MAX_VOLTAGE + MIN_VOLTAGE) / 2
+if WAVEFORM == "sine":
+    samples = sine(FREQUENCY, MIN_VOLTAGE, MAX_VOLTAGE, DURATION, UPDATE_RATE)
+elif WAVEFORM == "ramp":
+    samples = ramp(MIN_VOLTAGE, MAX_VOLTAGE, DURATION, UPDATE_RATE)
+else:
+    samples = compile_profile(load_profile(str(Path(__file__).resolve().parent.parent / CSV_PATH)),
+                              UPDATE_RATE)
 
 # Display settings
-print(f"Sine Wave Generator")
+print(f"Waveform Generator ({WAVEFORM})")
 print(f"  Frequency: {FREQUENCY} Hz")
 print(f"  Voltage range: {MIN_VOLTAGE}V to {MAX_VOLTAGE}V")
 print(f"  Channel: {DAC_CHANNEL}")
+print(f"  Samples: {len(samples)} @ {UPDATE_RATE}/s")
 print(f"\nPress Ctrl+C to stop")
 print("-" * 30)
 
-# Generate sine wave
-t = 0
-dt = 1.0 / UPDATE_RATE
+player = WaveformPlayer(IP_ADDRESS, DAC_CHANNEL, samples, UPDATE_RATE, device_type="T7").start()
 
 try:
-    while True:
-        # Calculate voltage
-        voltage = offset + amplitude * math.sin(2 * math.pi * FREQUENCY * t)
-        
-        # Write to DAC
-        ljm.eWriteName(handle, DAC_CHANNEL, voltage)
-        
-        # Show voltage (update same line)
-        print(f"\rVoltage: {voltage:5.2f}V", end='', flush=True)
-        
-        # Update time and wait
-        t += dt
-        time.sleep(dt)
-        
+    while player.running:
+        status = player.status()
+        print(f"\rPlayed: {status['played']}/{status['total']}  "
+              f"Underruns: {status['underruns']}  Feedback: {status['feedback_v'] or 0:5.2f}V",
+              end='', flush=True)
+        time.sleep(0.2)
 except KeyboardInterrupt:
     print("\n\nStopping...")
-    
-# Reset DAC to 0V and close
+    player.stop()
+    player.wait()
+
+status = player.status()
+if status['error']:
+    print(f"\nError: {status['error']}")
+
+# Reset DAC to 0V
+from labjack import ljm
+handle = ljm.openS("T7", "ETHERNET", IP_ADDRESS)
 ljm.eWriteName(handle, DAC_CHANNEL, 0.0)
 ljm.close(handle)
-print("Done!")
\ No newline at end of file
+print("\nDone!")